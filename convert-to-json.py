@@ -8,6 +8,8 @@ import json
 import os
 from datetime import datetime
 
+from ondankamap import instrument
+
 def parse_csv_file(filename):
     """CSVファイルを解析してデータを抽出"""
     data = []
@@ -81,24 +83,28 @@ def main():
         'data-utf8.csv'     # 2010-2025
     ]
     
-    all_data = []
+    with instrument.run('convert-to-json') as run:
+        all_data = []
     
-    for filename in files:
-        if os.path.exists(filename):
-            print(f"処理中: {filename}")
-            file_data = parse_csv_file(filename)
-            all_data.extend(file_data)
-            print(f"  {len(file_data)} レコード追加")
-        else:
-            print(f"ファイルが見つかりません: {filename}")
+        for filename in files:
+            if os.path.exists(filename):
+                print(f"処理中: {filename}")
+                with run.stage('parse_csv', file=filename):
+                    file_data = parse_csv_file(filename)
+                all_data.extend(file_data)
+                print(f"  {len(file_data)} レコード追加")
+            else:
+                print(f"ファイルが見つかりません: {filename}")
     
-    # 日付順にソート
-    all_data.sort(key=lambda x: x['date'])
+        # 日付順にソート
+        with run.stage('sort'):
+            all_data.sort(key=lambda x: x['date'])
     
-    # JSONファイルに出力
-    output_file = 'tokyo_temperature_data.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+        # JSONファイルに出力
+        output_file = 'tokyo_temperature_data.json'
+        with run.stage('write_json', path=output_file):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(all_data, f, ensure_ascii=False, indent=2)
     
     print(f"\n変換完了!")
     print(f"出力ファイル: {output_file}")
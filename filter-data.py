@@ -3,26 +3,29 @@
 東京の気温データを1936年から2024年にフィルタリングするスクリプト
 """
 import json
-from datetime import datetime
+
+from ondankamap import DailySeries, Query, instrument
 
 def filter_temperature_data():
-    # 元のJSONファイルを読み込み
-    with open('src/data/tokyo_temperature_data.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with instrument.run('filter-data') as run:
+        # 元のJSONファイルを読み込み
+        with run.stage('load_json'):
+            series = DailySeries.load_json('src/data/tokyo_temperature_data.json')
     
-    # 1936年から2024年のデータのみをフィルタリング
-    filtered_data = []
-    for record in data:
-        year = record['year']
-        if 1936 <= year <= 2024:
-            filtered_data.append(record)
+        # 1936年から2024年のデータのみをフィルタリング
+        with run.stage('filter'):
+            filtered_data = Query(series).years(1936, 2024).series().to_records()
+            # 元ファイルと同じく日付文字列の順に並べる（出力の差分を出さないため）
+            filtered_data.sort(key=lambda x: x['date'])
     
-    # フィルタリング後のデータを新しいファイルに保存
-    with open('src/data/tokyo_temperature_data_filtered.json', 'w', encoding='utf-8') as f:
-        json.dump(filtered_data, f, ensure_ascii=False, indent=2)
+        # フィルタリング後のデータを新しいファイルに保存
+        output_file = 'src/data/tokyo_temperature_data_filtered.json'
+        with run.stage('write_json', path=output_file):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(filtered_data, f, ensure_ascii=False, indent=2)
     
     print(f"フィルタリング完了!")
-    print(f"元のデータ数: {len(data)}")
+    print(f"元のデータ数: {len(series)}")
     print(f"フィルタリング後: {len(filtered_data)}")
     
     if filtered_data:
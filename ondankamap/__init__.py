@@ -0,0 +1,29 @@
+"""
+Python data pipeline for ondankamap (Tokyo temperature history).
+
+Public names are resolved lazily so that ``python -m ondankamap --help`` and
+the lightweight commands do not pay for NumPy (or the forecast backends)
+until they are actually used.
+"""
+import importlib
+
+_EXPORTS = {
+    'DEFAULT_STATION': 'dataset',
+    'DailySeries': 'dataset',
+    'Query': 'query',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'ondankamap' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,544 @@
+"""
+Command line entry point: ``python -m ondankamap <command>``.
+
+Every command imports what it needs inside its handler, so ``--help``,
+``ingest`` and ``validate`` never load pandas, statsmodels or prophet; only
+``forecast`` (and ``run`` when a forecast stage is stale) pulls them in.
+``python -m ondankamap startup-check`` keeps that true.
+"""
+import argparse
+import sys
+
+DAILY_JSON = 'src/data/tokyo_temperature_data.json'
+
+
+def month_day(text):
+    """argparse type for ``MM-DD``: ``(month, day)``, Feb 29 allowed."""
+    import numpy as np
+
+    try:
+        month, day = (int(x) for x in text.split('-'))
+        # 閏年（2000年）の日付として成り立つかで月・日の範囲を確かめる
+        np.datetime64(f'2000-{month:02d}-{day:02d}')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"MM-DD 形式の日付ではありません: {text}")
+    return month, day
+
+
+def cmd_run(args):
+    from .pipeline import STATE_FILE, run_pipeline
+
+    status = run_pipeline(state_path=args.state or STATE_FILE, force=args.force,
+                          only=args.stages or None, jobs=args.jobs, dry_run=args.dry_run)
+    failed = any(s in ('failed', 'blocked') for s in status.values())
+    if not args.dry_run and not args.skip_startup_check:
+        from .startup import check
+
+        # 遅延 import が崩れていたら通常の実行を失敗させる（成果物は書き終えている）
+        print("起動時間の検査:")
+        failed = check() > 0 or failed
+    return 1 if failed else 0
+
+
+def cmd_ingest(args):
+    from . import instrument
+    from .pipeline import SOURCE_CSVS, build_daily
+
+    inputs = args.csv or list(SOURCE_CSVS)
+    with instrument.run('ingest') as run:
+        info = build_daily(inputs, [args.output], start_year=args.start_year,
+                           end_year=args.end_year, stream=args.stream, run=run)
+    print(f"出力ファイル: {args.output}")
+    print(f"総レコード数: {info['rows']}")
+    print(f"重複削除: {info['duplicates']}件")
+    if info['skipped']:
+        print(f"読み取れない行をスキップ: {info['skipped']}件")
+    return 0
+
+
+def cmd_ingest_hourly(args):
+    from .hourly import ingest_hourly
+    from .jsonstream import write_records
+
+    series, stats = ingest_hourly(args.csv, partitions=args.partitions or None,
+                                  chunk_rows=args.chunk_rows)
+    write_records(args.output, series.iter_records())
+    print(f"出力ファイル: {args.output}")
+    print(f"時別値: {stats['rows']}行 ({stats['files']}ファイル, {stats['chunks']}チャンク)")
+    print(f"日別値: {stats['days']}日 (重複削除 {stats['duplicates']}件)")
+    if args.partitions:
+        print(f"時別パーティション: {args.partitions} (更新 {stats['partitions_written']}件)")
+    print(f"処理速度: {stats['rows_per_sec']:,} 行/秒 ({stats['seconds']}秒)")
+    return 0
+
+
+def cmd_download(args):
+    import contextlib
+
+    from .download import MockJMAServer, download_sync
+    from .jsonstream import write_records
+
+    with contextlib.ExitStack() as stack:
+        url = args.url
+        if args.mock:
+            url = stack.enter_context(MockJMAServer(failure_rate=args.mock_failure_rate)).url
+        if not url:
+            print("--url か --mock を指定してください")
+            return 2
+        series, stats = download_sync(url, args.stations, args.start, args.end,
+                                      concurrency=args.concurrency, retries=args.retries,
+                                      cache_dir=args.cache)
+    write_records(args.output, series.iter_records(include_columns=False))
+    print(f"出力ファイル: {args.output}")
+    print(f"分割数: {stats['chunks']} (取得 {stats['fetched']}, キャッシュ {stats['cached']}, "
+          f"再試行 {stats['retries']})")
+    if stats['skipped']:
+        print(f"読み取れない行をスキップ: {stats['skipped']}件")
+    print(f"総レコード数: {len(series)}")
+    return 0
+
+
+def cmd_validate(args):
+    import json
+
+    from .artifacts import write_json
+    from .dataset import DailySeries
+    from .validate import quality_report
+
+    series = DailySeries.load_json(args.input)
+    report = quality_report(series)
+    if args.output:
+        write_json(args.output, report)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    problems = 0
+    for station, r in report.items():
+        print(f"{station}: {r['start']} ～ {r['end']} ({r['rows']}日, {r['years']}年間)")
+        print(f"  欠損日: {r['missing_days']}日 ({len(r['gaps'])}区間)")
+        print(f"  不完全な年: {len(r['incomplete_years'])}年")
+        print(f"  最高<最低の日: {len(r['inverted_days'])}日")
+        print(f"  重複日: {r['duplicate_days']}日")
+        problems += r['missing_days'] + len(r['inverted_days']) + r['duplicate_days']
+    return 1 if args.strict and problems else 0
+
+
+def cmd_db_load(args):
+    from . import instrument
+    from .dataset import DailySeries
+    from .store import connect, load_series
+
+    with instrument.run('db-load') as run:
+        with instrument.stage(run, 'load_json', path=args.input):
+            series = DailySeries.load_json(args.input)
+        conn = connect(args.db)
+        try:
+            with instrument.stage(run, 'upsert', full=args.full):
+                info = load_series(conn, series, full=args.full)
+        finally:
+            conn.close()
+    print(f"データベース: {args.db}")
+    print(f"送信: {info['sent']}件, 追加・更新: {info['written']}件")
+    return 0
+
+
+def cmd_verify(args):
+    import sqlite3
+
+    from .artifacts import write_json
+    from .dataset import DailySeries
+    from .verify import verify_database
+
+    series = DailySeries.load_json(args.observations) if args.observations else None
+    conn = sqlite3.connect(args.db)
+    try:
+        if series is None and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_observations'"
+        ).fetchone():
+            print(f"{args.db} に daily_observations テーブルがありません。"
+                  "先に python -m ondankamap db-load を実行するか、--observations を指定してください")
+            return 1
+        skill = verify_database(conn, series)
+    finally:
+        conn.close()
+    write_json(args.output, skill)
+    print(f"出力ファイル: {args.output}")
+    print(f"予報: {skill['forecasts']}件 (観測と照合: {skill['matched']}件)")
+    for lead, s in skill['leads'].items():
+        print(f"  {lead}日先: 最高 MAE {s['max_temp']['mae']} バイアス {s['max_temp']['bias']}, "
+              f"最低 MAE {s['min_temp']['mae']} バイアス {s['min_temp']['bias']}")
+    return 0
+
+
+def cmd_forecast(args):
+    from . import instrument
+    from .pipeline import arima_forecast, prophet_forecast
+
+    if args.model == 'arima':
+        outputs = [args.output or 'src/data/arima_monthly_max_forecast.json']
+        func = arima_forecast
+    else:
+        outputs = [args.output or 'src/data/prophet_annual_forecast.json',
+                   args.monthly_output or 'src/data/prophet_monthly_forecast.json']
+        func = prophet_forecast
+    with instrument.run(f'forecast.{args.model}') as run:
+        func([args.input], outputs, run=run)
+    print(f"出力ファイル: {', '.join(outputs)}")
+    return 0
+
+
+def cmd_backtest(args):
+    from . import instrument
+    from .artifacts import write_json
+    from .backtest import backtest
+    from .dataset import DailySeries
+
+    with instrument.run('backtest') as run:
+        series = DailySeries.load_json(args.input)
+        with instrument.stage(run, 'backtest', jobs=args.jobs):
+            report, ensemble = backtest(series, models=args.models or None, folds=args.folds,
+                                        horizon=args.horizon, jobs=args.jobs, log=print)
+    write_json(args.report, report)
+    write_json(args.output, ensemble)
+    print(f"出力ファイル: {args.report}, {args.output}")
+    return 0
+
+
+def cmd_analogs(args):
+    import time
+
+    from .analogs import AnalogIndex
+    from .dataset import DailySeries, doy_from_md
+
+    series = DailySeries.load_json(args.input)
+    station = args.station or series.stations[0]
+    part = series.for_station(station)
+    year = args.year or int(part.year[-1])
+    if args.through:
+        through = int(doy_from_md(*args.through))
+    else:
+        in_year = part.year == year
+        through = int(part.doy[in_year][-1]) if in_year.any() else None
+
+    started = time.perf_counter()
+    index = AnalogIndex(series, window=args.window)
+    built = time.perf_counter()
+    analogs = index.nearest(station, year, through=through, k=args.k,
+                            stations=series.stations if args.all_stations else None)
+    elapsed = time.perf_counter() - built
+    print(f"{station} {year}年（366日枠の {through or 366} 日目まで）に似た年:")
+    for i, a in enumerate(analogs, 1):
+        print(f"  {i}. {a['station']} {a['year']}年  RMS差 {a['distance']:.2f}℃")
+    print(f"索引作成 {(built - started) * 1000:.0f}ms, 検索 {elapsed * 1000:.2f}ms")
+    return 0
+
+
+def cmd_range(args):
+    from .dataset import DailySeries
+    from .download import format_iso, parse_date
+    from .rangeindex import THRESHOLDS, RangeIndex
+
+    start, end = parse_date(args.start), parse_date(args.end)
+    if start > end:
+        print(f"開始日が終了日より後です: {args.start} > {args.end}")
+        return 2
+    index = RangeIndex.build(DailySeries.load_json(args.input), station=args.station)
+    r = index.stats(start, end)
+    print(f"期間: {format_iso(max(start, index.first_day))} 〜 {format_iso(min(end, index.last_day))}"
+          f" ({r['days']}日, 観測 {r['max_temp_days']}日)")
+    if r['max_temp_days']:
+        print(f"最高気温: 平均 {r['max_temp_mean']:.1f}℃, 標準偏差 {r['max_temp_var'] ** 0.5:.2f}℃")
+        print(f"最低気温: 平均 {r['min_temp_mean']:.1f}℃, 標準偏差 {r['min_temp_var'] ** 0.5:.2f}℃")
+    print(f"冷房度日 (基準{index.cooling_base:g}℃): {r['cooling_degree_days']:.1f}")
+    print(f"暖房度日 (基準{index.heating_base:g}℃): {r['heating_degree_days']:.1f}")
+    for name in THRESHOLDS:
+        print(f"{name}: {r[name]}日")
+    return 0
+
+
+def cmd_records(args):
+    import os
+
+    from .artifacts import write_json
+    from .dataset import DailySeries
+    from .records import RecordTracker
+
+    series = DailySeries.load_json(args.input)
+    if args.rebuild or not os.path.exists(args.state):
+        tracker = RecordTracker.rebuild(series)
+        events = []
+        print(f"記録を再計算しました: {', '.join(series.stations)}")
+    else:
+        tracker = RecordTracker.load(args.state)
+        events = tracker.update(series)
+    tracker.save(args.state)
+    scope_names = {'doy': '同日', 'month': '月', 'all': '観測史上'}
+    for e in events:
+        where = scope_names[e['scope']] + (f"({e['key']})" if e['key'] else '')
+        print(f"{e['station']} {e['date']} {e['record']} {where}: {e['value']}℃ "
+              f"(従来 {e['previous']}℃, {e['previous_date']})")
+    print(f"新記録: {len(events)}件")
+    if args.events:
+        write_json(args.events, events)
+    print(f"状態ファイル: {args.state}")
+    return 0
+
+
+def cmd_trends(args):
+    from .artifacts import write_json
+    from .dataset import DailySeries
+    from .trend import trend_table
+
+    series = DailySeries.load_json(args.input)
+    table = trend_table(series, start=args.start, end=args.end, resamples=args.resamples,
+                        block=args.block, seed=args.seed, jobs=args.jobs)
+    write_json(args.output, table, indent=None)
+    print(f"期間: {table['start']}-{table['end']} (ブロック長 {table['block']}年, "
+          f"再標本 {table['resamples']}回, {int(table['confidence'] * 100)}%区間)")
+    for station, columns in table['stations'].items():
+        for column, trends in columns.items():
+            t = trends['annual']
+            print(f"{station} {column}: {t['slope']:+.3f}℃/10年 "
+                  f"[{t['low']:+.3f}, {t['high']:+.3f}]" if t['slope'] is not None
+                  else f"{station} {column}: データ不足")
+    print(f"出力ファイル: {args.output}")
+    return 0
+
+
+def cmd_changepoints(args):
+    from .artifacts import write_json
+    from .changepoint import detect_changepoints
+    from .ingest import merge, parse_csv_file
+    from .pipeline import SOURCE_CSVS
+
+    series, _ = merge([parse_csv_file(path) for path in args.csv or SOURCE_CSVS])
+    report = detect_changepoints(series, min_size=args.min_months, jobs=args.jobs)
+    write_json(args.output, report)
+    for station, columns in report.items():
+        for column, result in columns.items():
+            for b in result['breaks']:
+                note = f" (均質番号/移転 {b['nearest_event']} と一致)" if b.get('matched') else ''
+                print(f"{station} {column}: {b['date']} {b['shift']:+.2f}℃{note}")
+    print(f"出力ファイル: {args.output}")
+    return 0
+
+
+def cmd_diff(args):
+    import json
+    import time
+
+    from .artifacts import write_json
+    from .dataset import DailySeries
+    from .diff import check_expected, diff_series
+
+    started = time.perf_counter()
+    old, new = DailySeries.load_json(args.old), DailySeries.load_json(args.new)
+    loaded = time.perf_counter()
+    report = diff_series(old, new, tolerance=args.tolerance)
+    elapsed = time.perf_counter() - loaded
+    print(f"旧: {args.old} ({report['old']['rows']}日)")
+    print(f"新: {args.new} ({report['new']['rows']}日)")
+    print(f"追加 {report['added']}日 / 削除 {report['removed']}日 / 変更 {report['changed']}日"
+          f" (共通 {report['shared']}日)")
+    for column, stats in report['columns'].items():
+        if stats['changed']:
+            print(f"  {column}: {stats['changed']}日 (最大差 {stats['max_abs_delta']}℃)")
+    for row in report['years'][:args.years]:
+        print(f"  {row['year']}: +{row['added']} -{row['removed']} ~{row['changed']}")
+    if len(report['years']) > args.years:
+        print(f"  ...ほか{len(report['years']) - args.years}年")
+    print(f"読み込み {(loaded - started) * 1000:.0f}ms, 比較 {elapsed * 1000:.1f}ms")
+    if args.output:
+        write_json(args.output, report)
+    if args.expect:
+        with open(args.expect, encoding='utf-8') as f:
+            problems = check_expected(report, json.load(f))
+        for problem in problems:
+            print(f"想定外の差分: {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+def cmd_runs(args):
+    from .instrument import print_summary, read_runs, summarize
+
+    runs = read_runs(args.log, args.script)
+    if not runs:
+        print("実行ログがありません")
+        return 1
+    print_summary(summarize(runs, args.slow_factor))
+    return 0
+
+
+def cmd_bench(args):
+    from .bench import main as bench_main
+
+    return bench_main(args.extra)
+
+
+def cmd_startup_check(args):
+    from .startup import main as startup_main
+
+    return startup_main(['--budget-ms', str(args.budget_ms), '--repeat', str(args.repeat)])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ondankamap',
+                                     description='ondankamap データパイプライン')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='古くなった成果物だけを再生成する')
+    run.add_argument('stages', nargs='*', help='対象ステージ（上流も含めて実行、既定: 全て）')
+    run.add_argument('--force', action='append', default=[], metavar='STAGE',
+                     help='ハッシュに関係なく再実行するステージ（all で全て）')
+    run.add_argument('--jobs', type=int, help='並列実行数')
+    run.add_argument('--dry-run', action='store_true', help='実行せずに対象ステージを表示')
+    run.add_argument('--state', help='状態ファイルのパス')
+    run.add_argument('--skip-startup-check', action='store_true',
+                     help='実行後の起動時間の検査（startup-check）を省く')
+    run.set_defaults(handler=cmd_run)
+
+    ingest = commands.add_parser('ingest', help='JMAのCSVを統合して日別JSONを作成する')
+    ingest.add_argument('csv', nargs='*', help='入力CSV（古い順、後のファイルを優先）')
+    ingest.add_argument('--output', default=DAILY_JSON)
+    ingest.add_argument('--start-year', type=int, default=1880)
+    ingest.add_argument('--end-year', type=int, default=2024)
+    ingest.add_argument('--stream', action='store_true',
+                        help='レコード単位で処理してメモリ使用量を一定に保つ')
+    ingest.set_defaults(handler=cmd_ingest)
+
+    hourly = commands.add_parser('ingest-hourly', help='JMAの時別値CSVを日別の最高・最低・平均に集約する')
+    hourly.add_argument('csv', nargs='+', help='入力CSV（古い順、後のファイルを優先）')
+    hourly.add_argument('--output', default='data/hourly_daily.json')
+    hourly.add_argument('--partitions', default='data/hourly',
+                        help='時別値を月ごとに保存するディレクトリ（空文字で保存しない）')
+    hourly.add_argument('--chunk-rows', type=int, default=1 << 16, help='一度に読む行数')
+    hourly.set_defaults(handler=cmd_ingest_hourly)
+
+    download = commands.add_parser('download', help='JMAのCSVを分割して並行ダウンロードする')
+    download.add_argument('stations', nargs='+')
+    download.add_argument('--start', required=True, help='開始日 (YYYY-MM-DD)')
+    download.add_argument('--end', required=True, help='終了日 (YYYY-MM-DD)')
+    download.add_argument('--url', help='CSVを返すエンドポイント')
+    download.add_argument('--mock', action='store_true', help='ローカルの擬似サーバーから取得する')
+    download.add_argument('--mock-failure-rate', type=float, default=0.0)
+    download.add_argument('--concurrency', type=int, default=4)
+    download.add_argument('--retries', type=int, default=3)
+    download.add_argument('--cache', help='取得済みの分割を保存して再開に使うディレクトリ')
+    download.add_argument('--output', required=True)
+    download.set_defaults(handler=cmd_download)
+
+    validate = commands.add_parser('validate', help='日別JSONの品質レポートを表示する')
+    validate.add_argument('input', nargs='?', default=DAILY_JSON)
+    validate.add_argument('--output', help='レポートJSONの保存先')
+    validate.add_argument('--json', action='store_true', help='レポートをJSONで表示')
+    validate.add_argument('--strict', action='store_true', help='問題があれば終了コード1')
+    validate.set_defaults(handler=cmd_validate)
+
+    db_load = commands.add_parser('db-load', help='日別データをSQLiteに一括投入する')
+    db_load.add_argument('input', nargs='?', default=DAILY_JSON)
+    db_load.add_argument('--db', default='data/weather_forecast.db')
+    db_load.add_argument('--full', action='store_true', help='全期間を照合する（既定は新しい日のみ）')
+    db_load.set_defaults(handler=cmd_db_load)
+
+    verify = commands.add_parser('verify', help='保存済みの予報を観測値と照合する')
+    verify.add_argument('--db', default='data/weather_forecast.db')
+    verify.add_argument('--observations', help='観測値の日別JSON（既定: daily_observations テーブル）')
+    verify.add_argument('--output', default='src/data/forecast_skill.json')
+    verify.set_defaults(handler=cmd_verify)
+
+    forecast = commands.add_parser('forecast', help='ARIMA/Prophetで予測する（重いライブラリを読み込む）')
+    forecast.add_argument('model', choices=['arima', 'prophet'])
+    forecast.add_argument('--input', default=DAILY_JSON)
+    forecast.add_argument('--output', help='出力先（prophetは年平均）')
+    forecast.add_argument('--monthly-output', help='prophetの月別出力先')
+    forecast.set_defaults(handler=cmd_forecast)
+
+    backtest = commands.add_parser('backtest', help='予測モデルを時系列交差検証してアンサンブルを作る')
+    backtest.add_argument('--input', default=DAILY_JSON)
+    backtest.add_argument('--models', nargs='*', choices=['linear', 'arima', 'prophet'])
+    backtest.add_argument('--folds', type=int, default=5)
+    backtest.add_argument('--horizon', type=int, default=10, help='各分割で評価する年数')
+    backtest.add_argument('--jobs', type=int, help='並列実行数（1で逐次実行）')
+    backtest.add_argument('--report', default='src/data/backtest_report.json')
+    backtest.add_argument('--output', default='src/data/ensemble_forecast.json')
+    backtest.set_defaults(handler=cmd_backtest)
+
+    analogs = commands.add_parser('analogs', help='今年（指定年）のここまでに似た過去の年を探す')
+    analogs.add_argument('--input', default=DAILY_JSON)
+    analogs.add_argument('--station', help='観測点（既定: 最初の観測点）')
+    analogs.add_argument('--year', type=int, help='対象年（既定: 最新の年）')
+    analogs.add_argument('--through', type=month_day, help='比較する最終日 MM-DD（既定: 対象年の最終観測日）')
+    analogs.add_argument('-k', type=int, default=5, help='表示する年数')
+    analogs.add_argument('--window', type=int, default=15, help='移動平均の日数')
+    analogs.add_argument('--all-stations', action='store_true', help='他の観測点の年も候補にする')
+    analogs.set_defaults(handler=cmd_analogs)
+
+    range_ = commands.add_parser('range', help='任意の期間の平均・分散・度日・日数を表示する')
+    range_.add_argument('start', help='開始日 (YYYY-MM-DD)')
+    range_.add_argument('end', help='終了日 (YYYY-MM-DD、この日を含む)')
+    range_.add_argument('--input', default=DAILY_JSON)
+    range_.add_argument('--station', help='観測点（複数の観測点を含む場合に指定）')
+    range_.set_defaults(handler=cmd_range)
+
+    records = commands.add_parser('records', help='新しい日の記録更新（同日・月・観測史上）を検出する')
+    records.add_argument('--input', default=DAILY_JSON)
+    records.add_argument('--state', default='data/record_state.npz', help='記録の状態ファイル')
+    records.add_argument('--rebuild', action='store_true', help='全期間から記録を作り直す')
+    records.add_argument('--events', help='新記録の一覧をJSONで保存する')
+    records.set_defaults(handler=cmd_records)
+
+    trends = commands.add_parser('trends', help='気温トレンドとブロック・ブートストラップ信頼区間')
+    trends.add_argument('--input', default=DAILY_JSON)
+    trends.add_argument('--start', type=int, help='開始年')
+    trends.add_argument('--end', type=int, help='終了年')
+    trends.add_argument('--resamples', type=int, default=2000, help='再標本の数')
+    trends.add_argument('--block', type=int, default=5, help='ブロック長（年）')
+    trends.add_argument('--seed', type=int, default=0, help='乱数のシード')
+    trends.add_argument('--jobs', type=int, default=1, help='並列実行数（1で逐次実行）')
+    trends.add_argument('--output', default='src/data/warming_trends.json')
+    trends.set_defaults(handler=cmd_trends)
+
+    changepoints = commands.add_parser('changepoints', help='月別偏差の段差（変化点）を検出する')
+    changepoints.add_argument('csv', nargs='*', help='入力CSV（均質番号の照合に使う）')
+    changepoints.add_argument('--min-months', type=int, default=24, help='区間の最短月数')
+    changepoints.add_argument('--jobs', type=int, help='並列実行数（1で逐次実行）')
+    changepoints.add_argument('--output', default='src/data/change_points.json')
+    changepoints.set_defaults(handler=cmd_changepoints)
+
+    diff = commands.add_parser('diff', help='2つの日別JSONの差分（追加・削除・変更日）を表示する')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    diff.add_argument('--tolerance', type=float, default=0.0, help='この差以下は変更とみなさない')
+    diff.add_argument('--expect', help='想定する差分件数のJSON（一致しなければ終了コード1）')
+    diff.add_argument('--output', help='差分の詳細をJSONで保存する')
+    diff.add_argument('--years', type=int, default=20, help='表示する年の数')
+    diff.set_defaults(handler=cmd_diff)
+
+    runs = commands.add_parser('runs', help='実行ログを段階別に要約する')
+    runs.add_argument('--log', help='実行ログのパス')
+    runs.add_argument('--script', help='対象スクリプト名で絞り込む')
+    runs.add_argument('--slow-factor', type=float, default=1.5)
+    runs.set_defaults(handler=cmd_runs)
+
+    # 引数はそのまま ondankamap.bench に渡す
+    bench = commands.add_parser('bench', help='ベンチマークを実行する', add_help=False)
+    bench.set_defaults(handler=cmd_bench)
+
+    startup = commands.add_parser('startup-check', help='軽量コマンドの起動時間を検査する')
+    startup.add_argument('--budget-ms', type=float, default=300)
+    startup.add_argument('--repeat', type=int, default=5)
+    startup.set_defaults(handler=cmd_startup_check)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.handler is not cmd_bench:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.extra = extra
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
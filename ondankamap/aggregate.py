@@ -0,0 +1,73 @@
+"""
+Year/month aggregations shared by the forecast scripts and the analyses.
+
+These are the Python counterparts of ``aggregateAnnualData`` and
+``aggregateMonthlyYearlyData`` in ``src/lib/data-processor.ts``, computed in
+one group-by pass instead of per-record loops.
+"""
+import numpy as np
+
+from .dataset import DAYS_IN_GRID
+from .query import Query
+
+
+def annual_means(series):
+    """Per station and year: mean max/min temperature and day count."""
+    return Query(series).group_by('station', 'year').agg(
+        max_temp=('max_temp', 'mean'),
+        min_temp=('min_temp', 'mean'),
+        days=('max_temp', 'count'),
+    )
+
+
+def monthly_yearly_means(series, month=None):
+    """Per station, year and month mean max/min; restrict with ``month``."""
+    query = Query(series)
+    if month is not None:
+        query = query.months(month)
+    return query.group_by('station', 'year', 'month').agg(
+        max_temp=('max_temp', 'mean'),
+        min_temp=('min_temp', 'mean'),
+        days=('max_temp', 'count'),
+    )
+
+
+def yearly_series(series, column='max_temp', month=None, station=None):
+    """Return ``(years, means)`` of a column for one station (and month)."""
+    query = Query(series)
+    if station is not None:
+        query = query.station(station)
+    if month is not None:
+        query = query.months(month)
+    table = query.group_by('year').agg(value=(column, 'mean'))
+    return table['year'].astype(int), table['value']
+
+
+def station_year_doy_grid(series, column='max_temp'):
+    """Return ``(years, grid)`` with ``grid[station, year, doy - 1]``.
+
+    Stations follow ``series.stations``; ``years`` spans every year present
+    in any station, so stations without a year have an all-NaN row. The
+    grid has 366 slots per year (Feb 29 is slot 60, NaN in common years).
+    """
+    values = series.column(column)
+    years, row = np.unique(series.year, return_inverse=True)
+    grid = np.full((len(series.stations), len(years), DAYS_IN_GRID), np.nan)
+    grid[series.station, row, series.doy - 1] = values
+    return years.astype(int), grid
+
+
+def year_doy_grid(series, column='max_temp', station=None):
+    """Return ``(years, grid)`` with ``grid[year, doy - 1]`` for one station.
+
+    Days without data are NaN; see :func:`station_year_doy_grid`.
+    """
+    if station is not None:
+        series = series.for_station(station)
+        code = series.station_code(station)
+    elif len(series.stations) > 1:
+        raise ValueError("複数の観測点を含む系列には station を指定してください")
+    else:
+        code = 0
+    years, grid = station_year_doy_grid(series, column)
+    return years, grid[code]
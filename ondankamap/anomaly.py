@@ -0,0 +1,118 @@
+"""
+Daily anomalies against a smoothed day-of-year climatology.
+
+The baseline for each of the 366 day-of-year slots is the mean over the
+reference period (1991–2020 by default, the current JMA 平年値 period),
+smoothed with a circular moving average so that Dec 31 and Jan 1 are
+neighbours. Anomalies are stored as ``max_anomaly``/``min_anomaly`` float32
+columns of the series, so charts and :class:`ondankamap.query.Query`
+aggregations read them directly::
+
+    series, baselines = with_anomalies(series, reference=(1991, 2020))
+    Query(series).group_by('year').agg(anomaly=('max_anomaly', 'mean'))
+
+A station without data in the reference period gets no baseline and NaN
+anomalies rather than failing the whole series. The pipeline publishes
+only the columns, one ``{"date", "max_anomaly", "min_anomaly"}`` record
+per day (see :func:`anomaly_records`), next to the daily JSON.
+"""
+import numpy as np
+
+from .aggregate import year_doy_grid
+from .dataset import format_date
+
+REFERENCE_PERIOD = (1991, 2020)
+WINDOW = 31
+
+ANOMALY_COLUMNS = {'max_temp': 'max_anomaly', 'min_temp': 'min_anomaly'}
+
+
+def circular_moving_average(values, window=WINDOW):
+    """NaN-aware centred moving average that wraps around the array ends."""
+    values = np.asarray(values, dtype=np.float64)
+    if window % 2 == 0:
+        raise ValueError("window must be odd")
+    half = window // 2
+    valid = ~np.isnan(values)
+    padded = np.concatenate([values[-half:], values, values[:half]]) if half else values
+    padded_valid = np.concatenate([valid[-half:], valid, valid[:half]]) if half else valid
+    # 累積和の差で窓内の合計と有効数を一度に求める
+    total = np.concatenate([[0.0], np.cumsum(np.where(padded_valid, padded, 0.0))])
+    count = np.concatenate([[0], np.cumsum(padded_valid)])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total[window:] - total[:-window]) / (count[window:] - count[:-window])
+
+
+def climatology(series, column='max_temp', reference=REFERENCE_PERIOD, window=WINDOW,
+                station=None):
+    """Smoothed 366-slot baseline of ``column`` over the reference years."""
+    years, grid = year_doy_grid(series, column, station=station)
+    start, end = reference
+    rows = (years >= start) & (years <= end)
+    if not rows.any():
+        raise ValueError(f"基準期間 {start}-{end} のデータがありません")
+    reference_grid = grid[rows]
+    counts = (~np.isnan(reference_grid)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = np.nansum(reference_grid, axis=0) / counts
+    return circular_moving_average(raw, window)
+
+
+def with_anomalies(series, reference=REFERENCE_PERIOD, window=WINDOW):
+    """Add ``max_anomaly``/``min_anomaly`` columns, one baseline per station.
+
+    Returns ``(series, baselines)`` with ``baselines[station][column]`` the
+    366-slot baseline. Stations without reference-period data are left out
+    of ``baselines`` and keep NaN anomalies.
+    """
+    anomalies = {name: np.full(len(series), np.nan, dtype=np.float32)
+                 for name in ANOMALY_COLUMNS.values()}
+    baselines = {}
+    doy = series.doy - 1
+    for code, (start, stop) in series.station_bounds().items():
+        if start == stop:
+            continue
+        part = series.take(slice(start, stop))
+        station = series.stations[code]
+        if not ((part.year >= reference[0]) & (part.year <= reference[1])).any():
+            continue
+        baselines[station] = {}
+        for column, name in ANOMALY_COLUMNS.items():
+            baseline = climatology(part, column, reference, window, station=station)
+            departure = series.column(column)[start:stop] - baseline[doy[start:stop]]
+            anomalies[name][start:stop] = np.round(departure, 2)
+            baselines[station][column] = baseline
+    for name, values in anomalies.items():
+        series = series.with_column(name, values)
+    return series, baselines
+
+
+def anomaly_records(series, digits=2):
+    """Yield ``{'date', 'max_anomaly', 'min_anomaly'}`` for every day of ``series``.
+
+    ``station`` is added when the series has several; missing anomalies
+    are None so the JSON stays valid.
+    """
+    include_station = len(series.stations) > 1
+    year, month, day = series.year.tolist(), series.month.tolist(), series.dom.tolist()
+    station = series.station.tolist()
+    columns = {}
+    for name in ANOMALY_COLUMNS.values():
+        values = np.round(series.column(name).astype(np.float64), digits)
+        columns[name] = [None if v != v else v for v in values.tolist()]
+    for i in range(len(series)):
+        record = {'date': format_date(year[i], month[i], day[i])}
+        if include_station:
+            record['station'] = series.stations[station[i]]
+        for name, values in columns.items():
+            record[name] = values[i]
+        yield record
+
+
+def baseline_table(baselines, digits=2):
+    """JSON-ready ``{station: {column: [366 values]}}``."""
+    return {
+        station: {column: [None if np.isnan(v) else round(float(v), digits) for v in values]
+                  for column, values in columns.items()}
+        for station, columns in baselines.items()
+    }
@@ -0,0 +1,115 @@
+"""
+Writing JSON artifacts consumed by the Next.js app.
+
+Artifacts are written atomically (temp file + rename in the same directory)
+and only when their content actually changes, so that an unchanged rerun
+does not touch the file's mtime and trigger a Next.js rebuild.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def _file_mode(path):
+    """Mode for a replaced file: keep the old one, else honour the umask."""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_bytes(path, data):
+    """Atomically replace ``path`` with ``data`` unless it already matches.
+
+    Returns True when the file was written.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp は 0600 で作成するため、通常のファイルと同じ権限に戻す
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+class open_atomic:
+    """Context manager for streaming a text artifact to disk atomically.
+
+    Text is written to a temp file next to ``path``; on a clean exit the temp
+    file replaces ``path`` unless the content is identical, in which case it
+    is discarded. ``changed`` tells which happened. On error ``path`` is left
+    as it was.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.changed = False
+        self._tmp_path = None
+        self._file = None
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path),
+                                              suffix='.tmp')
+        self._file = os.fdopen(fd, 'w', encoding=self.encoding, newline='')
+        return self
+
+    def write(self, text):
+        return self._file.write(text)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None and file_digest(self._tmp_path) != file_digest(self.path):
+                os.chmod(self._tmp_path, _file_mode(self.path))
+                os.replace(self._tmp_path, self.path)
+                self.changed = True
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+        return False
+
+
+def write_json(path, obj, indent=2):
+    """Write ``obj`` as UTF-8 JSON in the format the scripts always used.
+
+    Returns True when the file content changed.
+    """
+    text = json.dumps(obj, ensure_ascii=False, indent=indent)
+    return write_bytes(path, text.encode('utf-8'))
@@ -0,0 +1,184 @@
+"""
+Rolling-origin backtesting of the yearly forecasts, and an error-weighted
+ensemble.
+
+Every model in :data:`MODELS` is evaluated on the annual series and the 12
+per-month series of yearly mean max temperature. For each fold the model is
+fitted on the years before an origin and scored on the ``horizon`` years
+after it; origins step back from the end of the record. The
+(series, model, fold) jobs, plus one full-history fit per (series, model)
+for the ensemble, are independent and run in a process pool::
+
+    python -m ondankamap backtest --jobs 4
+
+The ensemble forecast weights each model by the inverse of its backtest MAE
+on that series. Models whose backend is not installed are reported as
+skipped and left out of the ensemble. A model with no finite forecast for a
+year is left out of that year's average, and a year no model can forecast is
+omitted, so the ensemble JSON never holds NaN.
+"""
+import numpy as np
+
+from .aggregate import yearly_series
+from .forecast import FUTURE_YEARS
+
+FOLDS = 5
+HORIZON = 10
+STEP = 5
+MIN_TRAIN_YEARS = 30
+
+
+def _linear(years, values, target_years):
+    slope, intercept = np.polyfit(years, values, 1)
+    return intercept + slope * np.asarray(target_years, dtype=np.float64)
+
+
+def _arima(years, values, target_years):
+    from statsmodels.tsa.arima.model import ARIMA
+
+    fit = ARIMA(values, order=(1, 1, 1)).fit()
+    steps = int(max(target_years)) - int(years[-1])
+    forecast = np.asarray(fit.forecast(steps=steps))
+    return forecast[np.asarray(target_years) - int(years[-1]) - 1]
+
+
+def _prophet(years, values, target_years):
+    from .forecast import _prophet_yearly
+
+    predicted = _prophet_yearly(years, values, int(max(target_years)) - int(years[-1]))
+    return np.array([predicted.get(str(y), np.nan) for y in target_years])
+
+
+# モデル名 → (学習年, 値, 予測したい年) から予測値を返す関数
+MODELS = {
+    'linear': _linear,
+    'arima': _arima,
+    'prophet': _prophet,
+}
+
+
+def series_table(series):
+    """``{name: (years, values)}`` for the annual and the 12 monthly series."""
+    table = {'annual': yearly_series(series, 'max_temp')}
+    for month in range(1, 13):
+        table[str(month)] = yearly_series(series, 'max_temp', month=month)
+    return table
+
+
+def fold_origins(years, folds=FOLDS, horizon=HORIZON, step=STEP,
+                 min_train=MIN_TRAIN_YEARS):
+    """Index of the first test year of each fold, oldest first."""
+    last_origin = len(years) - horizon
+    origins = [last_origin - step * k for k in range(folds)]
+    return sorted(o for o in origins if o >= min_train)
+
+
+def _run_job(job):
+    """Worker: ``job = (series, model, fold, years, values, origin, horizon, future_years)``.
+
+    ``fold`` is None for the full-history fit used by the ensemble.
+    """
+    name, model, fold, years, values, origin, horizon, future = job
+    try:
+        if fold is None:
+            target = np.arange(int(years[-1]) + 1, max(future) + 1)
+            return job[:3], {'years': target, 'forecast': MODELS[model](years, values, target)}
+        train_years, train_values = years[:origin], values[:origin]
+        test_years, test_values = years[origin:origin + horizon], values[origin:origin + horizon]
+        predicted = MODELS[model](train_years, train_values, test_years)
+        return job[:3], {'errors': predicted - test_values}
+    except ImportError as e:
+        return job[:3], {'skipped': str(e)}
+    except Exception as e:
+        return job[:3], {'error': repr(e)}
+
+
+def _scores(errors):
+    errors = errors[~np.isnan(errors)]
+    if not len(errors):
+        return {'mae': None, 'rmse': None, 'bias': None, 'n': 0}
+    return {
+        'mae': round(float(np.mean(np.abs(errors))), 3),
+        'rmse': round(float(np.sqrt(np.mean(errors ** 2))), 3),
+        'bias': round(float(np.mean(errors)), 3),
+        'n': int(len(errors)),
+    }
+
+
+def backtest(series, models=None, folds=FOLDS, horizon=HORIZON, step=STEP,
+             future_years=FUTURE_YEARS, jobs=None, log=None):
+    """Backtest ``models`` on every series and build the ensemble.
+
+    ``jobs=1`` runs in-process; otherwise jobs go to a process pool with
+    ``jobs`` workers (default: CPU count). Returns ``(report, ensemble)``:
+    ``report[series][model]`` holds MAE/RMSE/bias over all folds (or the
+    reason it was skipped), ``ensemble[series]`` maps year to value for the
+    observed years followed by the weighted forecast. ``log`` (e.g.
+    ``print``) receives one MAE summary line per series.
+    """
+    models = list(models or MODELS)
+    table = series_table(series)
+    work = []
+    for name, (years, values) in table.items():
+        if len(years) == 0:
+            continue
+        values = np.asarray(values, dtype=np.float64)
+        for model in models:
+            for fold, origin in enumerate(fold_origins(years, folds, horizon, step)):
+                work.append((name, model, fold, years, values, origin, horizon, future_years))
+            work.append((name, model, None, years, values, None, horizon, future_years))
+
+    if jobs == 1:
+        results = list(map(_run_job, work))
+    else:
+        # プロセスプールは実行時にだけ読み込む
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_run_job, work, chunksize=4))
+
+    errors, finals, problems = {}, {}, {}
+    for (name, model, fold), result in results:
+        key = (name, model)
+        if 'skipped' in result or 'error' in result:
+            problems.setdefault(key, result.get('skipped') or result.get('error'))
+        elif fold is None:
+            finals[key] = result
+        else:
+            errors.setdefault(key, []).append(result['errors'])
+
+    report, ensemble = {}, {}
+    for name, (years, values) in table.items():
+        report[name] = {}
+        members = []
+        for model in models:
+            key = (name, model)
+            if key in problems:
+                report[name][model] = {'skipped': problems[key]}
+            elif key not in errors:
+                report[name][model] = {'skipped': '学習期間が足りません'}
+            else:
+                scores = _scores(np.concatenate(errors[key]))
+                scores['folds'] = len(errors[key])
+                report[name][model] = scores
+                if scores['mae'] and key in finals:
+                    members.append((model, 1.0 / scores['mae'], finals[key]))
+        if not members:
+            continue
+        total = sum(weight for _, weight, _ in members)
+        for model, weight, _ in members:
+            report[name][model]['weight'] = round(weight / total, 3)
+        forecasts = np.array([final['forecast'] for _, _, final in members], dtype=np.float64)
+        weights = np.array([weight for _, weight, _ in members])[:, None]
+        finite = np.isfinite(forecasts)
+        # 予測できなかったモデルはその年の加重平均から外して重みを正規化し直す
+        weight_sum = (weights * finite).sum(axis=0)
+        combined = (weights * np.where(finite, forecasts, 0.0)).sum(axis=0)
+        result = {str(y): float(v) for y, v in zip(years, values) if np.isfinite(v)}
+        result.update({str(y): float(c / w) for y, c, w in
+                       zip(members[0][2]['years'], combined, weight_sum) if w > 0})
+        ensemble[name] = result
+        if log is not None:
+            log(f"{name}: " + ', '.join(
+                f"{m} MAE {report[name][m]['mae']}" for m in models if 'mae' in report[name][m]))
+    return report, ensemble
@@ -0,0 +1,174 @@
+"""
+Benchmark suite for the pipeline stages.
+
+Each stage (CSV parse, merge/dedup, JSON write, quality report, aggregation,
+ARIMA fit, Prophet fit) is timed against synthetic JMA CSVs for several
+``stations x years`` sizes. Results are saved as JSON so that a later run can
+be compared against them::
+
+    python -m ondankamap.bench --size 1x145 --size 20x145 --output bench.json
+    python -m ondankamap.bench --size 1x145 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from .aggregate import annual_means, monthly_yearly_means
+from .artifacts import write_json
+from .ingest import merge, parse_csv_file
+from .synth import generate_dataset
+from .validate import quality_report
+
+STAGES = ('csv_parse', 'merge_dedup', 'json_write', 'quality_report',
+          'aggregation', 'arima_fit', 'prophet_fit')
+MODEL_STAGES = ('arima_fit', 'prophet_fit')
+
+
+def _time(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return ``(best_seconds, last_result)``."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_size(stations, years, workdir, repeat=3, encoding='utf-8', models=True):
+    """Benchmark every stage for one synthetic dataset size."""
+    files = generate_dataset(os.path.join(workdir, f'{stations}x{years}'), stations, years,
+                             encoding=encoding)
+    paths = [path for station_paths in files.values() for path in station_paths]
+    stages = {}
+
+    seconds, parts = _time(lambda: [parse_csv_file(p) for p in paths], repeat)
+    rows = sum(len(p) for p in parts)
+    stages['csv_parse'] = {'seconds': seconds}
+
+    seconds, (series, _) = _time(lambda: merge(parts), repeat)
+    stages['merge_dedup'] = {'seconds': seconds}
+
+    json_path = os.path.join(workdir, 'bench_output.json')
+    seconds, _ = _time(lambda: write_json(json_path, series.to_records()), repeat)
+    stages['json_write'] = {'seconds': seconds, 'bytes': os.path.getsize(json_path)}
+
+    seconds, _ = _time(lambda: quality_report(series), repeat)
+    stages['quality_report'] = {'seconds': seconds}
+
+    seconds, _ = _time(lambda: (annual_means(series), monthly_yearly_means(series)), repeat)
+    stages['aggregation'] = {'seconds': seconds}
+
+    # モデル学習は1観測点分だけ計測する（観測点数に対して線形なため）
+    first = series.for_station(series.stations[0])
+    for name in MODEL_STAGES:
+        if not models:
+            stages[name] = {'skipped': 'disabled'}
+            continue
+        try:
+            from . import forecast
+            fit = forecast.arima_monthly_forecast if name == 'arima_fit' else forecast.prophet_forecast
+            seconds, _ = _time(lambda: fit(first), 1)
+            stages[name] = {'seconds': seconds, 'rows': len(first)}
+        except ImportError as e:
+            stages[name] = {'skipped': str(e)}
+
+    for stage in stages.values():
+        if 'seconds' not in stage:
+            continue
+        stage.setdefault('rows', rows)
+        if stage['seconds'] > 0:
+            stage['rows_per_second'] = stage['rows'] / stage['seconds']
+
+    return {'stations': stations, 'years': years, 'rows': rows, 'files': len(paths),
+            'stages': stages}
+
+
+def compare(current, baseline, threshold=1.25):
+    """Return ``[(size, stage, ratio)]`` where a stage got slower than ``threshold``."""
+    previous = {(r['stations'], r['years']): r for r in baseline.get('runs', [])}
+    regressions = []
+    for run in current['runs']:
+        old = previous.get((run['stations'], run['years']))
+        if old is None:
+            continue
+        size = f"{run['stations']}x{run['years']}"
+        for name, stage in run['stages'].items():
+            old_stage = old['stages'].get(name, {})
+            if 'seconds' not in stage or not old_stage.get('seconds'):
+                continue
+            ratio = stage['seconds'] / old_stage['seconds']
+            print(f"  {size:>8} {name:<15} {old_stage['seconds']:9.4f}s -> "
+                  f"{stage['seconds']:9.4f}s ({ratio:5.2f}x)")
+            if ratio > threshold:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def parse_size(text):
+    stations, years = text.lower().split('x')
+    return int(stations), int(years)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='パイプライン各段階のベンチマーク')
+    parser.add_argument('--size', action='append', type=parse_size, metavar='NxM',
+                        help='観測点数x年数（複数指定可、既定: 1x145）')
+    parser.add_argument('--repeat', type=int, default=3, help='各段階の繰り返し回数（最良値を採用）')
+    parser.add_argument('--encoding', default='utf-8', choices=['utf-8', 'shift_jis'])
+    parser.add_argument('--no-models', action='store_true', help='ARIMA/Prophetの計測を省略')
+    parser.add_argument('--output', help='結果JSONの保存先')
+    parser.add_argument('--compare', help='比較対象の過去の結果JSON')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='この倍率より遅くなった段階を退行とみなす')
+    args = parser.parse_args(argv)
+
+    sizes = args.size or [(1, 145)]
+    result = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'encoding': args.encoding,
+        'repeat': args.repeat,
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='ondankamap-bench-') as workdir:
+        for stations, years in sizes:
+            print(f"計測中: {stations}観測点 x {years}年")
+            run = run_size(stations, years, workdir, repeat=args.repeat,
+                           encoding=args.encoding, models=not args.no_models)
+            result['runs'].append(run)
+            for name in STAGES:
+                stage = run['stages'][name]
+                if 'seconds' in stage:
+                    print(f"  {name:<15} {stage['seconds']:9.4f}s "
+                          f"{stage.get('rows_per_second', 0):12,.0f} rows/s")
+                else:
+                    print(f"  {name:<15} スキップ ({stage['skipped']})")
+
+    if args.output:
+        write_json(args.output, result)
+        print(f"出力ファイル: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n比較: {args.compare}")
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"退行: {len(regressions)}件")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Change-point detection for level shifts (station moves, instrument changes).
+
+:func:`pelt` is the PELT algorithm (Killick et al., 2012) for changes in
+mean under a squared-error cost: segment costs come from prefix sums in
+O(1), and candidates that can no longer start an optimal last segment are
+pruned, which keeps the search close to linear in the series length. It is
+run on monthly mean anomalies (seasonal cycle removed by
+:mod:`ondankamap.anomaly`), and the detected breaks are checked against the
+JMA 均質番号 changes and known station relocations::
+
+    python -m ondankamap changepoints --jobs 4
+
+Each (station, variable) series is an independent job in a process pool.
+"""
+import numpy as np
+
+from .anomaly import with_anomalies
+from .dataset import days_from_ymd, format_date, ymd_from_days
+from .query import Query
+
+# 既知の移転（東京: 2014/12/2 に大手町から北の丸公園へ）
+KNOWN_RELOCATIONS = {'東京': [(2014, 12, 2)]}
+
+PENALTY_FACTOR = 2.0
+MIN_SEGMENT = 24
+MATCH_DAYS = 366
+
+
+def pelt(values, penalty=None, min_size=MIN_SEGMENT):
+    """Optimal partition of ``values`` into constant-mean segments.
+
+    ``penalty`` defaults to ``2 σ² log n`` with σ² the variance of the whole
+    series. That overstates the noise when there are shifts, which keeps
+    the monthly anomalies' autocorrelation and gradual warming from being
+    cut into many small steps. Returns the sorted start indexes of every
+    segment after the first.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = PENALTY_FACTOR * max(np.var(y), 1e-12) * np.log(n)
+    s1 = np.concatenate([[0.0], np.cumsum(y)])
+    s2 = np.concatenate([[0.0], np.cumsum(y * y)])
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    for t in range(min_size, n + 1):
+        length = t - candidates
+        cost = (s2[t] - s2[candidates]) - (s1[t] - s1[candidates]) ** 2 / length
+        total = best[candidates] + cost
+        i = np.argmin(total)
+        best[t] = total[i] + penalty
+        last[t] = candidates[i]
+        # 以後どの t でも最適になり得ない候補を捨てる（PELT の枝刈り）
+        candidates = candidates[total <= best[t]]
+        new = t - min_size + 1
+        if np.isfinite(best[new]):
+            candidates = np.append(candidates, new)
+
+    breaks = []
+    t = n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            breaks.append(int(t))
+    return sorted(breaks)
+
+
+def monthly_anomalies(series, column, station):
+    """``(first day of month, mean anomaly)`` arrays for one station."""
+    name = {'max_temp': 'max_anomaly', 'min_temp': 'min_anomaly'}[column]
+    table = Query(series).station(station).group_by('year', 'month').agg(
+        value=(name, 'mean'))
+    valid = ~np.isnan(table['value'])
+    days = days_from_ymd(table['year'][valid], table['month'][valid], 1)
+    return days, table['value'][valid]
+
+
+def homogeneity_changes(series, station):
+    """Days where the 均質番号 of ``station`` changes (needs the CSV column)."""
+    if 'homogeneity' not in series.columns:
+        return np.zeros(0, dtype=np.int64)
+    start, stop = series.station_bounds()[series.station_code(station)]
+    numbers = series.columns['homogeneity'][start:stop]
+    days = series.day_index[start:stop]
+    known = numbers > 0
+    numbers, days = numbers[known], days[known]
+    return days[1:][numbers[1:] != numbers[:-1]].astype(np.int64)
+
+
+def _label(day):
+    year, month, dom = ymd_from_days([day])
+    return format_date(year[0], month[0], dom[0])
+
+
+def _detect(job):
+    """Worker: segment one (station, column) series."""
+    station, column, days, values, min_size = job
+    breaks = pelt(values, min_size=min_size)
+    bounds = [0] + breaks + [len(values)]
+    segments = [
+        {'start': _label(days[a]), 'end': _label(days[b - 1]),
+         'mean': round(float(np.mean(values[a:b])), 3), 'months': int(b - a)}
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+    return station, column, [int(days[i]) for i in breaks], segments
+
+
+def detect_changepoints(series, columns=('max_temp', 'min_temp'), min_size=MIN_SEGMENT,
+                        match_days=MATCH_DAYS, jobs=None):
+    """Change points of every station's monthly anomaly series.
+
+    Returns ``{station: {column: {'breaks': [...], 'segments': [...]}}}``.
+    Each break lists the step in mean and the nearest 均質番号 change or
+    known relocation, marked ``matched`` when within ``match_days``.
+    """
+    anomalous, _ = with_anomalies(series)
+    work = []
+    for station in series.stations:
+        for column in columns:
+            days, values = monthly_anomalies(anomalous, column, station)
+            work.append((station, column, days, values, min_size))
+
+    if jobs == 1:
+        results = list(map(_detect, work))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_detect, work))
+
+    report = {}
+    for station, column, breaks, segments in results:
+        # 同じ日の均質番号の変化と移転は1件にまとめる（移転を優先して表示）
+        events = {int(d): 'homogeneity' for d in homogeneity_changes(series, station)}
+        events.update({int(days_from_ymd(*ymd)): 'relocation'
+                       for ymd in KNOWN_RELOCATIONS.get(station, [])})
+        events = sorted(events.items())
+        entries = []
+        for i, day in enumerate(breaks):
+            entry = {'date': _label(day),
+                     'shift': round(segments[i + 1]['mean'] - segments[i]['mean'], 3)}
+            if events:
+                event_day, kind = min(events, key=lambda e: abs(e[0] - day))
+                entry.update({'nearest_event': _label(event_day), 'event': kind,
+                              'distance_days': abs(event_day - day),
+                              'matched': abs(event_day - day) <= match_days})
+            entries.append(entry)
+        report.setdefault(station, {})[column] = {'breaks': entries, 'segments': segments}
+    return report
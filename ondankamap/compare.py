@@ -0,0 +1,65 @@
+"""
+Precomputed year-vs-year comparison matrices.
+
+``YearComparisonSection`` compares two chosen years day by day. Here every
+pair is computed at once from the year × day-of-year grid by broadcasting
+``grid[:, None, :] - grid[None, :, :]``, so any comparison the UI offers is
+a lookup ``matrix[i][j]`` (row year minus column year).
+"""
+import numpy as np
+
+from .aggregate import year_doy_grid
+
+COMPARISON_JSON = 'src/data/year_comparison.json'
+
+# 年×年×366 の差分をまとめて作るとメモリが膨らむので、行方向に分けて計算する
+BLOCK_YEARS = 32
+
+
+def pair_matrices(grid, block=BLOCK_YEARS):
+    """All-pairs statistics of the rows of a year × doy grid.
+
+    Returns ``{'common_days', 'mean_diff', 'warmer_days', 'max_divergence'}``
+    as ``(n, n)`` arrays, where entry ``[i, j]`` compares year ``i`` with
+    year ``j`` over the days both have: the mean of ``i - j``, the number of
+    days ``i`` was warmer, and the largest absolute difference.
+    """
+    n = len(grid)
+    observed = ~np.isnan(grid)
+    filled = np.where(observed, grid, 0.0)
+    common = np.zeros((n, n), dtype=np.int64)
+    mean_diff = np.full((n, n), np.nan)
+    warmer = np.zeros((n, n), dtype=np.int64)
+    divergence = np.full((n, n), np.nan)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        both = observed[start:stop, None, :] & observed[None, :, :]
+        diff = np.where(both, filled[start:stop, None, :] - filled[None, :, :], 0.0)
+        count = both.sum(axis=2)
+        common[start:stop] = count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_diff[start:stop] = diff.sum(axis=2) / count
+        warmer[start:stop] = (diff > 0).sum(axis=2)
+        absolute = np.abs(diff).max(axis=2)
+        divergence[start:stop] = np.where(count > 0, absolute, np.nan)
+    return {'common_days': common, 'mean_diff': mean_diff, 'warmer_days': warmer,
+            'max_divergence': divergence}
+
+
+def _rounded(matrix, digits=2):
+    if matrix.dtype.kind == 'i':
+        return matrix.tolist()
+    rounded = np.round(matrix, digits).astype(object)
+    rounded[np.isnan(matrix)] = None
+    return rounded.tolist()
+
+
+def year_comparison(series, station=None):
+    """Comparison matrices of max and min temperature for one station."""
+    result = {}
+    for column in ('max_temp', 'min_temp'):
+        years, grid = year_doy_grid(series, column, station=station)
+        stats = pair_matrices(grid)
+        result['years'] = years.tolist()
+        result[column] = {name: _rounded(matrix) for name, matrix in stats.items()}
+    return result
@@ -0,0 +1,92 @@
+"""
+Day-of-year historical context for annotating forecasts.
+
+For every slot of the 366-day grid the table holds the mean and the
+p10/p90 of the max and min temperature, the record high (of the max) and
+record low (of the min) with the year set, and how many years reached
+≥35 °C or a tropical night on that date. Everything comes from one
+station × year × day-of-year grid per column, reduced along the year axis.
+
+The JSON is columnar (one 366-long array per field) so a forecast date
+needs one index: ``slot = month_offsets[month - 1] + day - 1``, with Feb 29
+always at slot 59.
+"""
+import numpy as np
+
+from .aggregate import station_year_doy_grid
+from .dataset import EXTREME_HEAT, TROPICAL_NIGHT, doy_from_md
+from .percentiles import row_percentiles
+
+PERCENTILES = (10, 90)
+
+# 列 → (記録として残す極値, しきい値で数える日の名前, しきい値)
+COLUMNS = {
+    'max_temp': ('high', 'extreme_heat_years', EXTREME_HEAT),
+    'min_temp': ('low', 'tropical_night_years', TROPICAL_NIGHT),
+}
+
+
+def record_slots(grid, years, which='high'):
+    """Record value and year per slot of a ``(year, 366)`` grid.
+
+    Ties go to the most recent year. Slots with no data get NaN and year 0.
+    """
+    signed = grid if which == 'high' else -grid
+    filled = np.where(np.isnan(signed), -np.inf, signed)
+    # 同じ値なら新しい年を選ぶため、年を逆順にして argmax する
+    row = len(years) - 1 - np.argmax(filled[::-1], axis=0)
+    value = grid[row, np.arange(grid.shape[1])]
+    found = ~np.isnan(value)
+    return value, np.where(found, years[row], 0)
+
+
+def doy_context(series, percentiles=PERCENTILES):
+    """Per-station arrays over the 366 slots.
+
+    Returns ``(years, {station: {field: array}})`` with, for each column
+    ``c`` in :data:`COLUMNS`, ``c_mean``, ``c_p10``/``c_p90``,
+    ``c_record`` and ``c_record_year``, plus ``years`` (observed years
+    per slot) and the threshold counts.
+    """
+    years = None
+    result = {station: {} for station in series.stations}
+    for column, (which, count_name, threshold) in COLUMNS.items():
+        years, grid = station_year_doy_grid(series, column)
+        observed = ~np.isnan(grid)
+        with np.errstate(invalid='ignore'):
+            hits = (grid >= threshold).sum(axis=1)
+        for code, station in enumerate(series.stations):
+            table = result[station]
+            count = observed[code].sum(axis=0)
+            total = np.where(observed[code], grid[code], 0.0).sum(axis=0)
+            table['years'] = np.maximum(table.get('years', 0), count)
+            table[f'{column}_mean'] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+            values = row_percentiles(grid[code].T, percentiles)
+            for i, p in enumerate(percentiles):
+                table[f'{column}_p{p}'] = values[:, i]
+            record, record_year = record_slots(grid[code], years, which)
+            table[f'{column}_record'] = record
+            table[f'{column}_record_year'] = record_year
+            table[count_name] = hits[code]
+    return years, result
+
+
+def context_table(series, percentiles=PERCENTILES, digits=1):
+    """JSON-ready context table (see the module docstring for the lookup)."""
+    years, stations = doy_context(series, percentiles)
+
+    def plain(name, values):
+        if name.endswith(('_year', '_years')) or name == 'years':
+            return values.astype(int).tolist()
+        return [None if np.isnan(v) else v for v in np.round(values, digits).tolist()]
+
+    return {
+        'first_year': int(years[0]) if len(years) else None,
+        'last_year': int(years[-1]) if len(years) else None,
+        'month_offsets': (doy_from_md(np.arange(1, 13), 1) - 1).tolist(),
+        'thresholds': {name: threshold for _, name, threshold in COLUMNS.values()},
+        'stations': {
+            station: {name: plain(name, values) for name, values in table.items()}
+            for station, table in stations.items()
+        },
+    }
@@ -0,0 +1,310 @@
+"""
+Columnar in-memory representation of the daily temperature series.
+
+Records in ``tokyo_temperature_data.json`` are converted into parallel NumPy
+arrays (one per column) so that filters and aggregations can run as
+vectorized operations instead of Python loops over dicts.
+"""
+from array import array
+from functools import cached_property
+
+import numpy as np
+
+from . import jsonstream
+
+DEFAULT_STATION = '東京'
+
+# 気象庁の用語: 猛暑日は最高気温35℃以上、熱帯夜はここでは最低気温25℃以上の日
+EXTREME_HEAT = 35.0
+TROPICAL_NIGHT = 25.0
+
+# 日付グリッドはうるう年基準で366枠（2/29は常に60番目）にそろえる
+DAYS_IN_GRID = 366
+_LEAP_MONTH_START = np.array([0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335])
+
+
+def days_from_ymd(year, month, day):
+    """Convert year/month/day arrays to day indexes (days since 1970-01-01)."""
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    months = (year - 1970) * 12 + (month - 1)
+    first = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    return (first + day - 1).astype(np.int32)
+
+
+def ymd_from_days(day_index):
+    """Convert day indexes back to ``(year, month, day)`` arrays."""
+    dates = np.asarray(day_index, dtype=np.int64).astype('datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    year = months.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+    return year.astype(np.int16), month.astype(np.int8), day.astype(np.int8)
+
+
+def doy_from_md(month, day):
+    """Return the 1-based slot on the 366-day grid for month/day arrays."""
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    return (_LEAP_MONTH_START[month - 1] + day).astype(np.int16)
+
+
+def md_from_doy(doy):
+    """Return ``(month, day)`` for 1-based slots on the 366-day grid."""
+    doy = np.asarray(doy, dtype=np.int64)
+    month = np.searchsorted(_LEAP_MONTH_START, doy - 1, side='right')
+    day = doy - _LEAP_MONTH_START[month - 1]
+    return month, day
+
+
+def format_date(year, month, day):
+    """Format a date the way the JSON files do (``YYYY/M/D``)."""
+    return f"{int(year)}/{int(month)}/{int(day)}"
+
+
+def _plain_values(values):
+    """Column values as Python scalars; float32 keeps its short repr (0.1, not 0.100000001)."""
+    if values.dtype == np.float32:
+        return values.astype(str).astype(np.float64).tolist()
+    return values.tolist()
+
+
+class DailySeries:
+    """Daily max/min temperatures for one or more stations, stored by column.
+
+    ``station`` holds integer codes into ``stations``. Rows are kept sorted by
+    station and then by day so that range filters can use binary search.
+    Extra per-day columns (e.g. anomalies) live in ``columns``.
+    """
+
+    def __init__(self, day_index, max_temp, min_temp, station=None,
+                 stations=(DEFAULT_STATION,), columns=None, presorted=False):
+        day_index = np.asarray(day_index, dtype=np.int32)
+        if station is None:
+            station = np.zeros(len(day_index), dtype=np.int16)
+        station = np.asarray(station, dtype=np.int16)
+        max_temp = np.asarray(max_temp, dtype=np.float64)
+        min_temp = np.asarray(min_temp, dtype=np.float64)
+        columns = {name: np.asarray(values) for name, values in (columns or {}).items()}
+
+        if not presorted and len(day_index) > 1:
+            order = np.lexsort((day_index, station))
+            if np.any(order != np.arange(len(order))):
+                day_index, station = day_index[order], station[order]
+                max_temp, min_temp = max_temp[order], min_temp[order]
+                columns = {name: values[order] for name, values in columns.items()}
+
+        self.day_index = day_index
+        self.station = station
+        self.max_temp = max_temp
+        self.min_temp = min_temp
+        self.stations = tuple(stations)
+        self.columns = columns
+
+    # ------------------------------------------------------------------
+    # 生成・入出力
+
+    @classmethod
+    def from_records(cls, records, station=DEFAULT_STATION):
+        """Build a series from JSON-style record dicts.
+
+        ``records`` may be any iterable, including a generator: it is consumed
+        in one pass into typed arrays, so only the columns stay in memory.
+        Records may carry a ``station`` key; otherwise ``station`` is used.
+        """
+        year, month, day = array('h'), array('b'), array('b')
+        max_temp, min_temp = array('d'), array('d')
+        codes = array('h')
+        names = {}
+        for r in records:
+            year.append(r['year'])
+            month.append(r['month'])
+            day.append(r['day'])
+            max_temp.append(r['max_temp'])
+            min_temp.append(r['min_temp'])
+            name = r.get('station', station)
+            code = names.get(name)
+            if code is None:
+                code = names[name] = len(names)
+            codes.append(code)
+
+        # 局名は既存の出力と同じく名前順に並べる
+        stations = sorted(names) or [station]
+        remap = np.array([stations.index(name) for name in names], dtype=np.int16)
+        codes = np.frombuffer(codes, dtype=np.int16)
+        return cls(days_from_ymd(np.frombuffer(year, dtype=np.int16),
+                                 np.frombuffer(month, dtype=np.int8),
+                                 np.frombuffer(day, dtype=np.int8)),
+                   np.frombuffer(max_temp), np.frombuffer(min_temp),
+                   station=remap[codes] if len(codes) else codes,
+                   stations=[str(s) for s in stations])
+
+    @classmethod
+    def load_json(cls, path, station=DEFAULT_STATION):
+        """Load ``tokyo_temperature_data.json``-format files.
+
+        The file is decoded incrementally, never holding all record dicts.
+        """
+        return cls.from_records(jsonstream.iter_records(path), station=station)
+
+    @classmethod
+    def concat(cls, parts):
+        """Concatenate several series, remapping station codes."""
+        parts = list(parts)
+        names = []
+        for part in parts:
+            for name in part.stations:
+                if name not in names:
+                    names.append(name)
+        codes = []
+        for part in parts:
+            remap = np.array([names.index(name) for name in part.stations], dtype=np.int16)
+            codes.append(remap[part.station] if len(part) else part.station)
+        shared = set.intersection(*(set(p.columns) for p in parts)) if parts else set()
+        return cls(
+            np.concatenate([p.day_index for p in parts]),
+            np.concatenate([p.max_temp for p in parts]),
+            np.concatenate([p.min_temp for p in parts]),
+            station=np.concatenate(codes),
+            stations=names,
+            columns={c: np.concatenate([p.columns[c] for p in parts]) for c in sorted(shared)},
+        )
+
+    def iter_records(self, include_station=None, include_columns=True):
+        """Yield JSON-style record dicts in the existing output format."""
+        if include_station is None:
+            include_station = len(self.stations) > 1
+        year, month, day = self.year.tolist(), self.month.tolist(), self.dom.tolist()
+        max_temp, min_temp = self.max_temp.tolist(), self.min_temp.tolist()
+        station = self.station.tolist()
+        extras = {}
+        if include_columns:
+            extras = {name: _plain_values(values) for name, values in self.columns.items()}
+        for i in range(len(self)):
+            record = {
+                'date': format_date(year[i], month[i], day[i]),
+                'year': year[i],
+                'month': month[i],
+                'day': day[i],
+                'max_temp': max_temp[i],
+                'min_temp': min_temp[i],
+            }
+            if include_station:
+                record['station'] = self.stations[station[i]]
+            for name, values in extras.items():
+                record[name] = values[i]
+            yield record
+
+    def to_records(self, include_station=None, include_columns=True):
+        """Return JSON-style record dicts in the existing output format."""
+        return list(self.iter_records(include_station, include_columns))
+
+    def save_npz(self, path):
+        """Store the columns as an uncompressed ``.npz`` archive."""
+        arrays = {
+            'day_index': self.day_index,
+            'station': self.station,
+            'max_temp': self.max_temp,
+            'min_temp': self.min_temp,
+            'stations': np.array(self.stations),
+        }
+        for name, values in self.columns.items():
+            arrays[f'col_{name}'] = values
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load_npz(cls, path):
+        """Load a series written by :meth:`save_npz`."""
+        with np.load(path, allow_pickle=False) as data:
+            columns = {key[4:]: data[key] for key in data.files if key.startswith('col_')}
+            return cls(data['day_index'], data['max_temp'], data['min_temp'],
+                       station=data['station'], stations=[str(s) for s in data['stations']],
+                       columns=columns, presorted=True)
+
+    # ------------------------------------------------------------------
+    # 派生列
+
+    def __len__(self):
+        return len(self.day_index)
+
+    @cached_property
+    def _ymd(self):
+        return ymd_from_days(self.day_index)
+
+    @property
+    def year(self):
+        return self._ymd[0]
+
+    @property
+    def month(self):
+        return self._ymd[1]
+
+    @property
+    def dom(self):
+        """Day of month."""
+        return self._ymd[2]
+
+    @cached_property
+    def doy(self):
+        """1-based slot on the 366-day grid (Feb 29 is always slot 60)."""
+        return doy_from_md(self.month, self.dom)
+
+    @property
+    def avg_temp(self):
+        return (self.max_temp + self.min_temp) / 2
+
+    @property
+    def station_names(self):
+        return np.array(self.stations, dtype=object)[self.station]
+
+    def column(self, name):
+        """Look up a stored, derived or extra column by name."""
+        if name in self.columns:
+            return self.columns[name]
+        if name == 'day':
+            return self.dom
+        if name in ('station', 'day_index', 'max_temp', 'min_temp',
+                    'year', 'month', 'dom', 'doy', 'avg_temp'):
+            return getattr(self, name)
+        raise KeyError(f"unknown column: {name}")
+
+    def station_code(self, name):
+        try:
+            return self.stations.index(name)
+        except ValueError:
+            raise KeyError(f"unknown station: {name}") from None
+
+    def station_bounds(self):
+        """Return ``{code: (start, stop)}`` row ranges for each station."""
+        codes = np.arange(len(self.stations))
+        starts = np.searchsorted(self.station, codes, side='left')
+        stops = np.searchsorted(self.station, codes, side='right')
+        return {int(c): (int(a), int(b)) for c, a, b in zip(codes, starts, stops)}
+
+    # ------------------------------------------------------------------
+    # 部分集合
+
+    def take(self, index):
+        """Return the rows selected by a boolean mask or integer index."""
+        return DailySeries(
+            self.day_index[index], self.max_temp[index], self.min_temp[index],
+            station=self.station[index], stations=self.stations,
+            columns={name: values[index] for name, values in self.columns.items()},
+            presorted=True,
+        )
+
+    def for_station(self, name):
+        start, stop = self.station_bounds()[self.station_code(name)]
+        return self.take(slice(start, stop))
+
+    def with_column(self, name, values):
+        """Return a copy of the series with an extra per-day column."""
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"column {name} has {len(values)} rows, expected {len(self)}")
+        columns = dict(self.columns)
+        columns[name] = values
+        return DailySeries(self.day_index, self.max_temp, self.min_temp,
+                           station=self.station, stations=self.stations,
+                           columns=columns, presorted=True)
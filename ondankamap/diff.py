@@ -0,0 +1,177 @@
+"""
+Diff two versions of the daily temperature data.
+
+Both datasets are aligned on ``(station, day index)`` keys with one
+``searchsorted`` per side, then every shared column is compared as a
+whole array: days only in the new data are *added*, days only in the old
+data *removed*, and shared days whose values differ *changed*. The same
+masks give the per-year summary through ``bincount``::
+
+    python -m ondankamap diff tokyo_temperature_data.json src/data/tokyo_temperature_data.json
+    python -m ondankamap diff old.json new.json --expect expected_diff.json
+
+With ``--expect`` the counts are checked against a small JSON file such as
+``{"removed": 0, "changed": {"max": 10}}`` and the command exits with 1 on
+a mismatch, so a regenerated artifact can be gated on its expected diff.
+"""
+import numpy as np
+
+from .dataset import format_date, ymd_from_days
+
+KINDS = ('added', 'removed', 'changed')
+COLUMNS = ('max_temp', 'min_temp')
+EXAMPLES = 20
+
+# 日番号は負にもなるので、局コードと組み合わせる前に正の範囲へずらす
+_DAY_OFFSET = 1 << 31
+
+
+def _keys(series, names):
+    """Sorted unique ``station << 32 | day`` keys and the row of each key.
+
+    Duplicate days keep their first row; returns ``(keys, rows, duplicates)``.
+    """
+    remap = np.array([names.index(name) for name in series.stations], dtype=np.int64)
+    codes = remap[series.station] if len(series) else series.station.astype(np.int64)
+    keys = (codes << 32) | (series.day_index.astype(np.int64) + _DAY_OFFSET)
+    if len(keys) > 1 and np.all(keys[1:] > keys[:-1]):
+        return keys, np.arange(len(keys)), 0
+    unique, rows = np.unique(keys, return_index=True)
+    return unique, rows, int(len(keys) - len(unique))
+
+
+def _member(keys, other):
+    """Boolean mask of ``keys`` present in the sorted array ``other``."""
+    if not len(other):
+        return np.zeros(len(keys), dtype=bool)
+    position = np.minimum(np.searchsorted(other, keys), len(other) - 1)
+    return other[position] == keys
+
+
+def _differs(old, new, tolerance):
+    old = np.asarray(old, dtype=np.float64)
+    new = np.asarray(new, dtype=np.float64)
+    missing = np.isnan(old) != np.isnan(new)
+    with np.errstate(invalid='ignore'):
+        return missing | (np.abs(old - new) > tolerance)
+
+
+def _summary(series):
+    if not len(series):
+        return {'rows': 0}
+    year, month, day = ymd_from_days([series.day_index.min(), series.day_index.max()])
+    return {
+        'rows': len(series),
+        'stations': list(series.stations),
+        'start': format_date(year[0], month[0], day[0]),
+        'end': format_date(year[1], month[1], day[1]),
+    }
+
+
+def diff_series(old, new, columns=None, tolerance=0.0, examples=EXAMPLES):
+    """Compare two :class:`DailySeries` day by day.
+
+    ``columns`` defaults to max/min plus every extra column both series
+    have. Values differing by more than ``tolerance`` (or missing on one
+    side only) count as changed. Returns a JSON-ready report with the
+    counts, per-column statistics, a per-year table of years with any
+    difference and the first ``examples`` days of each kind.
+    """
+    names = list(old.stations) + [s for s in new.stations if s not in old.stations]
+    old_keys, old_rows, old_duplicates = _keys(old, names)
+    new_keys, new_rows, new_duplicates = _keys(new, names)
+    in_new = _member(old_keys, new_keys)
+    in_old = _member(new_keys, old_keys)
+    # 両方にある日は同じキー順に並ぶので、行番号をそのまま対応させられる
+    old_shared, new_shared = old_rows[in_new], new_rows[in_old]
+
+    if columns is None:
+        columns = list(COLUMNS) + sorted(set(old.columns) & set(new.columns))
+    changed = np.zeros(len(old_shared), dtype=bool)
+    column_stats = {}
+    for column in columns:
+        a = old.column(column)[old_shared]
+        b = new.column(column)[new_shared]
+        differs = _differs(a, b, tolerance)
+        changed |= differs
+        delta = np.asarray(b, dtype=np.float64)[differs] - np.asarray(a, dtype=np.float64)[differs]
+        delta = delta[~np.isnan(delta)]
+        column_stats[column] = {
+            'changed': int(np.count_nonzero(differs)),
+            'max_abs_delta': round(float(np.max(np.abs(delta))), 3) if len(delta) else None,
+            'mean_delta': round(float(np.mean(delta)), 3) if len(delta) else None,
+        }
+
+    rows = {
+        'added': (new, new_rows[~in_old]),
+        'removed': (old, old_rows[~in_new]),
+        'changed': (new, new_shared[changed]),
+    }
+    years = {kind: series.year[index] for kind, (series, index) in rows.items()}
+    all_years = np.unique(np.concatenate(list(years.values()))).astype(np.int64)
+    counts = {kind: np.bincount(np.searchsorted(all_years, y), minlength=len(all_years))
+              for kind, y in years.items()}
+
+    multi = len(names) > 1
+
+    def example(series, row, values):
+        entry = {'date': format_date(series.year[row], series.month[row], series.dom[row])}
+        if multi:
+            entry['station'] = series.stations[series.station[row]]
+        entry.update(values)
+        return entry
+
+    changed_old = old_shared[changed]
+    report = {
+        'old': _summary(old),
+        'new': _summary(new),
+        'duplicates': {'old': old_duplicates, 'new': new_duplicates},
+        'shared': int(len(old_shared)),
+        **{kind: int(len(index)) for kind, (_, index) in rows.items()},
+        'identical': not (len(rows['added'][1]) or len(rows['removed'][1]) or changed.any()),
+        'columns': column_stats,
+        'years': [
+            {'year': int(year), **{kind: int(counts[kind][i]) for kind in KINDS}}
+            for i, year in enumerate(all_years.tolist())
+        ],
+        'examples': {
+            'added': [example(new, r, {c: _plain(new.column(c)[r]) for c in columns})
+                      for r in rows['added'][1][:examples]],
+            'removed': [example(old, r, {c: _plain(old.column(c)[r]) for c in columns})
+                        for r in rows['removed'][1][:examples]],
+            'changed': [example(new, r, {c: [_plain(old.column(c)[o]), _plain(new.column(c)[r])]
+                                         for c in columns})
+                        for r, o in zip(rows['changed'][1][:examples], changed_old[:examples])],
+        },
+    }
+    return report
+
+
+def _plain(value):
+    value = float(value)
+    return None if value != value else value
+
+
+def check_expected(report, expected):
+    """Problems of ``report`` against ``expected`` counts (empty when it matches).
+
+    ``expected`` maps ``added``/``removed``/``changed`` (and optionally
+    ``duplicates``) to an exact count or to ``{"min": n, "max": m}``.
+    """
+    problems = []
+    for kind, rule in expected.items():
+        if kind == 'duplicates':
+            actual = report['duplicates']['new']
+        elif kind in KINDS:
+            actual = report[kind]
+        else:
+            problems.append(f"不明な項目: {kind}")
+            continue
+        if isinstance(rule, dict):
+            low, high = rule.get('min'), rule.get('max')
+            if (low is not None and actual < low) or (high is not None and actual > high):
+                problems.append(f"{kind}: {actual}件（想定 {low if low is not None else ''}"
+                                f"〜{high if high is not None else ''}件）")
+        elif actual != rule:
+            problems.append(f"{kind}: {actual}件（想定 {rule}件）")
+    return problems
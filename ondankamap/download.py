@@ -0,0 +1,368 @@
+"""
+Concurrent downloader for JMA daily CSVs, plus a local stand-in server.
+
+The JMA download form caps the rows per request, which is why the
+``data-N.csv`` files were fetched by hand in 15-year chunks. Here a
+station/date range is split into chunks of that size and the chunks of all
+stations are fetched concurrently (bounded by a semaphore) and retried with
+backoff on connection errors, 5xx/429 responses and bodies shorter than
+their Content-Length. Each body is decoded line by line as it arrives and
+parsed with :func:`ondankamap.ingest.parse_lines` once it is complete::
+
+    python -m ondankamap download 東京 大阪 --start 1991-01-01 --end 2024-12-31 \\
+        --url http://localhost:8080/csv --cache .download-cache
+
+With ``--cache`` every complete chunk is kept as ``.npz``, so an interrupted
+backfill resumes where it stopped. ``--mock`` starts :class:`MockJMAServer`
+in-process, which serves :mod:`ondankamap.synth` data in the JMA layout
+(Shift-JIS, CRLF) and can inject failures and cut-off bodies, for offline
+runs.
+
+Requests are ``GET <url>?station=<name>&start=YYYY-MM-DD&end=YYYY-MM-DD``;
+pass ``build_query`` to adapt them to another endpoint.
+"""
+import asyncio
+import codecs
+import io
+import os
+import random
+import ssl
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import numpy as np
+
+from .artifacts import write_bytes
+from .dataset import DailySeries, days_from_ymd
+from .ingest import ENCODINGS, merge, parse_lines
+from .synth import CHUNK_YEARS, format_csv, synthetic_series
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, reason=''):
+        super().__init__(f'HTTP {status} {reason}'.strip())
+        self.status = status
+
+
+class IncompleteBody(OSError):
+    """The connection closed before ``Content-Length`` bytes arrived."""
+
+    def __init__(self, received, expected):
+        super().__init__(f'本文が途中で切れました（{received}/{expected} バイト）')
+        self.received = received
+        self.expected = expected
+
+
+def parse_date(text):
+    return int(np.datetime64(text, 'D').astype(np.int64))
+
+
+def format_iso(day_index):
+    return str(np.datetime64(int(day_index), 'D'))
+
+
+def split_range(start, end, chunk_years=CHUNK_YEARS):
+    """Split an inclusive ``YYYY-MM-DD`` range into ``chunk_years`` pieces.
+
+    Chunks start on Jan 1 (except the first) so that they line up with the
+    hand-downloaded files. Returns ``[(start, end), ...]`` ISO strings.
+    """
+    first, last = parse_date(start), parse_date(end)
+    if first > last:
+        raise ValueError(f"開始日が終了日より後です: {start} > {end}")
+    chunks = []
+    year = int(start[:4])
+    chunk_start = first
+    while chunk_start <= last:
+        year += chunk_years
+        chunk_end = min(int(days_from_ymd(year, 1, 1)) - 1, last)
+        chunks.append((format_iso(chunk_start), format_iso(chunk_end)))
+        chunk_start = chunk_end + 1
+    return chunks
+
+
+def default_query(station, start, end):
+    return urlencode({'station': station, 'start': start, 'end': end})
+
+
+# ----------------------------------------------------------------------
+# HTTP（標準ライブラリのみ、HTTP/1.0 で本文を逐次読む）
+
+async def _open(url, query, timeout):
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port,
+                                ssl=ssl.create_default_context() if secure else None),
+        timeout)
+    target = quote(parts.path or '/') + '?' + query
+    writer.write(f'GET {target} HTTP/1.0\r\nHost: {parts.netloc}\r\n'
+                 'User-Agent: ondankamap\r\nAccept: text/csv\r\n\r\n'.encode('ascii'))
+    await writer.drain()
+
+    status_line = await asyncio.wait_for(reader.readline(), timeout)
+    fields = status_line.decode('latin-1').split(' ', 2)
+    if len(fields) < 2 or not fields[1].isdigit():
+        writer.close()
+        raise HTTPError(0, 'invalid response')
+    status = int(fields[1])
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if status != 200:
+        writer.close()
+        raise HTTPError(status, fields[2].strip() if len(fields) > 2 else '')
+    return reader, writer, headers
+
+
+def _charset(headers):
+    for param in headers.get('content-type', '').split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'charset' and value:
+            value = value.strip('"').lower()
+            # Shift_JIS と表示されていても実際は機種依存文字を含む cp932
+            return 'cp932' if value in ('shift_jis', 'sjis', 'x-sjis') else value
+    return None
+
+
+def _sniff(head):
+    for candidate in ENCODINGS:
+        try:
+            head.decode(candidate)
+            return candidate
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSVの文字コードを判定できません")
+
+
+async def _read_lines(reader, headers, timeout):
+    """Decode the body line by line as it arrives and return the lines.
+
+    Raises :class:`IncompleteBody` when the server announced a
+    ``Content-Length`` and the connection closed before that many bytes.
+    """
+    encoding = _charset(headers)
+    decoder = codecs.getincrementaldecoder(encoding)() if encoding else None
+    expected = headers.get('content-length')
+    expected = int(expected) if expected and expected.isdigit() else None
+    received = 0
+    head = b''
+    lines = []
+    while True:
+        raw = await asyncio.wait_for(reader.readline(), timeout)
+        if not raw:
+            break
+        received += len(raw)
+        if decoder is None:
+            # charset がなければ、最初の非ASCII行（ヘッダー）までで文字コードを判定する
+            head += raw
+            if raw.isascii():
+                continue
+            decoder = codecs.getincrementaldecoder(_sniff(head))()
+            raw, head = head, b''
+        lines.extend(decoder.decode(raw).splitlines())
+    # HTTP/1.0 では接続の終了が本文の終わりなので、途中で切れた本文は長さでしか分からない
+    if expected is not None and received < expected:
+        raise IncompleteBody(received, expected)
+    if decoder is None:
+        lines.extend(head.decode(ENCODINGS[0]).splitlines())
+    else:
+        lines.extend(decoder.decode(b'', final=True).splitlines())
+    return lines
+
+
+async def fetch_chunk(url, station, start, end, build_query=default_query, timeout=60,
+                      counter=None):
+    """Fetch one chunk and parse it into a :class:`DailySeries`.
+
+    Raises :class:`IncompleteBody` (an ``OSError``, so it is retried) for
+    a cut-off body; only complete bodies are parsed. Unreadable rows are
+    counted in ``counter['skipped']`` (see :func:`ondankamap.ingest.parse_lines`).
+    """
+    reader, writer, headers = await _open(url, build_query(station, start, end), timeout)
+    try:
+        lines = await _read_lines(reader, headers, timeout)
+    finally:
+        writer.close()
+    return parse_lines(lines, counter=counter)
+
+
+# ----------------------------------------------------------------------
+# 並行ダウンロード
+
+def chunk_path(cache_dir, station, start, end):
+    return os.path.join(cache_dir, f'{station}_{start}_{end}.npz')
+
+
+def _save_chunk(path, series):
+    buffer = io.BytesIO()
+    series.save_npz(buffer)
+    write_bytes(path, buffer.getvalue())
+
+
+async def download(url, stations, start, end, concurrency=4, retries=3, backoff=0.5,
+                   cache_dir=None, build_query=default_query, timeout=60, log=print):
+    """Fetch ``stations`` over ``start``–``end`` concurrently and merge them.
+
+    At most ``concurrency`` requests are in flight. Each chunk is tried
+    ``retries + 1`` times with exponential backoff (plus jitter). With
+    ``cache_dir`` complete chunks are stored and reused on the next run.
+    Returns ``(series, stats)``.
+    """
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+    stats = {'chunks': 0, 'cached': 0, 'fetched': 0, 'retries': 0, 'rows': 0, 'skipped': 0}
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    async def get(station, chunk_start, chunk_end):
+        path = chunk_path(cache_dir, station, chunk_start, chunk_end) if cache_dir else None
+        if path and os.path.exists(path):
+            stats['cached'] += 1
+            return DailySeries.load_npz(path)
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    series = await fetch_chunk(url, station, chunk_start, chunk_end,
+                                               build_query=build_query, timeout=timeout,
+                                               counter=stats)
+                break
+            except (OSError, asyncio.TimeoutError, HTTPError) as e:
+                retryable = not isinstance(e, HTTPError) or e.status in RETRY_STATUS
+                if not retryable or attempt == retries:
+                    raise
+                stats['retries'] += 1
+                delay = backoff * 2 ** attempt * (1 + random.random())
+                log(f"{station} {chunk_start}～{chunk_end}: {e} ({delay:.1f}秒後に再試行)")
+                await asyncio.sleep(delay)
+        stats['fetched'] += 1
+        stats['rows'] += len(series)
+        if path:
+            _save_chunk(path, series)
+        return series
+
+    jobs = [(station, a, b) for station in stations for a, b in split_range(start, end)]
+    stats['chunks'] = len(jobs)
+    # gather は入力順に結果を返すので、merge の「後のファイルを優先」の順序も保たれる
+    parts = await asyncio.gather(*(get(*job) for job in jobs))
+    series, _ = merge(parts)
+    return series, stats
+
+
+def download_sync(*args, **kwargs):
+    return asyncio.run(download(*args, **kwargs))
+
+
+# ----------------------------------------------------------------------
+# オフライン確認用の擬似サーバー
+
+@lru_cache(maxsize=32)
+def _station_data(station, start_year, end_year):
+    return synthetic_series(start_year, end_year, seed=zlib.crc32(station.encode('utf-8')))
+
+
+class MockJMAServer:
+    """Serve synthetic JMA-format CSVs over HTTP on ``127.0.0.1``.
+
+    ``GET /csv?station=&start=&end=`` returns that range as Shift-JIS CSV.
+    Ranges longer than ``max_years`` get 400, like the real form's row
+    limit. ``failure_rate`` of requests answer 503 and each response waits
+    ``latency`` seconds, to exercise retries and concurrency; another
+    ``truncate_rate`` send only part of the body announced by
+    ``Content-Length``. Use as a context manager; ``url`` is set once
+    started.
+    """
+
+    def __init__(self, port=0, first_year=1875, last_year=2024, max_years=CHUNK_YEARS,
+                 failure_rate=0.0, latency=0.0, truncate_rate=0.0, seed=0):
+        self.port = port
+        self.first_year = first_year
+        self.last_year = last_year
+        self.max_years = max_years
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.truncate_rate = truncate_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+
+    def render(self, station, start, end):
+        days, max_temp, min_temp, quality = _station_data(station, self.first_year,
+                                                          self.last_year)
+        lo, hi = np.searchsorted(days, [parse_date(start), parse_date(end) + 1])
+        return format_csv(station, days[lo:hi], max_temp[lo:hi], min_temp[lo:hi],
+                          quality[lo:hi]).encode('cp932')
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    fail = server._random.random() < server.failure_rate
+                    truncate = server._random.random() < server.truncate_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                if fail:
+                    self.send_error(503)
+                    return
+                parts = urlsplit(self.path)
+                if parts.path != '/csv':
+                    self.send_error(404)
+                    return
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                try:
+                    start, end = query['start'], query['end']
+                    if int(end[:4]) - int(start[:4]) >= server.max_years:
+                        self.send_error(400, 'too many rows')
+                        return
+                    body = server.render(query['station'], start, end)
+                except (KeyError, ValueError):
+                    self.send_error(400)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv; charset=Shift_JIS')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                # 切断を模すときは行の途中までで送信をやめる
+                self.wfile.write(body[:len(body) // 2] if truncate else body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}/csv'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
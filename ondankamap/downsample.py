@@ -0,0 +1,150 @@
+"""
+Downsampled daily max/min series for the charts (Largest-Triangle-Three-Buckets).
+
+``DailyTemperatureChart`` cannot plot all ~53k days at once, so this writes
+LTTB versions of the max and min series at a few target sizes, over the
+whole record and per decade::
+
+    public/data/lttb/index.json              manifest
+    public/data/lttb/東京/all-2000.json       whole record, 2000 points per series
+    public/data/lttb/東京/1990s-500.json      one decade
+    public/data/lttb/東京/1990s-full.json     a decade shorter than the target
+
+Each file holds ``{"max_temp": {"day": [...], "value": [...]}, "min_temp":
+...}`` with days counted from 1970-01-01, so the chart can pick the file
+that fits its zoom level. Files are rewritten only when their content
+changes and files that drop out of the manifest are removed.
+
+LTTB keeps the first and last point and, per bucket, the point forming the
+largest triangle with the point kept in the previous bucket and the mean
+of the next bucket. The bucket bounds, next-bucket means and candidate
+coordinates are computed for all buckets at once; only the dependency on
+the previous choice is walked bucket by bucket.
+"""
+import json
+import os
+
+import numpy as np
+
+from .artifacts import write_json
+from .dataset import format_date, ymd_from_days
+
+LTTB_DIR = 'public/data/lttb'
+MANIFEST = 'index.json'
+TARGETS = (500, 2000, 8000)
+COLUMNS = ('max_temp', 'min_temp')
+
+
+def lttb(x, y, threshold):
+    """Indexes of the ``threshold`` points LTTB keeps from ``(x, y)``.
+
+    Returns every index when there are no more points than ``threshold``.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n) if threshold >= n else np.array([0, n - 1])[:threshold]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    buckets = threshold - 2
+    edges = (np.arange(buckets + 1) * ((n - 2) / buckets)).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # 次のバケットの平均（最後のバケットの次は最終点）
+    cx, cy = np.cumsum(np.r_[0.0, x]), np.cumsum(np.r_[0.0, y])
+    lo, hi = edges[1:-1], edges[2:]
+    next_x = np.r_[(cx[hi] - cx[lo]) / (hi - lo), x[-1]]
+    next_y = np.r_[(cy[hi] - cy[lo]) / (hi - lo), y[-1]]
+
+    # 候補点を (バケット, 最大幅) に詰める。はみ出した分は面積 -1 で除外する
+    width = int(np.max(np.diff(edges)))
+    index = edges[:-1, None] + np.arange(width)[None, :]
+    valid = index < edges[1:, None]
+    index = np.minimum(index, n - 1)
+    bx, by = x[index], y[index]
+
+    chosen = np.empty(threshold, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(buckets):
+        area = np.abs((bx[i] - ax) * (next_y[i] - ay) - (next_x[i] - ax) * (by[i] - ay))
+        j = int(np.argmax(np.where(valid[i], area, -1.0)))
+        chosen[i + 1] = index[i, j]
+        ax, ay = bx[i, j], by[i, j]
+    return chosen
+
+
+def _points(days, values, threshold, digits=1):
+    keep = ~np.isnan(values)
+    days, values = days[keep], values[keep]
+    chosen = lttb(days, values, threshold) if threshold else np.arange(len(days))
+    return {'day': days[chosen].astype(int).tolist(),
+            'value': np.round(values[chosen], digits).tolist()}
+
+
+def scopes(series):
+    """``(label, slice)`` of every row range to downsample: all and each decade."""
+    yield 'all', slice(0, len(series))
+    decade = series.year // 10 * 10
+    starts = np.flatnonzero(np.r_[True, decade[1:] != decade[:-1]])
+    for a, b in zip(starts, np.r_[starts[1:], len(series)]):
+        yield f'{int(decade[a])}s', slice(int(a), int(b))
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_downsampled(series, directory=LTTB_DIR, targets=TARGETS, columns=COLUMNS):
+    """Write the LTTB files of every station and their manifest.
+
+    A scope shorter than a target gets one ``full`` file instead. Returns
+    ``{'written': n, 'unchanged': n, 'removed': n}``.
+    """
+    previous = load_manifest(directory).get('files', {})
+    files = {}
+    counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    for code, station in enumerate(series.stations):
+        start, stop = series.station_bounds()[code]
+        part = series.take(np.arange(start, stop))
+        entries = files[station] = {}
+        for scope, rows in scopes(part):
+            days = part.day_index[rows]
+            if not len(days):
+                continue
+            points = int(len(days))
+            resolutions = [n for n in targets if n < points]
+            if len(resolutions) < len(targets):
+                resolutions.append(None)
+            year, month, dom = ymd_from_days(days[[0, -1]])
+            for n in resolutions:
+                label = f'{scope}-{n or "full"}'
+                path = f'{station}/{label}.json'
+                content = {column: _points(days, part.column(column)[rows], n)
+                           for column in columns}
+                if write_json(os.path.join(directory, path), content, indent=None):
+                    counts['written'] += 1
+                else:
+                    counts['unchanged'] += 1
+                entries[label] = {
+                    'path': path, 'scope': scope, 'points': n or points,
+                    'start': format_date(year[0], month[0], dom[0]),
+                    'end': format_date(year[1], month[1], dom[1]),
+                }
+
+    current = {entry['path'] for entries in files.values() for entry in entries.values()}
+    for entries in previous.values():
+        for entry in entries.values():
+            if entry['path'] not in current:
+                try:
+                    os.remove(os.path.join(directory, entry['path']))
+                    counts['removed'] += 1
+                except FileNotFoundError:
+                    pass
+
+    manifest = {'targets': list(targets), 'epoch': '1970-01-01', 'files': files}
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    return counts
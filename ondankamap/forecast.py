@@ -0,0 +1,83 @@
+"""
+ARIMA and Prophet forecasts of yearly mean temperatures.
+
+``statsmodels``, ``prophet`` and ``pandas`` are imported inside the functions
+so that importing this module (and the rest of the package) stays cheap.
+"""
+from . import instrument
+from .aggregate import yearly_series
+
+FUTURE_YEARS = (2030, 2040, 2050)
+
+
+def arima_monthly_forecast(series, future_years=FUTURE_YEARS, order=(1, 1, 1), run=None):
+    """Fit ARIMA to each month's yearly mean max temperature.
+
+    Returns ``{month: {year: value}}`` with observed years followed by the
+    forecast up to ``max(future_years)``, as in
+    ``src/data/arima_monthly_max_forecast.json``. Each fit is recorded as a
+    stage of ``run`` when one is given.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    result = {}
+    for month in range(1, 13):
+        years, values = yearly_series(series, 'max_temp', month=month)
+        try:
+            if len(years) == 0:
+                result[str(month)] = {}
+                continue
+            all_years = {str(y): float(t) for y, t in zip(years, values)}
+            last_year = int(years.max())
+            steps = max(future_years) - last_year
+            if steps > 0:
+                with instrument.stage(run, 'fit_arima', month=month):
+                    fit = ARIMA(values, order=order).fit()
+                forecast = fit.forecast(steps=steps)
+                forecast_years = range(last_year + 1, max(future_years) + 1)
+                all_years.update({str(y): float(forecast[i]) for i, y in enumerate(forecast_years)})
+            result[str(month)] = all_years
+        except Exception as e:
+            print(f"month={month} error: {e}")
+            result[str(month)] = {"error": str(e)}
+    return result
+
+
+def _prophet_yearly(years, values, periods):
+    import pandas as pd
+    from prophet import Prophet
+
+    df = pd.DataFrame({
+        'ds': pd.to_datetime([str(y) for y in years], format='%Y'),
+        'y': values,
+    })
+    model = Prophet(yearly_seasonality=False, daily_seasonality=False, weekly_seasonality=False)
+    model.fit(df)
+    # 学習データと同じく各年の1月1日で予測する（freq='Y' は年末日になり、最後の年が欠ける）
+    last_year = int(years[-1])
+    all_years = [int(y) for y in years] + list(range(last_year + 1, last_year + periods + 1))
+    future = pd.DataFrame({'ds': pd.to_datetime([str(y) for y in all_years], format='%Y')})
+    forecast = model.predict(future)
+    return {str(y): float(yhat) for y, yhat in zip(all_years, forecast['yhat'])}
+
+
+def prophet_forecast(series, periods=100, run=None):
+    """Fit Prophet to the annual and per-month yearly mean max temperature.
+
+    Returns ``(annual_result, monthly_result)`` in the format of
+    ``src/data/prophet_annual_forecast.json`` and
+    ``src/data/prophet_monthly_forecast.json``.
+    """
+    years, values = yearly_series(series, 'max_temp')
+    with instrument.stage(run, 'fit_prophet', series='annual'):
+        annual_result = _prophet_yearly(years, values, periods)
+
+    monthly_result = {}
+    for month in range(1, 13):
+        years, values = yearly_series(series, 'max_temp', month=month)
+        if len(years) < 5:
+            monthly_result[str(month)] = {}
+            continue
+        with instrument.stage(run, 'fit_prophet', series=f'month-{month}'):
+            monthly_result[str(month)] = _prophet_yearly(years, values, periods)
+    return annual_result, monthly_result
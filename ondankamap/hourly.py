@@ -0,0 +1,312 @@
+"""
+JMA hourly temperature CSV ingestion, reduced on the fly to daily values.
+
+Hourly downloads have the same header block as the daily ones, with 24
+times the rows::
+
+    ダウンロードした時刻：2025/07/05 23:26:59
+    (blank)
+    ,東京,東京,東京
+    年月日時,気温(℃),気温(℃),気温(℃)
+    ,,,
+    ,,品質情報,均質番号
+    2024/1/1 1:00:00,5.3,8,1
+
+JMA stamps each value with the end of its hour, so ``1:00`` to ``24:00``
+(written ``0:00:00`` of the next day) make up one day, as in JMA's own
+daily statistics. :func:`iter_chunks` reads a fixed number of lines at a
+time into arrays, :class:`DailyReducer` folds the chunks into daily
+max/min/mean carrying only the unfinished last day over, and
+:class:`PartitionWriter` keeps the hourly values as one ``.npy`` per
+station and month for drill-down::
+
+    python -m ondankamap ingest-hourly hourly-*.csv --partitions data/hourly
+
+Memory is bounded by the chunk size whatever the date range.
+"""
+import io
+import itertools
+import os
+import time
+
+import numpy as np
+
+from .artifacts import write_bytes
+from .dataset import DailySeries, days_from_ymd, ymd_from_days
+from .ingest import DATE_LABEL, HOMOGENEITY_LABEL, QUALITY_LABEL, QUALITY_NORMAL, sniff_encoding
+
+TEMP_LABEL = '気温(℃)'
+HOURLY_DATE_LABEL = '年月日時'
+
+CHUNK_ROWS = 1 << 16
+# JMA の日別値と同じく、欠測が2割以内（20時間以上）なら日別値を出す
+MIN_HOURS = 20
+# 品質情報 5（準正常値）以上の値だけを集計に使う
+MIN_QUALITY = 5
+QUALITY_INSUFFICIENT = 4
+
+PARTITION_DIR = 'data/hourly'
+PARTITION_DTYPE = np.dtype([('hour', '<i4'), ('temp', '<f4'), ('quality', 'i1')])
+
+
+def read_hourly_header(f):
+    """Read the header of an hourly CSV; returns ``{station: {field: column}}``."""
+    lines = []
+    for line in f:
+        lines.append(line.rstrip('\r\n'))
+        if len(lines) >= 3 and lines[-3].startswith(DATE_LABEL):
+            break
+    for i, line in enumerate(lines):
+        if line.startswith(HOURLY_DATE_LABEL):
+            station_row = lines[i - 1].split(',') if i > 0 else []
+            element_row = line.split(',')
+            kind_row = lines[i + 2].split(',') if i + 2 < len(lines) else []
+            break
+    else:
+        raise ValueError("年月日時のヘッダー行が見つかりません（時別値のCSVではありません）")
+
+    positions = {}
+    for j in range(1, len(element_row)):
+        if element_row[j] != TEMP_LABEL:
+            continue
+        station = station_row[j] if j < len(station_row) else ''
+        kind = kind_row[j] if j < len(kind_row) else ''
+        field = {QUALITY_LABEL: 'quality', HOMOGENEITY_LABEL: 'homogeneity'}.get(kind, 'temp')
+        positions.setdefault(station, {})[field] = j
+    for station, fields in positions.items():
+        if 'temp' not in fields:
+            raise ValueError(f"{station}: 気温の列が見つかりません")
+    if not positions:
+        raise ValueError("気温の列が見つかりません")
+    return positions
+
+
+def _parse_chunk(lines, fields, day_cache):
+    """Arrays ``(hour, temp, quality)`` for one chunk of data lines."""
+    temp_at, quality_at = fields['temp'], fields.get('quality')
+    hours, temps, qualities = [], [], []
+    for line in lines:
+        row = line.rstrip('\r\n').split(',')
+        if not row[0]:
+            continue
+        date_text, _, time_text = row[0].partition(' ')
+        day = day_cache.get(date_text)
+        if day is None:
+            year, month, dom = (int(x) for x in date_text.split('/'))
+            day = day_cache[date_text] = int(days_from_ymd(year, month, dom))
+        hours.append(day * 24 + int(time_text.split(':', 1)[0]))
+        temps.append(row[temp_at] if temp_at < len(row) else '')
+        if quality_at is not None:
+            qualities.append(row[quality_at] if quality_at < len(row) else '')
+
+    temp = np.array(temps, dtype=str)
+    temp[temp == ''] = 'nan'
+    if quality_at is None:
+        quality = np.full(len(hours), QUALITY_NORMAL, dtype=np.int8)
+    else:
+        quality = np.array(qualities, dtype=str)
+        quality[quality == ''] = '1'
+        quality = quality.astype(np.int8)
+    return np.array(hours, dtype=np.int32), temp.astype(np.float32), quality
+
+
+def iter_chunks(path, station=None, encoding=None, chunk_rows=CHUNK_ROWS):
+    """Yield ``(hour, temp, quality)`` arrays of at most ``chunk_rows`` rows.
+
+    ``hour`` counts hours since 1970-01-01 0:00 (JMA end-of-hour stamps).
+    ``station`` defaults to the first station in the file.
+    """
+    with open(path, 'r', encoding=encoding or sniff_encoding(path)) as f:
+        positions = read_hourly_header(f)
+        fields = positions[next(iter(positions)) if station is None else station]
+        day_cache = {}
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            chunk = _parse_chunk(lines, fields, day_cache)
+            if len(chunk[0]):
+                yield chunk
+
+
+def csv_hourly_stations(path, encoding=None):
+    """Station names in an hourly CSV, in column order."""
+    with open(path, 'r', encoding=encoding or sniff_encoding(path)) as f:
+        return list(read_hourly_header(f))
+
+
+class DailyReducer:
+    """Fold time-ordered hourly chunks of one station into daily values.
+
+    The last day of each chunk may continue in the next one, so its rows
+    (at most 24) are carried over; everything else is reduced with one
+    ``reduceat`` per statistic. :meth:`result` returns a
+    :class:`DailySeries` with ``mean_temp`` and ``hours`` columns and
+    JMA-style quality flags: 8 for 24 valid hours, 5 for at least
+    ``min_hours``, otherwise 4 (資料不足値) with the values left NaN.
+    """
+
+    def __init__(self, station, min_hours=MIN_HOURS, min_quality=MIN_QUALITY):
+        self.station = station
+        self.min_hours = min_hours
+        self.min_quality = min_quality
+        self._carry = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        self._days = []
+
+    def add(self, hour, temp, quality):
+        valid = ~np.isnan(temp) & (quality >= self.min_quality)
+        hour = np.concatenate([self._carry[0], hour[valid]])
+        temp = np.concatenate([self._carry[1], temp[valid]])
+        if not len(hour):
+            return
+        day = (hour - 1) // 24
+        done = day < day[-1]
+        self._reduce(day[done], temp[done])
+        self._carry = (hour[~done], temp[~done])
+
+    def _reduce(self, day, temp):
+        if not len(day):
+            return
+        starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        values = temp.astype(np.float64)
+        self._days.append((
+            day[starts],
+            np.maximum.reduceat(values, starts),
+            np.minimum.reduceat(values, starts),
+            np.add.reduceat(values, starts),
+            np.diff(np.r_[starts, len(day)]),
+        ))
+
+    def result(self):
+        """Reduce the carried last day and return the daily series."""
+        hour, temp = self._carry
+        self._reduce((hour - 1) // 24, temp)
+        self._carry = (hour[:0], temp[:0])
+        if self._days:
+            day, high, low, total, hours = (np.concatenate(parts) for parts in zip(*self._days))
+        else:
+            day, high, low, total, hours = (np.zeros(0) for _ in range(5))
+        enough = hours >= self.min_hours
+        quality = np.where(hours >= 24, QUALITY_NORMAL,
+                           np.where(enough, 5, QUALITY_INSUFFICIENT)).astype(np.int8)
+        mean = np.round(np.where(enough, total / np.maximum(hours, 1), np.nan), 1)
+        columns = {
+            'mean_temp': mean,
+            'hours': hours.astype(np.int8),
+            'max_quality': quality,
+            'min_quality': quality,
+        }
+        return DailySeries(day, np.round(np.where(enough, high, np.nan), 1),
+                           np.round(np.where(enough, low, np.nan), 1),
+                           stations=[self.station], columns=columns)
+
+
+def partition_path(directory, station, year, month):
+    return os.path.join(directory, station, str(year), f'{month:02d}.npy')
+
+
+class PartitionWriter:
+    """Store one station's hourly rows as ``station/YYYY/MM.npy`` files.
+
+    Rows are grouped by the day they belong to, so a month file holds
+    ``1:00`` of the 1st to ``24:00`` of the last day. Only the month still
+    being read is buffered. A month that already has a file, from this run
+    (an overlapping file) or an earlier ingest (a partial month), is merged
+    with it, the rows read last winning; files are rewritten only when
+    their content changes.
+    """
+
+    def __init__(self, directory, station):
+        self.directory = directory
+        self.station = station
+        self.written = 0
+        self._key = None
+        self._buffer = []
+
+    def add(self, hour, temp, quality):
+        year, month, _ = ymd_from_days((hour - 1) // 24)
+        key = year.astype(np.int64) * 12 + month - 1
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        bounds = np.r_[starts, len(key)]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            if key[a] != self._key:
+                self.flush()
+                self._key = int(key[a])
+            self._buffer.append((hour[a:b], temp[a:b], quality[a:b]))
+
+    def flush(self):
+        if self._key is None or not self._buffer:
+            return
+        rows = np.zeros(sum(len(part[0]) for part in self._buffer), dtype=PARTITION_DTYPE)
+        for name, i in (('hour', 0), ('temp', 1), ('quality', 2)):
+            rows[name] = np.concatenate([part[i] for part in self._buffer])
+        year, month = divmod(self._key, 12)
+        path = partition_path(self.directory, self.station, year, month + 1)
+        if os.path.exists(path):
+            rows = np.concatenate([np.load(path), rows])
+            # 後から読んだ行を優先して時刻の重複を除く
+            _, last = np.unique(rows['hour'][::-1], return_index=True)
+            rows = rows[len(rows) - 1 - last]
+        buffer = io.BytesIO()
+        np.save(buffer, rows)
+        if write_bytes(path, buffer.getvalue()):
+            self.written += 1
+        self._key, self._buffer = None, []
+
+
+def read_hourly(directory, station, start=None, end=None):
+    """Hourly rows of ``station`` from the partitions, as a structured array.
+
+    ``start``/``end`` are ``(year, month)`` bounds, both inclusive.
+    """
+    base = os.path.join(directory, station)
+    parts = []
+    for year_dir in sorted(os.listdir(base), key=int) if os.path.isdir(base) else []:
+        for name in sorted(os.listdir(os.path.join(base, year_dir))):
+            key = (int(year_dir), int(name[:2]))
+            if (start is None or key >= tuple(start)) and (end is None or key <= tuple(end)):
+                parts.append(np.load(os.path.join(base, year_dir, name)))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=PARTITION_DTYPE)
+
+
+def ingest_hourly(paths, partitions=None, chunk_rows=CHUNK_ROWS, dropna=True):
+    """Reduce hourly CSVs to a :class:`DailySeries` of daily max/min/mean.
+
+    Every station in every file is read chunk by chunk; with ``partitions``
+    the hourly rows are also written under that directory. Files are merged
+    like the daily ones (later files win on duplicate days). Returns
+    ``(series, stats)`` with row counts, elapsed seconds and ``rows_per_sec``.
+    """
+    from .ingest import merge
+
+    started = time.perf_counter()
+    stats = {'files': 0, 'rows': 0, 'chunks': 0, 'partitions_written': 0}
+    writers = {}
+    parts = []
+    for path in paths:
+        encoding = sniff_encoding(path)
+        stats['files'] += 1
+        for station in csv_hourly_stations(path, encoding):
+            reducer = DailyReducer(station)
+            writer = None
+            if partitions is not None:
+                writer = writers.setdefault(station, PartitionWriter(partitions, station))
+            for hour, temp, quality in iter_chunks(path, station, encoding, chunk_rows):
+                stats['rows'] += len(hour)
+                stats['chunks'] += 1
+                reducer.add(hour, temp, quality)
+                if writer is not None:
+                    writer.add(hour, temp, quality)
+            if writer is not None:
+                writer.flush()
+            part = reducer.result()
+            if dropna:
+                part = part.take(~(np.isnan(part.max_temp) | np.isnan(part.min_temp)))
+            parts.append(part)
+
+    series, stats['duplicates'] = merge(parts) if parts else (DailySeries([], [], []), 0)
+    stats['days'] = len(series)
+    stats['partitions_written'] = sum(w.written for w in writers.values())
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['rows_per_sec'] = int(stats['rows'] / max(stats['seconds'], 1e-9))
+    return series, stats
@@ -0,0 +1,369 @@
+"""
+JMA daily max/min CSV ingestion.
+
+The downloads from the JMA "過去の気象データ" form share one layout::
+
+    ダウンロードした時刻：2025/07/05 23:26:59
+    (blank)
+    ,東京,東京,東京,東京,東京,東京
+    年月日,最高気温(℃),最高気温(℃),最高気温(℃),最低気温(℃),最低気温(℃),最低気温(℃)
+    ,,,,,,
+    ,,品質情報,均質番号,,品質情報,均質番号
+    2010/7/1,29.5,8,1,24.8,8,1
+
+Older downloads lack the 均質番号 columns and some files are Shift-JIS. The
+column roles are read from the header rows instead of fixed positions, so
+both layouts (and multi-station downloads) parse the same way.
+
+:func:`parse_csv_file` and :func:`merge` work on whole columns. For bounded
+memory the same steps are available as generators over record dicts:
+:func:`iter_csv_records` → :func:`merge_records` → :func:`ingest_stream`,
+which writes the merged records while they are produced.
+
+Rows whose date or values cannot be read are skipped and counted, as the
+``update-data*.py`` scripts did, instead of failing the whole file; pass a
+``counter`` dict to get ``counter['skipped']``.
+"""
+import codecs
+import heapq
+import itertools
+from datetime import date
+
+import numpy as np
+
+from .dataset import DailySeries, days_from_ymd, format_date, ymd_from_days
+
+MAX_TEMP_LABEL = '最高気温(℃)'
+MIN_TEMP_LABEL = '最低気温(℃)'
+QUALITY_LABEL = '品質情報'
+HOMOGENEITY_LABEL = '均質番号'
+DATE_LABEL = '年月日'
+
+# JMA 品質情報: 8=正常値, 5=準正常値, 4=資料不足値, 2=疑問値, 1=欠測
+QUALITY_NORMAL = 8
+
+ENCODINGS = ('utf-8-sig', 'cp932')
+
+
+def decode(raw, encoding=None):
+    """Decode CSV bytes, trying UTF-8 first and falling back to Shift-JIS."""
+    if encoding is not None:
+        return raw.decode(encoding)
+    for candidate in ENCODINGS:
+        try:
+            return raw.decode(candidate)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSVの文字コードを判定できません")
+
+
+def read_text(path, encoding=None):
+    with open(path, 'rb') as f:
+        return decode(f.read(), encoding)
+
+
+class ColumnLayout:
+    """Column positions of each station's values, read from the header rows."""
+
+    def __init__(self, station_row, element_row, kind_row):
+        self.stations = []
+        self.positions = {}
+        for j in range(1, len(element_row)):
+            station = station_row[j] if j < len(station_row) else ''
+            element = element_row[j]
+            kind = kind_row[j] if j < len(kind_row) else ''
+            if element == MAX_TEMP_LABEL:
+                prefix = 'max'
+            elif element == MIN_TEMP_LABEL:
+                prefix = 'min'
+            else:
+                continue
+            if kind == QUALITY_LABEL:
+                field = f'{prefix}_quality'
+            elif kind == HOMOGENEITY_LABEL:
+                field = f'{prefix}_homogeneity'
+            else:
+                field = f'{prefix}_temp'
+            if station not in self.positions:
+                self.stations.append(station)
+                self.positions[station] = {}
+            self.positions[station][field] = j
+
+        for station in self.stations:
+            fields = self.positions[station]
+            if 'max_temp' not in fields or 'min_temp' not in fields:
+                raise ValueError(f"{station}: 最高・最低気温の列が見つかりません")
+
+
+def find_header(lines):
+    """Return ``(layout, data_start)`` for the lines of a JMA CSV."""
+    for i, line in enumerate(lines):
+        if line.startswith(DATE_LABEL):
+            station_row = lines[i - 1].split(',') if i > 0 else []
+            element_row = line.split(',')
+            kind_row = lines[i + 2].split(',') if i + 2 < len(lines) else []
+            return ColumnLayout(station_row, element_row, kind_row), i + 3
+    raise ValueError("年月日のヘッダー行が見つかりません")
+
+
+def _float_column(rows, position):
+    values = np.array([row[position] if position < len(row) else '' for row in rows], dtype=str)
+    values[values == ''] = 'nan'
+    return values.astype(np.float64)
+
+
+def _int_column(rows, position, default):
+    if position is None:
+        return np.full(len(rows), default, dtype=np.int8)
+    values = np.array([row[position] if position < len(row) else '' for row in rows], dtype=str)
+    values[values == ''] = str(default)
+    return values.astype(np.int8)
+
+
+def _row_date(text):
+    """``(year, month, day)`` of a date field, or None if it is not a real date."""
+    try:
+        year, month, day = (int(x) for x in text.split('/'))
+        date(year, month, day)
+    except ValueError:
+        return None
+    return year, month, day
+
+
+def _row_ok(row, layout):
+    """Whether every field :func:`parse_lines` reads from ``row`` is readable."""
+    if _row_date(row[0]) is None:
+        return False
+    try:
+        for fields in layout.positions.values():
+            for field, position in fields.items():
+                text = _value(row, position)
+                if text:
+                    float(text) if field.endswith('_temp') else int(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_rows(rows, layout):
+    ymd = np.array([row[0].split('/') for row in rows], dtype=np.int64).reshape(-1, 3)
+    day_index = days_from_ymd(ymd[:, 0], ymd[:, 1], ymd[:, 2])
+    values = {}
+    for station in layout.stations:
+        fields = layout.positions[station]
+        values[station] = (_float_column(rows, fields['max_temp']),
+                           _float_column(rows, fields['min_temp']), {
+            'max_quality': _int_column(rows, fields.get('max_quality'), QUALITY_NORMAL),
+            'min_quality': _int_column(rows, fields.get('min_quality'), QUALITY_NORMAL),
+            'homogeneity': _int_column(rows, fields.get('max_homogeneity'), 0),
+        })
+    # 2/30 のような存在しない日付は日番号から戻すと食い違う
+    _, month, day = ymd_from_days(day_index)
+    if np.any((month != ymd[:, 1]) | (day != ymd[:, 2])):
+        raise ValueError("存在しない日付があります")
+    return day_index, values
+
+
+def parse_lines(lines, dropna=True, counter=None):
+    """Parse the lines of one JMA CSV into a :class:`DailySeries`.
+
+    Quality flags are kept as the ``max_quality``/``min_quality`` columns and
+    the homogeneity number as ``homogeneity`` (0 when the file has none).
+    With ``dropna`` days missing either value are dropped, as the
+    ``update-data*.py`` scripts do. Unreadable rows are skipped and added
+    to ``counter['skipped']`` when a dict is passed.
+    """
+    lines = [line.rstrip('\r\n') for line in lines]
+    layout, data_start = find_header(lines)
+    rows = [line.split(',') for line in lines[data_start:] if line.strip()]
+    rows = [row for row in rows if row[0]]
+    try:
+        day_index, values = _parse_rows(rows, layout)
+    except ValueError:
+        # 壊れた行があるときだけ1行ずつ確かめて読み飛ばす
+        good = [row for row in rows if _row_ok(row, layout)]
+        if counter is not None:
+            counter['skipped'] = counter.get('skipped', 0) + len(rows) - len(good)
+        rows = good
+        day_index, values = _parse_rows(rows, layout)
+
+    parts = []
+    for station in layout.stations:
+        max_temp, min_temp, columns = values[station]
+        part = DailySeries(day_index, max_temp, min_temp, stations=[station], columns=columns)
+        if dropna:
+            part = part.take(~(np.isnan(part.max_temp) | np.isnan(part.min_temp)))
+        parts.append(part)
+    return parts[0] if len(parts) == 1 else DailySeries.concat(parts)
+
+
+def parse_text(text, dropna=True, counter=None):
+    return parse_lines(text.splitlines(), dropna=dropna, counter=counter)
+
+
+def parse_csv_file(path, encoding=None, dropna=True, counter=None):
+    """Parse a JMA CSV file (UTF-8 or Shift-JIS)."""
+    return parse_text(read_text(path, encoding), dropna=dropna, counter=counter)
+
+
+def merge(parts):
+    """Merge parsed files, later parts winning on duplicate station/day.
+
+    Returns ``(series, duplicate_count)``. This is the vectorized form of the
+    ``unique_data`` dict in ``update-data-ultimate.py`` (newer file wins).
+    """
+    # concat の並べ替えは安定ソートなので、同じ (station, day) は parts の順に並ぶ
+    merged = DailySeries.concat([part for part in parts if part is not None])
+    if len(merged) < 2:
+        return merged, 0
+    last = np.ones(len(merged), dtype=bool)
+    last[:-1] = (merged.station[1:] != merged.station[:-1]) | \
+        (merged.day_index[1:] != merged.day_index[:-1])
+    duplicates = int(len(merged) - np.count_nonzero(last))
+    return (merged.take(last) if duplicates else merged), duplicates
+
+
+# ----------------------------------------------------------------------
+# ストリーミング処理（レコード単位のジェネレータ）
+
+SNIFF_BYTES = 1 << 16
+
+
+def sniff_encoding(path):
+    """Pick the encoding of a CSV from its first bytes."""
+    with open(path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    for candidate in ENCODINGS:
+        try:
+            # 先頭部分だけなので、途中で切れた多バイト文字は許容する
+            codecs.getincrementaldecoder(candidate)().decode(head, final=False)
+            return candidate
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSVの文字コードを判定できません")
+
+
+def read_header(f):
+    """Read lines from ``f`` up to the end of the header; returns the layout."""
+    lines = []
+    for line in f:
+        lines.append(line.rstrip('\r\n'))
+        if len(lines) >= 3 and lines[-3].startswith(DATE_LABEL):
+            return find_header(lines)[0]
+    return find_header(lines)[0]
+
+
+def csv_stations(path, encoding=None):
+    """Station names in a JMA CSV, in column order."""
+    with open(path, 'r', encoding=encoding or sniff_encoding(path)) as f:
+        return read_header(f).stations
+
+
+def _value(row, position):
+    return row[position] if position is not None and position < len(row) else ''
+
+
+def iter_csv_records(path, station=None, encoding=None, dropna=True, quality=False,
+                     counter=None):
+    """Yield one station's rows of a JMA CSV as record dicts, reading lazily.
+
+    ``station`` defaults to the first station in the file. Records carry
+    ``station`` and, with ``quality``, the quality/homogeneity fields that
+    :func:`parse_lines` keeps as columns. Rows :func:`parse_lines` would
+    skip are skipped here too and counted in ``counter['skipped']``.
+    """
+    with open(path, 'r', encoding=encoding or sniff_encoding(path)) as f:
+        layout = read_header(f)
+        station = layout.stations[0] if station is None else station
+        fields = layout.positions[station]
+        for line in f:
+            row = line.rstrip('\r\n').split(',')
+            if not row[0]:
+                continue
+            if not _row_ok(row, layout):
+                if counter is not None:
+                    counter['skipped'] = counter.get('skipped', 0) + 1
+                continue
+            max_text, min_text = _value(row, fields['max_temp']), _value(row, fields['min_temp'])
+            if dropna and not (max_text and min_text):
+                continue
+            year, month, day = (int(x) for x in row[0].split('/'))
+            record = {
+                'date': format_date(year, month, day),
+                'year': year,
+                'month': month,
+                'day': day,
+                'max_temp': float(max_text) if max_text else float('nan'),
+                'min_temp': float(min_text) if min_text else float('nan'),
+                'station': station,
+            }
+            if quality:
+                record['max_quality'] = int(_value(row, fields.get('max_quality')) or QUALITY_NORMAL)
+                record['min_quality'] = int(_value(row, fields.get('min_quality')) or QUALITY_NORMAL)
+                record['homogeneity'] = int(_value(row, fields.get('max_homogeneity')) or 0)
+            yield record
+
+
+def merge_records(streams, stations=None, counter=None):
+    """Merge per-station record streams that are each in date order.
+
+    Later streams win on duplicate station/day, as in :func:`merge`. Output
+    is ordered by station (``stations`` order, else first appearance) and
+    date. ``counter['duplicates']`` is updated when a dict is passed.
+    """
+    streams = list(streams)
+    rank = {name: i for i, name in enumerate(stations or ())}
+
+    def key(record):
+        name = record['station']
+        if name not in rank:
+            rank[name] = len(rank)
+        return rank[name], record['year'], record['month'], record['day']
+
+    # heapq.merge は同じキーを入力順に並べるので、各グループの最後が新しいファイル
+    for _, group in itertools.groupby(heapq.merge(*streams, key=key), key=key):
+        record = None
+        for n, record in enumerate(group):
+            if n and counter is not None:
+                counter['duplicates'] = counter.get('duplicates', 0) + 1
+        yield record
+
+
+def ingest_stream(paths, output, start_year=1880, end_year=2024, report=None):
+    """Parse, merge, check and write ``paths`` to ``output`` record by record.
+
+    Memory stays bounded by one record per input stream, independent of the
+    number of days. The written file is identical to the columnar path's.
+    ``report`` may be a :class:`ondankamap.validate.StreamReport` that sees
+    every written record. Returns ``{'rows', 'duplicates', 'skipped', 'changed'}``.
+    """
+    from .jsonstream import date_string_order, write_records
+
+    paths = list(paths)
+    # 局の並びは merge と同じく入力ファイルでの初出順
+    stations = []
+    streams = []
+    counter = {'duplicates': 0, 'skipped': 0}
+    for path in paths:
+        encoding = sniff_encoding(path)
+        for station in csv_stations(path, encoding):
+            if station not in stations:
+                stations.append(station)
+            streams.append(iter_csv_records(path, station, encoding, counter=counter))
+    include_station = len(stations) > 1
+
+    records = (r for r in merge_records(streams, stations, counter)
+               if start_year <= r['year'] <= end_year)
+    if report is not None:
+        records = report.check(records)
+
+    def output_records():
+        for record in date_string_order(records):
+            if not include_station:
+                record = dict(record)
+                del record['station']
+            yield record
+
+    rows, changed = write_records(output, output_records())
+    return {'rows': rows, 'duplicates': counter['duplicates'], 'skipped': counter['skipped'],
+            'changed': changed}
@@ -0,0 +1,285 @@
+"""
+Per-stage timing and memory instrumentation for the pipeline scripts.
+
+Each script opens a run and wraps its stages::
+
+    with instrument.run('filter-data') as run:
+        with run.stage('load_json'):
+            ...
+        with run.stage('write_output', path=output_file):
+            ...
+
+Every stage records wall time, CPU time and the process peak RSS. With
+``ONDANKAMAP_TRACEMALLOC=1`` the tracemalloc peak is recorded as well; it is
+off by default because tracing slows allocation-heavy stages such as CSV
+parsing by an order of magnitude. When ``ONDANKAMAP_PROFILE_DIR`` is set,
+each stage is also run under cProfile and dumped to
+``<dir>/<run_id>-<nn>-<stage>.prof``. On exit the run is appended as one
+JSON line to the run log (``logs/run_log.jsonl`` or ``ONDANKAMAP_RUN_LOG``),
+which :func:`summarize` reads back::
+
+    python -m ondankamap.instrument --script update-data-ultimate
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_RUN_LOG = os.path.join('logs', 'run_log.jsonl')
+RUN_LOG_ENV = 'ONDANKAMAP_RUN_LOG'
+PROFILE_DIR_ENV = 'ONDANKAMAP_PROFILE_DIR'
+TRACEMALLOC_ENV = 'ONDANKAMAP_TRACEMALLOC'
+
+_MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """Process peak resident set size in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位で返す
+    return peak / _MB if sys.platform == 'darwin' else peak / 1024
+
+
+def run_log_path():
+    return os.environ.get(RUN_LOG_ENV, DEFAULT_RUN_LOG)
+
+
+class Run:
+    """One execution of a pipeline script and the stages it went through."""
+
+    def __init__(self, script, log_path=None, profile_dir=None, trace_memory=None):
+        self.script = script
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.urandom(3).hex()}"
+        self.log_path = log_path if log_path is not None else run_log_path()
+        self.profile_dir = profile_dir if profile_dir is not None \
+            else os.environ.get(PROFILE_DIR_ENV)
+        if trace_memory is None:
+            trace_memory = os.environ.get(TRACEMALLOC_ENV, '0') == '1'
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._depth = 0
+        # 計測中の段階ごとの tracemalloc ピーク（入れ子の段階が reset_peak する前の値を退避する）
+        self._peaks = []
+        self._started_at = datetime.now().isoformat(timespec='seconds')
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def stage(self, name, **meta):
+        """Measure the enclosed block as a stage; ``meta`` is logged as-is."""
+        record = {'name': name, 'depth': self._depth}
+        if meta:
+            record['meta'] = meta
+        # 入れ子の段階より先に親を並べるため、開始時点で登録しておく
+        self.stages.append(record)
+        rss_before = peak_rss_mb()
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        profiler = None
+        if self.profile_dir:
+            import cProfile
+            profiler = cProfile.Profile()
+
+        self._depth += 1
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+            record['status'] = 'ok'
+        except BaseException as e:
+            record['status'] = 'error'
+            record['error'] = repr(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            self._depth -= 1
+            rss_after = peak_rss_mb()
+            if rss_after is not None:
+                record['peak_rss_mb'] = rss_after
+                record['rss_growth_mb'] = rss_after - rss_before
+            if tracing:
+                # 子の段階のピークは退避済みの値に含まれている
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                record['tracemalloc_peak_mb'] = peak / _MB
+            if profiler:
+                record['profile'] = self._dump_profile(profiler, name, self.stages.index(record))
+
+    def _dump_profile(self, profiler, name, position):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        safe = re.sub(r'[^\w.-]+', '_', name)
+        path = os.path.join(self.profile_dir, f'{self.run_id}-{position:02d}-{safe}.prof')
+        profiler.dump_stats(path)
+        return path
+
+    def finish(self, status='ok', error=None):
+        """Append the run to the run log and return the record."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        record = {
+            'run_id': self.run_id,
+            'script': self.script,
+            'started_at': self._started_at,
+            'status': status,
+            'wall_seconds': time.perf_counter() - self._wall,
+            'cpu_seconds': time.process_time() - self._cpu,
+            'peak_rss_mb': peak_rss_mb(),
+            'tracemalloc': self.trace_memory,
+            'stages': self.stages,
+        }
+        if error is not None:
+            record['error'] = error
+        if self.log_path:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record
+
+
+@contextmanager
+def run(script, **kwargs):
+    """Context manager form of :class:`Run` that always writes the log."""
+    current = Run(script, **kwargs)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(status='error', error=repr(e))
+        raise
+    current.finish()
+
+
+def stage(run, name, **meta):
+    """``run.stage(name, **meta)``, or a no-op when ``run`` is None.
+
+    Lets library functions accept an optional run from their caller.
+    """
+    if run is None:
+        return nullcontext()
+    return run.stage(name, **meta)
+
+
+def read_runs(path=None, script=None):
+    """Read run records from the run log, oldest first."""
+    path = path or run_log_path()
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if script is None or record['script'] == script:
+                runs.append(record)
+    return runs
+
+
+def summarize(runs, slow_factor=1.5):
+    """Compare each script's latest run with the median of its earlier runs.
+
+    Returns a list of rows ``{script, stage, latest, median, ratio, slow}``
+    (times in seconds); stages are matched by name and meta.
+    """
+    import statistics
+
+    by_script = {}
+    for record in runs:
+        by_script.setdefault(record['script'], []).append(record)
+
+    rows = []
+    for script, records in by_script.items():
+        latest = records[-1]
+        # tracemalloc の有無で実行時間が大きく変わるため、同じ条件の実行とだけ比べる
+        history = [r for r in records[:-1] if r.get('tracemalloc') == latest.get('tracemalloc')]
+        for stage in latest['stages']:
+            key = (stage['name'], json.dumps(stage.get('meta'), sort_keys=True))
+            previous = [
+                s['wall_seconds'] for r in history for s in r['stages']
+                if (s['name'], json.dumps(s.get('meta'), sort_keys=True)) == key
+            ]
+            median = statistics.median(previous) if previous else None
+            ratio = stage['wall_seconds'] / median if median else None
+            rows.append({
+                'script': script,
+                'run_id': latest['run_id'],
+                'stage': stage['name'],
+                'meta': stage.get('meta'),
+                'depth': stage.get('depth', 0),
+                'latest': stage['wall_seconds'],
+                'cpu': stage.get('cpu_seconds'),
+                'peak_rss_mb': stage.get('peak_rss_mb'),
+                'tracemalloc_peak_mb': stage.get('tracemalloc_peak_mb'),
+                'median': median,
+                'ratio': ratio,
+                'slow': ratio is not None and ratio > slow_factor,
+            })
+    return rows
+
+
+def print_summary(rows):
+    script = None
+    for row in rows:
+        if row['script'] != script:
+            script = row['script']
+            print(f"\n{script} ({row['run_id']})")
+            print(f"  {'段階':<28}{'実時間':>10}{'CPU':>10}{'RSS(MB)':>10}"
+                  f"{'tracemalloc':>12}{'中央値比':>10}")
+        label = '  ' * row['depth'] + row['stage']
+        if row['meta']:
+            label += ' ' + ','.join(str(v) for v in row['meta'].values())
+        ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else '-'
+        rss = f"{row['peak_rss_mb']:.1f}" if row['peak_rss_mb'] is not None else '-'
+        traced = f"{row['tracemalloc_peak_mb']:.1f}" if row['tracemalloc_peak_mb'] is not None else '-'
+        mark = ' <- 遅延' if row['slow'] else ''
+        print(f"  {label[:28]:<28}{row['latest']:>9.3f}s{row['cpu'] or 0:>9.3f}s"
+              f"{rss:>10}{traced:>12}{ratio:>10}{mark}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='実行ログの段階別サマリー')
+    parser.add_argument('--log', help=f'実行ログ（既定: {DEFAULT_RUN_LOG}）')
+    parser.add_argument('--script', help='対象スクリプト名で絞り込む')
+    parser.add_argument('--slow-factor', type=float, default=1.5,
+                        help='過去の中央値に対してこの倍率を超えた段階を遅延とみなす')
+    args = parser.parse_args(argv)
+
+    runs = read_runs(args.log, args.script)
+    if not runs:
+        print("実行ログがありません")
+        return 1
+    print_summary(summarize(runs, args.slow_factor))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Streaming reader/writer for the daily JSON files.
+
+The daily files are one top-level array of flat records. :func:`iter_records`
+decodes them incrementally, one record at a time, from a fixed-size read
+buffer; :func:`write_records` encodes records as they are produced and emits
+byte-for-byte the same text as ``json.dump(records, f, ensure_ascii=False,
+indent=2)``, so existing files and consumers are unaffected.
+
+The daily files have always been sorted by the ``date`` string
+(``1936/1/1``, ``1936/1/10``, ..., ``1936/1/2``), as ``update-data*.py``
+sort them; :func:`date_string_order` puts day-ordered records in that order
+so every writer of a file produces the same bytes.
+"""
+import json
+
+from .artifacts import open_atomic
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array from a text file object."""
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    fill()
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError("JSON配列ではありません")
+    pos += 1
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == ']':
+        return
+
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+                # 数値がバッファ末尾で途切れている可能性があるので、続きがありうるなら読み足す
+                if not eof and (end == len(buffer) or buffer[end] in _NUMBER_CHARS):
+                    raise ValueError
+                break
+            except ValueError:
+                if eof:
+                    raise ValueError("JSONが途中で終わっています") from None
+                fill()
+        pos = end
+        yield value
+
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError("JSONが途中で終わっています")
+        if buffer[pos] == ']':
+            return
+        if buffer[pos] != ',':
+            raise ValueError(f"区切り文字が不正です: {buffer[pos]!r}")
+        pos += 1
+
+
+def iter_records(path, chunk_size=CHUNK_SIZE):
+    """Lazily yield the records of a daily JSON file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_json_array(f, chunk_size)
+
+
+def date_string_order(records):
+    """Reorder day-ordered records by station, then by the ``date`` string.
+
+    Records must arrive grouped by station and year, as
+    :meth:`DailySeries.iter_records` and the ingest streams yield them. Years
+    are four digits, so sorting within each station-year gives the order of
+    a full string sort while buffering at most one year.
+    """
+    group, key = [], None
+    for record in records:
+        current = (record.get('station'), record['year'])
+        if current != key and group:
+            group.sort(key=lambda r: r['date'])
+            yield from group
+            group = []
+        key = current
+        group.append(record)
+    group.sort(key=lambda r: r['date'])
+    yield from group
+
+
+def dump_records(records, f, indent=2):
+    """Write records to a text file object as they arrive; returns the count.
+
+    The output matches ``json.dump(list(records), f, ensure_ascii=False,
+    indent=indent)`` exactly; ``indent=None`` gives the one-line form.
+    """
+    count = 0
+    if indent is None:
+        for record in records:
+            f.write(('[' if count == 0 else ', ') + json.dumps(record, ensure_ascii=False))
+            count += 1
+        f.write(']' if count else '[]')
+        return count
+    pad = ' ' * indent
+    for record in records:
+        text = json.dumps(record, ensure_ascii=False, indent=indent)
+        f.write(('[\n' if count == 0 else ',\n') + pad + text.replace('\n', '\n' + pad))
+        count += 1
+    f.write('\n]' if count else '[]')
+    return count
+
+
+def write_records(path, records, indent=2):
+    """Stream records to ``path`` atomically, only replacing it on change.
+
+    Returns ``(count, changed)``.
+    """
+    with open_atomic(path) as f:
+        count = dump_records(records, f, indent=indent)
+    return count, f.changed
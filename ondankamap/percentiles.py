@@ -0,0 +1,172 @@
+"""
+Day-of-year percentile climatology over a ±7-day window, and exceedance
+columns for warm-day / cold-night indices (TX90p, TN10p, ...).
+
+For every slot of the 366-day grid the sample is the reference years'
+values within ``±half_window`` days (wrapping around the new year). All 366
+samples are gathered at once from the year × day-of-year grid into one
+``(366, years × window)`` matrix and sorted in a single batched call; the
+percentiles are then read off by linear interpolation between order
+statistics, per row, counting only non-NaN values.
+
+The per-day bands are published as strings on a contiguous calendar grid:
+``bands['start']`` is the first date and character ``i`` belongs to the
+``i``-th day after it, with ``-`` for days without a value. They do not
+follow the row order of the daily JSON, which is sorted by date string.
+"""
+import numpy as np
+
+from .aggregate import year_doy_grid
+from .anomaly import REFERENCE_PERIOD
+from .dataset import DAYS_IN_GRID, format_date
+from .query import Query
+
+PERCENTILES = (10, 50, 90, 99)
+HALF_WINDOW = 7
+
+BAND_COLUMNS = {'max_temp': 'max_band', 'min_temp': 'min_band'}
+
+
+def window_samples(grid, half_window=HALF_WINDOW):
+    """Return ``(366, years × (2 * half_window + 1))`` windowed samples."""
+    offsets = np.arange(-half_window, half_window + 1)
+    columns = (np.arange(DAYS_IN_GRID)[:, None] + offsets[None, :]) % DAYS_IN_GRID
+    # (年, 366, 窓) → (366, 年 × 窓)
+    samples = grid[:, columns]
+    return samples.transpose(1, 0, 2).reshape(DAYS_IN_GRID, -1)
+
+
+def row_percentiles(samples, percentiles=PERCENTILES):
+    """NaN-aware percentiles of each row (linear interpolation).
+
+    Equivalent to ``np.nanpercentile(samples, percentiles, axis=1).T`` but
+    with one sort for the whole batch.
+    """
+    ordered = np.sort(samples, axis=1)  # NaN は末尾に並ぶ
+    count = (~np.isnan(samples)).sum(axis=1)
+    q = np.asarray(percentiles, dtype=np.float64) / 100
+    position = (np.maximum(count, 1) - 1)[:, None] * q[None, :]
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0)[:, None])
+    rows = np.arange(len(samples))[:, None]
+    fraction = position - lower
+    result = ordered[rows, lower] * (1 - fraction) + ordered[rows, upper] * fraction
+    result[count == 0] = np.nan
+    return result
+
+
+def doy_percentiles(series, column='max_temp', reference=REFERENCE_PERIOD,
+                    half_window=HALF_WINDOW, percentiles=PERCENTILES, station=None):
+    """``(366, len(percentiles))`` thresholds of ``column`` per grid slot."""
+    years, grid = year_doy_grid(series, column, station=station)
+    start, end = reference
+    rows = (years >= start) & (years <= end)
+    if not rows.any():
+        raise ValueError(f"基準期間 {start}-{end} のデータがありません")
+    return row_percentiles(window_samples(grid[rows], half_window), percentiles)
+
+
+def with_exceedance(series, reference=REFERENCE_PERIOD, half_window=HALF_WINDOW,
+                    percentiles=PERCENTILES):
+    """Add ``max_band``/``min_band`` int8 columns.
+
+    The band is how many of the day's thresholds the value exceeds: with
+    the default percentiles 0 is below p10, 3 is above p90 and 4 above
+    p99, so TX90p is ``max_band >= 3`` and TN10p is ``min_band == 0``.
+    Days without a value get -1. Returns ``(series, thresholds)`` with
+    ``thresholds[station][column]`` of shape ``(366, len(percentiles))``.
+    """
+    bands = {name: np.full(len(series), -1, dtype=np.int8) for name in BAND_COLUMNS.values()}
+    thresholds = {}
+    slot = series.doy - 1
+    for code, (start, stop) in series.station_bounds().items():
+        if start == stop:
+            continue
+        station = series.stations[code]
+        thresholds[station] = {}
+        for column, name in BAND_COLUMNS.items():
+            table = doy_percentiles(series, column, reference, half_window, percentiles,
+                                    station=station)
+            values = series.column(column)[start:stop]
+            day_thresholds = table[slot[start:stop]]
+            band = (values[:, None] > day_thresholds).sum(axis=1)
+            bands[name][start:stop] = np.where(np.isnan(values), -1, band)
+            thresholds[station][column] = table
+    for name, values in bands.items():
+        series = series.with_column(name, values)
+    return series, thresholds
+
+
+def yearly_indices(series, percentiles=PERCENTILES):
+    """Per station and year: warm/cool days and warm/cold nights (day counts).
+
+    Needs the band columns from :func:`with_exceedance`. Warm means above
+    the highest-but-one percentile (p90), cool/cold below the lowest (p10).
+    """
+    warm_band = len(percentiles) - 1
+    flags = {
+        'warm_days': series.column('max_band') >= warm_band,
+        'cool_days': series.column('max_band') == 0,
+        'warm_nights': series.column('min_band') >= warm_band,
+        'cold_nights': series.column('min_band') == 0,
+    }
+    for name, flag in flags.items():
+        series = series.with_column(name, flag.astype(np.float64))
+    return Query(series).group_by('station', 'year').agg(
+        **{name: (name, 'sum') for name in flags})
+
+
+def band_string(day_index, bands):
+    """Encode a band column as one digit per day from ``day_index[0]``.
+
+    ``day_index`` must be sorted; days that are absent or have no value
+    are ``-``.
+    """
+    if not len(day_index):
+        return ''
+    offset = day_index - day_index[0]
+    chars = np.full(int(offset[-1]) + 1, ord('-'), dtype=np.uint8)
+    chars[offset] = np.where(bands < 0, ord('-'), ord('0') + bands.astype(np.int64))
+    return chars.tobytes().decode('ascii')
+
+
+def percentile_table(series, reference=REFERENCE_PERIOD, half_window=HALF_WINDOW,
+                     percentiles=PERCENTILES, digits=1):
+    """JSON-ready thresholds, yearly indices and per-day bands.
+
+    The bands are strings with one character per calendar day from
+    ``bands['start']`` (see the module docstring), which keeps the per-day
+    column small and independent of the daily JSON's row order.
+    """
+    series, thresholds = with_exceedance(series, reference, half_window, percentiles)
+    indices = yearly_indices(series, percentiles)
+    result = {
+        'reference': list(reference),
+        'half_window': half_window,
+        'percentiles': list(percentiles),
+        'stations': {},
+    }
+    for code, station in enumerate(series.stations):
+        if station not in thresholds:
+            continue
+        start, stop = series.station_bounds()[code]
+        rows = indices['station'] == station
+        result['stations'][station] = {
+            'thresholds': {
+                column: {f'p{p}': [None if np.isnan(v) else v
+                                   for v in np.round(table[:, i], digits).tolist()]
+                         for i, p in enumerate(percentiles)}
+                for column, table in thresholds[station].items()
+            },
+            'yearly': {
+                'year': indices['year'][rows].astype(int).tolist(),
+                **{name: indices[name][rows].astype(int).tolist()
+                   for name in ('warm_days', 'cool_days', 'warm_nights', 'cold_nights')},
+            },
+            'bands': {
+                'start': format_date(series.year[start], series.month[start], series.dom[start]),
+                **{name: band_string(series.day_index[start:stop], series.columns[name][start:stop])
+                   for name in BAND_COLUMNS.values()},
+            },
+        }
+    return result
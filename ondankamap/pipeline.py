@@ -0,0 +1,473 @@
+"""
+Dependency-aware pipeline runner.
+
+The data flow that used to be run by hand (``update-data-ultimate.py`` →
+copy to ``src/data/tokyo_temperature_data.json`` → ``filter-data.py``,
+``arima_monthly_forecast.py``, ``prophet_temperature_forecast.py``) is
+declared here as stages with explicit inputs and outputs::
+
+    python -m ondankamap run             # rebuild only stale artifacts
+    python -m ondankamap run --dry-run   # show what would run
+    python -m ondankamap run --force arima
+
+A stage is skipped when the hashes of its inputs and of its code are the
+same as on the last successful run and its outputs are unchanged on disk.
+Stages whose dependencies are done run concurrently in a process pool.
+Outputs go through :mod:`ondankamap.artifacts`, so they are replaced
+atomically and left untouched when their content is the same.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+
+from . import instrument
+from .artifacts import file_digest, write_bytes, write_json
+from .jsonstream import date_string_order, write_records
+
+STATE_FILE = '.pipeline_state.json'
+DAILY_JSON = 'src/data/tokyo_temperature_data.json'
+
+# update-data-ultimate.py と同じ順序（新しいファイルを優先）
+SOURCE_CSVS = (
+    'data-10-utf8.csv', 'data-9-utf8.csv', 'data-8-utf8.csv', 'data-7-utf8.csv',
+    'data-6-utf8.csv', 'data-5-utf8.csv', 'data-4.csv', 'data-3.csv', 'data-2.csv',
+    'data-utf8.csv',
+)
+
+
+class Stage:
+    """A pipeline step: ``func(inputs, outputs, run=run, **params)`` writes ``outputs``.
+
+    ``code`` lists the modules whose source is part of the stage's cache key.
+    """
+
+    def __init__(self, name, func, inputs, outputs, code=(), params=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.code = tuple(code)
+        self.params = params or {}
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+# ----------------------------------------------------------------------
+# ステージ本体（プロセスプールで実行するためモジュールレベルに置く）
+
+def build_daily(inputs, outputs, start_year=1880, end_year=2024, stream=False, run=None):
+    """Merge the CSVs into the daily JSON.
+
+    With ``stream`` the records flow parse → merge → check → write as
+    generators (:func:`ondankamap.ingest.ingest_stream`), so memory does not
+    grow with the number of days; the output file is the same either way.
+    """
+    if stream:
+        from .ingest import ingest_stream
+        from .validate import StreamReport
+
+        report = StreamReport()
+        with instrument.stage(run, 'ingest_stream', files=len(inputs)):
+            info = ingest_stream(inputs, outputs[0], start_year, end_year, report=report)
+        info['missing_days'] = sum(r['missing_days'] for r in report.report().values())
+        del info['changed']
+        return info
+
+    from .ingest import merge, parse_csv_file
+    from .query import Query
+
+    parts = []
+    counter = {'skipped': 0}
+    for path in inputs:
+        with instrument.stage(run, 'parse_csv', file=os.path.basename(path)):
+            parts.append(parse_csv_file(path, counter=counter))
+    with instrument.stage(run, 'merge'):
+        series, duplicates = merge(parts)
+        series = Query(series).years(start_year, end_year).series()
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_records(outputs[0], date_string_order(series.iter_records(include_columns=False)))
+    return {'rows': len(series), 'duplicates': duplicates, 'skipped': counter['skipped']}
+
+
+def _load_daily(path, run):
+    from .dataset import DailySeries
+
+    with instrument.stage(run, 'load_json', path=path):
+        return DailySeries.load_json(path)
+
+
+def filter_daily(inputs, outputs, start_year=1936, end_year=2024, run=None):
+    from .query import Query
+
+    series = Query(_load_daily(inputs[0], run)).years(start_year, end_year).series()
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_records(outputs[0], date_string_order(series.iter_records()))
+    return {'rows': len(series)}
+
+
+def build_shards(inputs, outputs, run=None):
+    from .shards import write_shards
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'write_shards'):
+        return write_shards(series, os.path.dirname(outputs[0]))
+
+
+def build_downsampled(inputs, outputs, run=None):
+    from .downsample import write_downsampled
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'lttb'):
+        return write_downsampled(series, os.path.dirname(outputs[0]))
+
+
+def compare_years(inputs, outputs, run=None):
+    from .compare import year_comparison
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'pair_matrices'):
+        result = year_comparison(series)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], result, indent=None)
+
+
+def anomaly_daily(inputs, outputs, reference=(1991, 2020), window=31, run=None):
+    from .anomaly import anomaly_records, baseline_table, with_anomalies
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'anomaly', reference=list(reference)):
+        series, baselines = with_anomalies(series, tuple(reference), window)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_records(outputs[0], anomaly_records(series), indent=None)
+        write_json(outputs[1], {'reference': list(reference), 'window': window,
+                                'baseline': baseline_table(baselines)})
+    return {'rows': len(series)}
+
+
+def arima_forecast(inputs, outputs, run=None):
+    from .forecast import arima_monthly_forecast
+
+    result = arima_monthly_forecast(_load_daily(inputs[0], run), run=run)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], result)
+
+
+def prophet_forecast(inputs, outputs, run=None):
+    from .forecast import prophet_forecast as fit
+
+    annual, monthly = fit(_load_daily(inputs[0], run), run=run)
+    with instrument.stage(run, 'write_json'):
+        write_json(outputs[0], annual)
+        write_json(outputs[1], monthly)
+
+
+def seasonal_dates(inputs, outputs, run=None):
+    from .seasons import seasonal_table
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'seasonal_timing'):
+        table = seasonal_table(series)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], table)
+
+
+def detect_spells(inputs, outputs, run=None):
+    from .spells import spell_table
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'find_spells'):
+        table = spell_table(series)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], table)
+
+
+def percentile_climatology(inputs, outputs, reference=(1991, 2020), run=None):
+    from .percentiles import percentile_table
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'percentiles', reference=list(reference)):
+        table = percentile_table(series, tuple(reference))
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], table)
+
+
+def doy_context_table(inputs, outputs, run=None):
+    from .context import context_table
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'doy_context'):
+        table = context_table(series)
+    # 予報表示のたびに読み込むので、改行なしで小さく保つ（東京1局で約25KB）
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], table, indent=None)
+
+
+def warming_trends(inputs, outputs, resamples=2000, seed=0, run=None):
+    from .trend import trend_table
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'bootstrap', resamples=resamples):
+        table = trend_table(series, resamples=resamples, seed=seed)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], table, indent=None)
+
+
+def change_points(inputs, outputs, run=None):
+    from .changepoint import detect_changepoints
+    from .ingest import merge, parse_csv_file
+
+    # 均質番号が必要なので日別JSONではなくCSVから読む
+    with instrument.stage(run, 'parse_csv', files=len(inputs)):
+        series, _ = merge([parse_csv_file(path) for path in inputs])
+    with instrument.stage(run, 'pelt'):
+        report = detect_changepoints(series)
+    with instrument.stage(run, 'write_json', path=outputs[0]):
+        write_json(outputs[0], report)
+
+
+def backtest_models(inputs, outputs, jobs=None, run=None):
+    from .backtest import backtest
+
+    series = _load_daily(inputs[0], run)
+    with instrument.stage(run, 'backtest'):
+        report, ensemble = backtest(series, jobs=jobs)
+    with instrument.stage(run, 'write_json'):
+        write_json(outputs[0], report)
+        write_json(outputs[1], ensemble)
+
+
+def default_stages(root='.'):
+    """The stages that produce the JSON files under ``src/data``."""
+    def path(name):
+        return os.path.join(root, name)
+
+    sources = [path(name) for name in SOURCE_CSVS if os.path.exists(path(name))]
+    daily = path(DAILY_JSON)
+    return [
+        Stage('ingest', build_daily, sources, [daily],
+              code=('ondankamap.ingest', 'ondankamap.dataset', 'ondankamap.query',
+                    'ondankamap.jsonstream')),
+        Stage('filter', filter_daily, [daily],
+              [path('src/data/tokyo_temperature_data_filtered.json')],
+              code=('ondankamap.dataset', 'ondankamap.query', 'ondankamap.jsonstream')),
+        Stage('shards', build_shards, [daily], [path('public/data/daily/index.json')],
+              code=('ondankamap.shards', 'ondankamap.dataset')),
+        Stage('lttb', build_downsampled, [daily], [path('public/data/lttb/index.json')],
+              code=('ondankamap.downsample', 'ondankamap.dataset')),
+        Stage('compare', compare_years, [daily], [path('src/data/year_comparison.json')],
+              code=('ondankamap.compare', 'ondankamap.aggregate', 'ondankamap.dataset')),
+        Stage('anomaly', anomaly_daily, [daily],
+              [path('src/data/tokyo_temperature_anomaly.json'),
+               path('src/data/climatology_baseline.json')],
+              code=('ondankamap.anomaly', 'ondankamap.aggregate', 'ondankamap.dataset'),
+              params={'reference': [1991, 2020], 'window': 31}),
+        Stage('seasons', seasonal_dates, [daily], [path('src/data/seasonal_timing.json')],
+              code=('ondankamap.seasons', 'ondankamap.aggregate', 'ondankamap.dataset')),
+        Stage('spells', detect_spells, [daily], [path('src/data/spells.json')],
+              code=('ondankamap.spells', 'ondankamap.dataset')),
+        Stage('percentiles', percentile_climatology, [daily],
+              [path('src/data/percentile_climatology.json')],
+              code=('ondankamap.percentiles', 'ondankamap.aggregate', 'ondankamap.dataset',
+                    'ondankamap.query'),
+              params={'reference': [1991, 2020]}),
+        Stage('context', doy_context_table, [daily], [path('src/data/doy_context.json')],
+              code=('ondankamap.context', 'ondankamap.percentiles', 'ondankamap.aggregate')),
+        Stage('trends', warming_trends, [daily], [path('src/data/warming_trends.json')],
+              code=('ondankamap.trend', 'ondankamap.aggregate'),
+              params={'resamples': 2000, 'seed': 0}),
+        Stage('changepoints', change_points, sources, [path('src/data/change_points.json')],
+              code=('ondankamap.changepoint', 'ondankamap.anomaly', 'ondankamap.ingest')),
+        Stage('backtest', backtest_models, [daily],
+              [path('src/data/backtest_report.json'), path('src/data/ensemble_forecast.json')],
+              code=('ondankamap.backtest', 'ondankamap.forecast', 'ondankamap.aggregate')),
+        Stage('arima', arima_forecast, [daily],
+              [path('src/data/arima_monthly_max_forecast.json')],
+              code=('ondankamap.forecast', 'ondankamap.aggregate')),
+        Stage('prophet', prophet_forecast, [daily],
+              [path('src/data/prophet_annual_forecast.json'),
+               path('src/data/prophet_monthly_forecast.json')],
+              code=('ondankamap.forecast', 'ondankamap.aggregate')),
+    ]
+
+
+# ----------------------------------------------------------------------
+# 依存関係と鮮度判定
+
+def dependencies(stages):
+    """Return ``{stage name: set of upstream stage names}``."""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"{output} は {producers[output]} と {stage.name} の両方が出力します")
+            producers[output] = stage.name
+    deps = {
+        stage.name: {producers[i] for i in stage.inputs if i in producers} - {stage.name}
+        for stage in stages
+    }
+    _check_acyclic(deps)
+    return deps
+
+
+def _check_acyclic(deps):
+    remaining = {name: set(upstream) for name, upstream in deps.items()}
+    while remaining:
+        ready = [name for name, upstream in remaining.items() if not upstream]
+        if not ready:
+            raise ValueError(f"ステージ間に循環依存があります: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for upstream in remaining.values():
+            upstream.difference_update(ready)
+
+
+def code_digest(stage):
+    digest = hashlib.sha256(stage.func.__module__.encode())
+    digest.update(stage.func.__qualname__.encode())
+    digest.update(json.dumps(stage.params, sort_keys=True).encode())
+    for name in (stage.func.__module__,) + stage.code:
+        # モジュールを読み込まずにソースファイルだけをハッシュする
+        origin = importlib.util.find_spec(name).origin
+        digest.update((file_digest(origin) or '').encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage):
+    return {
+        'inputs': {path: file_digest(path) for path in stage.inputs},
+        'code': code_digest(stage),
+    }
+
+
+def is_fresh(stage, state, key):
+    previous = state.get(stage.name)
+    if not previous or previous.get('inputs') != key['inputs'] or previous.get('code') != key['code']:
+        return False
+    outputs = previous.get('outputs', {})
+    return all(outputs.get(path) is not None and outputs.get(path) == file_digest(path)
+               for path in stage.outputs)
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(path, state):
+    text = json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True)
+    write_bytes(path, text.encode('utf-8'))
+
+
+def _execute(stage):
+    """Worker entry point: run one stage under instrumentation."""
+    with instrument.run(f'pipeline.{stage.name}') as run:
+        return stage.func(list(stage.inputs), list(stage.outputs), run=run, **stage.params)
+
+
+# ----------------------------------------------------------------------
+# 実行
+
+def run_pipeline(stages=None, state_path=STATE_FILE, force=(), only=None, jobs=None,
+                 dry_run=False, log=print):
+    """Run stale stages in dependency order, independent ones concurrently.
+
+    ``force`` names stages to rebuild regardless of hashes (``'all'`` for
+    every stage); ``only`` restricts the run to the named stages and their
+    upstream stages. Returns ``{stage name: status}``.
+    """
+    # multiprocessing の読み込みは重いので、実行時にだけ読み込む
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    stages = default_stages() if stages is None else stages
+    deps = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    force = set(by_name) if 'all' in force else set(force)
+    unknown = (force | set(only or ())) - set(by_name)
+    if unknown:
+        raise ValueError(f"不明なステージ: {sorted(unknown)}")
+
+    if only:
+        wanted = set()
+        pending = list(only)
+        while pending:
+            name = pending.pop()
+            if name not in wanted:
+                wanted.add(name)
+                pending.extend(deps[name])
+        stages = [stage for stage in stages if stage.name in wanted]
+
+    state = load_state(state_path)
+    status = {}
+    waiting = {stage.name: set(deps[stage.name]) & {s.name for s in stages} for stage in stages}
+    running = {}
+
+    def finish(name, result):
+        status[name] = result
+        for upstream in waiting.values():
+            upstream.discard(name)
+
+    def schedule(pool):
+        # 鮮度判定でスキップしたステージの下流も続けて判定する
+        while True:
+            ready = [n for n, upstream in waiting.items() if not upstream]
+            if not ready:
+                return
+            for name in ready:
+                del waiting[name]
+                submit(pool, name)
+
+    def submit(pool, name):
+        stage = by_name[name]
+        # 上流が失敗していたら実行しない
+        if any(status.get(u) in ('failed', 'blocked') for u in deps[name]):
+            log(f"[{name}] 上流の失敗によりスキップ")
+            finish(name, 'blocked')
+            return
+        key = stage_key(stage)
+        missing = [path for path, digest in key['inputs'].items() if digest is None]
+        if missing and not dry_run:
+            log(f"[{name}] 入力ファイルが見つかりません: {missing}")
+            finish(name, 'failed')
+            return
+        upstream_stale = any(status.get(u) == 'stale' for u in deps[name])
+        if name not in force and not upstream_stale and is_fresh(stage, state, key):
+            log(f"[{name}] 最新のためスキップ")
+            finish(name, 'fresh')
+            return
+        if dry_run:
+            log(f"[{name}] 実行対象")
+            finish(name, 'stale')
+            return
+        log(f"[{name}] 実行中")
+        running[pool.submit(_execute, stage)] = (name, key)
+
+    if dry_run:
+        schedule(None)
+        return status
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        schedule(pool)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = running.pop(future)
+                try:
+                    info = future.result()
+                except Exception as e:
+                    log(f"[{name}] 失敗: {e!r}")
+                    state.pop(name, None)
+                    finish(name, 'failed')
+                    continue
+                stage = by_name[name]
+                key['outputs'] = {path: file_digest(path) for path in stage.outputs}
+                state[name] = key
+                save_state(state_path, state)
+                log(f"[{name}] 完了" + (f" {info}" if info else ''))
+                finish(name, 'built')
+            schedule(pool)
+    return status
@@ -0,0 +1,249 @@
+"""
+Query layer over :class:`~ondankamap.dataset.DailySeries`.
+
+Filters are collected first and evaluated together: station and year ranges
+are pushed down to binary searches over the sorted ``station``/``day_index``
+columns, and the remaining predicates are evaluated as vectorized masks over
+the narrowed rows only.
+
+    q = Query(series).years(1991, 2020).months(8).max_temp(ge=35)
+    q.count()
+    q.group_by('year').agg(days=('max_temp', 'count'), peak=('max_temp', 'max'))
+"""
+import numpy as np
+
+from .dataset import days_from_ymd
+
+AGGREGATIONS = ('count', 'sum', 'mean', 'std', 'min', 'max')
+
+
+def _threshold(column, ge=None, gt=None, le=None, lt=None):
+    """Build a mask function for a numeric column threshold."""
+    def predicate(series):
+        values = series.column(column)
+        mask = np.ones(len(values), dtype=bool)
+        if ge is not None:
+            mask &= values >= ge
+        if gt is not None:
+            mask &= values > gt
+        if le is not None:
+            mask &= values <= le
+        if lt is not None:
+            mask &= values < lt
+        return mask
+    return predicate
+
+
+class Query:
+    """Immutable filter builder; every filter method returns a new query."""
+
+    def __init__(self, series, stations=None, day_range=None, predicates=()):
+        self._series = series
+        self._stations = stations
+        self._day_range = day_range
+        self._predicates = tuple(predicates)
+
+    def _derive(self, **changes):
+        state = {
+            'stations': self._stations,
+            'day_range': self._day_range,
+            'predicates': self._predicates,
+        }
+        state.update(changes)
+        return Query(self._series, **state)
+
+    def _narrow_days(self, start, stop):
+        # 既存の期間条件との共通部分をとる（stop は含まない）
+        if self._day_range is not None:
+            start = max(start, self._day_range[0])
+            stop = min(stop, self._day_range[1])
+        return self._derive(day_range=(start, max(start, stop)))
+
+    # ------------------------------------------------------------------
+    # フィルタ
+
+    def station(self, *names):
+        """Keep only the given stations."""
+        codes = {self._series.station_code(name) for name in names}
+        if self._stations is not None:
+            codes &= set(self._stations)
+        return self._derive(stations=tuple(sorted(codes)))
+
+    def years(self, start=None, end=None):
+        """Keep years ``start..end`` (inclusive); either bound may be open."""
+        lo = int(days_from_ymd(start, 1, 1)) if start is not None else np.iinfo(np.int32).min
+        hi = int(days_from_ymd(end + 1, 1, 1)) if end is not None else np.iinfo(np.int32).max
+        return self._narrow_days(lo, hi)
+
+    def between(self, start, end):
+        """Keep days between two ``(year, month, day)`` tuples, inclusive."""
+        return self._narrow_days(int(days_from_ymd(*start)), int(days_from_ymd(*end)) + 1)
+
+    def months(self, *months):
+        """Keep the given calendar months (1-12)."""
+        wanted = np.zeros(13, dtype=bool)
+        wanted[list(months)] = True
+        return self.where(lambda s: wanted[s.month])
+
+    def doy(self, start, end):
+        """Keep day-of-year slots ``start..end`` on the 366-day grid.
+
+        ``start > end`` wraps around the new year (e.g. ``doy(335, 59)`` for
+        December-February).
+        """
+        def predicate(series):
+            doy = series.doy
+            if start <= end:
+                return (doy >= start) & (doy <= end)
+            return (doy >= start) | (doy <= end)
+        return self.where(predicate)
+
+    def max_temp(self, ge=None, gt=None, le=None, lt=None):
+        return self.where(_threshold('max_temp', ge=ge, gt=gt, le=le, lt=lt))
+
+    def min_temp(self, ge=None, gt=None, le=None, lt=None):
+        return self.where(_threshold('min_temp', ge=ge, gt=gt, le=le, lt=lt))
+
+    def threshold(self, column, ge=None, gt=None, le=None, lt=None):
+        """Threshold filter on any numeric column (e.g. ``'avg_temp'``)."""
+        return self.where(_threshold(column, ge=ge, gt=gt, le=le, lt=lt))
+
+    def where(self, predicate):
+        """Add a custom predicate ``predicate(series) -> bool mask``.
+
+        The predicate sees only the rows left after station/date pushdown,
+        e.g. ``q.where(lambda s: s.max_temp < s.min_temp)``.
+        """
+        return self._derive(predicates=self._predicates + (predicate,))
+
+    # ------------------------------------------------------------------
+    # 評価
+
+    def _candidates(self):
+        """Row selection after pushdown: a slice when contiguous, else an index."""
+        series = self._series
+        bounds = series.station_bounds()
+        codes = sorted(bounds) if self._stations is None else self._stations
+        ranges = []
+        for code in codes:
+            start, stop = bounds[code]
+            if self._day_range is not None:
+                days = series.day_index[start:stop]
+                lo = np.searchsorted(days, self._day_range[0], side='left')
+                hi = np.searchsorted(days, self._day_range[1], side='left')
+                start, stop = start + int(lo), start + int(hi)
+            if stop > start:
+                ranges.append((start, stop))
+        if not ranges:
+            return slice(0, 0)
+        if len(ranges) == 1:
+            return slice(*ranges[0])
+        return np.concatenate([np.arange(a, b) for a, b in ranges])
+
+    def rows(self):
+        """Integer indexes of the matching rows, in storage order."""
+        candidates = self._candidates()
+        if isinstance(candidates, slice):
+            index = np.arange(candidates.start, candidates.stop)
+        else:
+            index = candidates
+        if not self._predicates or len(index) == 0:
+            return index
+        view = self._series.take(candidates)
+        mask = np.ones(len(view), dtype=bool)
+        for predicate in self._predicates:
+            mask &= predicate(view)
+        return index[mask]
+
+    def mask(self):
+        """Boolean mask over the full series."""
+        mask = np.zeros(len(self._series), dtype=bool)
+        mask[self.rows()] = True
+        return mask
+
+    def series(self):
+        """Matching rows as a new :class:`DailySeries`."""
+        return self._series.take(self.rows())
+
+    def count(self):
+        return len(self.rows())
+
+    def values(self, column):
+        return self._series.column(column)[self.rows()]
+
+    def group_by(self, *keys):
+        return GroupBy(self.series(), keys)
+
+
+class GroupBy:
+    """Group-by over a filtered series; see :meth:`agg`."""
+
+    def __init__(self, series, keys):
+        if not keys:
+            raise ValueError("group_by needs at least one key")
+        self._series = series
+        self._keys = keys
+
+    def _groups(self):
+        # 各キーを密なコードにしてから1本の整数キーに合成する
+        combined = np.zeros(len(self._series), dtype=np.int64)
+        uniques = []
+        for key in self._keys:
+            values, codes = np.unique(self._series.column(key), return_inverse=True)
+            combined = combined * len(values) + codes
+            uniques.append(values)
+        groups, inverse = np.unique(combined, return_inverse=True)
+
+        key_columns = {}
+        rest = groups
+        for key, values in reversed(list(zip(self._keys, uniques))):
+            rest, code = np.divmod(rest, len(values))
+            if key == 'station':
+                key_columns[key] = np.array(self._series.stations, dtype=object)[values[code]]
+            else:
+                key_columns[key] = values[code]
+        ordered = {key: key_columns[key] for key in self._keys}
+        return ordered, inverse, len(groups)
+
+    def agg(self, **specs):
+        """Aggregate columns per group.
+
+        Each keyword is ``name=(column, func)`` with ``func`` one of
+        ``count``, ``sum``, ``mean``, ``std``, ``min`` or ``max``. NaN values
+        are ignored. Returns a dict of equal-length arrays, keys first.
+        """
+        result, inverse, ngroups = self._groups()
+        for name, (column, func) in specs.items():
+            if func not in AGGREGATIONS:
+                raise ValueError(f"unknown aggregation: {func}")
+            values = np.asarray(self._series.column(column), dtype=np.float64)
+            result[name] = _aggregate(func, values, inverse, ngroups)
+        return result
+
+
+def _aggregate(func, values, inverse, ngroups):
+    valid = ~np.isnan(values)
+    count = np.bincount(inverse, weights=valid, minlength=ngroups)
+    if func == 'count':
+        return count.astype(np.int64)
+    filled = np.where(valid, values, 0.0)
+    total = np.bincount(inverse, weights=filled, minlength=ngroups)
+    if func == 'sum':
+        return total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        if func == 'mean':
+            return mean
+        if func == 'std':
+            squares = np.bincount(inverse, weights=filled * filled, minlength=ngroups)
+            return np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+
+    # min/max はグループ順に並べ替えて reduceat で一括計算する
+    fill = np.inf if func == 'min' else -np.inf
+    order = np.argsort(inverse, kind='stable')
+    sorted_values = np.where(valid, values, fill)[order]
+    starts = np.searchsorted(inverse[order], np.arange(ngroups))
+    reduce = np.minimum if func == 'min' else np.maximum
+    out = reduce.reduceat(sorted_values, starts) if len(sorted_values) else np.full(ngroups, fill)
+    out[count == 0] = np.nan
+    return out
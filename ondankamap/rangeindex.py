@@ -0,0 +1,213 @@
+"""
+Prefix-sum index for O(1) statistics over any date range.
+
+Over the regular daily grid from a station's first to last day, the index
+keeps cumulative sums of the max and min temperature and their squares,
+of the valid-day counts, of cooling/heating degree-day contributions and
+of threshold indicators (≥35 °C days, tropical nights, ...). The mean,
+variance, degree-day total or day count of any range is then the
+difference of two entries, and the start/end arrays may hold many ranges
+at once::
+
+    index = RangeIndex.build(series)
+    index.stats(days_from_ymd(2024, 7, 1), days_from_ymd(2024, 8, 31))
+    python -m ondankamap range 2024-07-01 2024-08-31
+
+Values are summed as offsets from the station's mean so that the variance
+(from the sums of squares) keeps its precision. New days are appended with
+:meth:`RangeIndex.extend`, which only sums the new rows; storage grows by
+doubling, so appending is amortized O(new days).
+"""
+import io
+
+import numpy as np
+
+from .artifacts import write_bytes
+
+# 冷房度日・暖房度日の基準温度（日平均気温 = (最高 + 最低) / 2 に対して）
+COOLING_BASE = 24.0
+HEATING_BASE = 14.0
+
+# 名前 → (列, 比較, しきい値)
+THRESHOLDS = {
+    'summer_days': ('max_temp', 'ge', 25.0),
+    'hot_days': ('max_temp', 'ge', 30.0),
+    'extreme_heat_days': ('max_temp', 'ge', 35.0),
+    'tropical_nights': ('min_temp', 'ge', 25.0),
+    'frost_days': ('min_temp', 'lt', 0.0),
+    'ice_days': ('max_temp', 'lt', 0.0),
+}
+
+_COMPARE = {'ge': np.greater_equal, 'gt': np.greater, 'le': np.less_equal, 'lt': np.less}
+
+_COLUMNS = ('max_temp', 'min_temp')
+
+
+class RangeIndex:
+    """Cumulative sums over one station's daily grid.
+
+    ``prefix[name][i]`` is the total over the grid days before
+    ``first_day + i``; every array has one entry more than there are days.
+    """
+
+    def __init__(self, first_day, offset, thresholds=THRESHOLDS, cooling_base=COOLING_BASE,
+                 heating_base=HEATING_BASE):
+        self.first_day = int(first_day)
+        self.offset = float(offset)
+        self.thresholds = dict(thresholds)
+        self.cooling_base = cooling_base
+        self.heating_base = heating_base
+        self.days = 0
+        self.prefix = {name: np.zeros(1) for name in self._names()}
+
+    def _names(self):
+        names = []
+        for column in _COLUMNS:
+            names += [f'{column}_n', f'{column}_sum', f'{column}_sq']
+        names += ['mean_n', 'cdd', 'hdd']
+        return names + list(self.thresholds)
+
+    @property
+    def last_day(self):
+        return self.first_day + self.days - 1
+
+    # ------------------------------------------------------------------
+    # 作成・追加
+
+    @classmethod
+    def build(cls, series, station=None, **options):
+        """Index of one station of ``series`` (``station`` needed if several)."""
+        if station is not None:
+            series = series.for_station(station)
+        elif len(series.stations) > 1:
+            raise ValueError("複数の観測点を含む系列には station を指定してください")
+        if not len(series):
+            raise ValueError("空の系列からは索引を作れません")
+        values = np.concatenate([series.max_temp, series.min_temp])
+        index = cls(series.day_index[0], np.round(np.nanmean(values), 1), **options)
+        index.extend(series)
+        return index
+
+    def _contributions(self, day_index, max_temp, min_temp):
+        """Per-grid-day values of every prefix array for the given rows."""
+        start = self.first_day + self.days
+        n = int(day_index[-1]) - start + 1
+        slot = day_index - start
+        grid = {column: np.full(n, np.nan) for column in _COLUMNS}
+        grid['max_temp'][slot] = max_temp
+        grid['min_temp'][slot] = min_temp
+
+        result = {}
+        for column in _COLUMNS:
+            values = grid[column]
+            valid = ~np.isnan(values)
+            shifted = np.where(valid, values - self.offset, 0.0)
+            result[f'{column}_n'] = valid.astype(np.float64)
+            result[f'{column}_sum'] = shifted
+            result[f'{column}_sq'] = shifted * shifted
+        mean = (grid['max_temp'] + grid['min_temp']) / 2
+        valid = ~np.isnan(mean)
+        result['mean_n'] = valid.astype(np.float64)
+        result['cdd'] = np.where(valid, np.maximum(mean - self.cooling_base, 0.0), 0.0)
+        result['hdd'] = np.where(valid, np.maximum(self.heating_base - mean, 0.0), 0.0)
+        with np.errstate(invalid='ignore'):
+            for name, (column, compare, threshold) in self.thresholds.items():
+                result[name] = _COMPARE[compare](grid[column], threshold).astype(np.float64)
+        return n, result
+
+    def extend(self, series):
+        """Append the days of a single-station ``series`` after :attr:`last_day`.
+
+        Days at or before the last indexed day are ignored; gaps become
+        days without values. Returns the number of grid days added.
+        """
+        # for_station で絞った系列も stations は全局を持つので、行の局コードで判定する
+        if len(series) and np.any(series.station != series.station[0]):
+            raise ValueError("複数の観測点を含む系列は追加できません（for_station で1局に絞ってください）")
+        new = series.day_index > self.last_day
+        if not new.any():
+            return 0
+        n, contributions = self._contributions(series.day_index[new].astype(np.int64),
+                                               series.max_temp[new], series.min_temp[new])
+        used = self.days + 1
+        for name, values in contributions.items():
+            prefix = self.prefix[name]
+            if len(prefix) < used + n:
+                # 追加のたびにコピーしないよう、容量を倍々に確保する
+                grown = np.zeros(max(used + n, 2 * len(prefix)))
+                grown[:used] = prefix[:used]
+                self.prefix[name] = prefix = grown
+            prefix[used:used + n] = prefix[used - 1] + np.cumsum(values)
+        self.days += n
+        return n
+
+    # ------------------------------------------------------------------
+    # 区間の統計
+
+    def _bounds(self, start, end):
+        """Grid positions ``(a, b)`` so a range's total is ``prefix[b] - prefix[a]``."""
+        start = np.asarray(start, dtype=np.int64) - self.first_day
+        end = np.asarray(end, dtype=np.int64) - self.first_day + 1
+        a = np.clip(start, 0, self.days)
+        b = np.clip(end, 0, self.days)
+        return a, np.maximum(a, b)
+
+    def stats(self, start, end):
+        """Statistics of the days ``start``..``end`` (day indexes, inclusive).
+
+        Scalars give a dict of floats; arrays of starts/ends give a dict of
+        arrays. Means and variances are over days with a value (NaN when
+        there are none); counts and degree-days are totals.
+        """
+        a, b = self._bounds(start, end)
+
+        def total(name):
+            prefix = self.prefix[name]
+            return prefix[b] - prefix[a]
+
+        result = {'days': b - a}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for column in _COLUMNS:
+                n = total(f'{column}_n')
+                mean = total(f'{column}_sum') / n
+                result[f'{column}_days'] = n.astype(np.int64)
+                result[f'{column}_mean'] = mean + self.offset
+                # 平方和からの分散（標本分散ではなく母分散）
+                result[f'{column}_var'] = np.maximum(total(f'{column}_sq') / n - mean * mean, 0.0)
+        result['mean_days'] = total('mean_n').astype(np.int64)
+        result['cooling_degree_days'] = total('cdd')
+        result['heating_degree_days'] = total('hdd')
+        for name in self.thresholds:
+            result[name] = np.rint(total(name)).astype(np.int64)
+        if np.ndim(a) == 0:
+            return {name: value.item() for name, value in result.items()}
+        return result
+
+    # ------------------------------------------------------------------
+    # 保存・読み込み
+
+    def save(self, path):
+        """Write the index atomically as ``.npz``."""
+        arrays = {f'prefix_{name}': values[:self.days + 1] for name, values in self.prefix.items()}
+        arrays['meta'] = np.array([self.first_day, self.days], dtype=np.int64)
+        arrays['settings'] = np.array([self.offset, self.cooling_base, self.heating_base])
+        arrays['thresholds'] = np.array([f'{name},{column},{compare},{threshold!r}'
+                                         for name, (column, compare, threshold)
+                                         in self.thresholds.items()])
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return write_bytes(path, buffer.getvalue())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            first_day, days = (int(v) for v in data['meta'])
+            offset, cooling_base, heating_base = (float(v) for v in data['settings'])
+            thresholds = {}
+            for entry in data['thresholds']:
+                name, column, compare, threshold = str(entry).split(',')
+                thresholds[name] = (column, compare, float(threshold))
+            index = cls(first_day, offset, thresholds, cooling_base, heating_base)
+            index.days = days
+            index.prefix = {name: data[f'prefix_{name}'].copy() for name in index._names()}
+        return index
@@ -0,0 +1,194 @@
+"""
+Running temperature records per day-of-year, per month and overall.
+
+The state of each station is two ``(record, slot)`` arrays: the record
+value and the day it was set. Slots 0-365 are the 366-day grid (Feb 29
+is slot 59), 366-377 the months and 378 the whole record; the four
+records are the highest/lowest max and min temperature::
+
+    python -m ondankamap records                # update from the daily JSON
+    python -m ondankamap records --rebuild
+
+:meth:`RecordTracker.rebuild` computes the state from a full series in one
+vectorized pass: every row is expanded to its three slots and the first
+row of each slot in (slot, value, day) order is the record, so ties keep
+the earliest day. :meth:`RecordTracker.update` then only looks at days
+after the last one seen, touching three slots per day, and returns a
+"new record" event for every record a day breaks.
+"""
+import io
+
+import numpy as np
+
+from .artifacts import write_bytes
+from .dataset import DAYS_IN_GRID, format_date, md_from_doy, ymd_from_days
+
+STATE_PATH = 'data/record_state.npz'
+
+# 記録名 → (列, 'high'/'low')
+RECORDS = {
+    'highest_max': ('max_temp', 'high'),
+    'lowest_max': ('max_temp', 'low'),
+    'highest_min': ('min_temp', 'high'),
+    'lowest_min': ('min_temp', 'low'),
+}
+
+MONTH_SLOT = DAYS_IN_GRID
+ALL_SLOT = DAYS_IN_GRID + 12
+SLOTS = ALL_SLOT + 1
+
+_NO_DAY = np.iinfo(np.int32).min
+
+
+def slots_of(doy, month):
+    """``(doy slot, month slot, overall slot)`` for 1-based doy and month."""
+    return doy - 1, MONTH_SLOT + month - 1, ALL_SLOT
+
+
+def slot_label(slot):
+    """``('doy', 'M/D')``, ``('month', 'M')`` or ``('all', None)`` for a slot."""
+    if slot < MONTH_SLOT:
+        month, day = md_from_doy(slot + 1)
+        return 'doy', f'{int(month)}/{int(day)}'
+    if slot < ALL_SLOT:
+        return 'month', str(slot - MONTH_SLOT + 1)
+    return 'all', None
+
+
+def _label(day):
+    year, month, dom = ymd_from_days([day])
+    return format_date(year[0], month[0], dom[0])
+
+
+class RecordTracker:
+    """Record values and the days they were set, per station.
+
+    ``value[station]`` and ``day[station]`` are ``(len(RECORDS), SLOTS)``;
+    ``last_day[station]`` is the latest day folded in.
+    """
+
+    def __init__(self):
+        self.value = {}
+        self.day = {}
+        self.last_day = {}
+
+    # ------------------------------------------------------------------
+    # 一括計算
+
+    @classmethod
+    def rebuild(cls, series):
+        """State for every station of ``series`` in one vectorized pass."""
+        tracker = cls()
+        tracker._merge(series)
+        return tracker
+
+    def _merge(self, series):
+        n = len(series)
+        doy_slot, month_slot, all_slot = slots_of(series.doy.astype(np.int64),
+                                                  series.month.astype(np.int64))
+        rows = np.tile(np.arange(n), 3)
+        slot = np.concatenate([doy_slot, month_slot, np.full(n, all_slot)])
+        station = series.station[rows].astype(np.int64)
+        key = station * SLOTS + slot
+        for r, (column, which) in enumerate(RECORDS.values()):
+            values = series.column(column)[rows]
+            valid = ~np.isnan(values)
+            k, v, d = key[valid], values[valid], series.day_index[rows][valid]
+            # (局×枠, 値, 日) の順に並べると各枠の先頭が記録（同値なら早い日）
+            order = np.lexsort((d, -v if which == 'high' else v, k))
+            k, v, d = k[order], v[order], d[order]
+            first = np.r_[True, k[1:] != k[:-1]]
+            for code, name in enumerate(series.stations):
+                if name not in self.value:
+                    self.value[name] = np.full((len(RECORDS), SLOTS), np.nan)
+                    self.day[name] = np.full((len(RECORDS), SLOTS), _NO_DAY, dtype=np.int32)
+                chosen = first & (k // SLOTS == code)
+                self.value[name][r, k[chosen] % SLOTS] = v[chosen]
+                self.day[name][r, k[chosen] % SLOTS] = d[chosen]
+        for code, (start, stop) in series.station_bounds().items():
+            if stop > start:
+                self.last_day[series.stations[code]] = int(series.day_index[stop - 1])
+
+    # ------------------------------------------------------------------
+    # 1日ずつの更新
+
+    def observe(self, station, day, doy, month, values):
+        """Fold in one day; ``values`` maps column to temperature.
+
+        Returns the list of events for the records the day breaks.
+        """
+        events = []
+        value, set_on = self.value[station], self.day[station]
+        for r, (name, (column, which)) in enumerate(RECORDS.items()):
+            v = values.get(column)
+            if v is None or v != v:
+                continue
+            for slot in slots_of(doy, month):
+                old = value[r, slot]
+                if old == old and not (v > old if which == 'high' else v < old):
+                    continue
+                if old == old:
+                    scope, key = slot_label(slot)
+                    events.append({
+                        'station': station, 'date': _label(day), 'record': name,
+                        'scope': scope, 'key': key, 'value': v,
+                        'previous': float(old), 'previous_date': _label(set_on[r, slot]),
+                    })
+                value[r, slot] = v
+                set_on[r, slot] = day
+        self.last_day[station] = max(self.last_day.get(station, day), day)
+        return events
+
+    def update(self, series):
+        """Fold in the days of ``series`` after each station's last day.
+
+        Stations the tracker has not seen are rebuilt without events.
+        Returns the events in station and date order.
+        """
+        new = [name for name in series.stations if name not in self.value]
+        if new:
+            self._merge(series.take(np.isin(series.station_names, new)))
+        events = []
+        doy, month = series.doy.tolist(), series.month.tolist()
+        columns = {column: series.column(column).tolist()
+                   for column in {c for c, _ in RECORDS.values()}}
+        for code, (start, stop) in series.station_bounds().items():
+            name = series.stations[code]
+            if name in new or stop == start:
+                continue
+            days = series.day_index[start:stop]
+            first = start + int(np.searchsorted(days, self.last_day.get(name, _NO_DAY),
+                                                side='right'))
+            for i in range(first, stop):
+                events += self.observe(name, int(series.day_index[i]), doy[i], month[i],
+                                       {column: values[i] for column, values in columns.items()})
+        return events
+
+    # ------------------------------------------------------------------
+    # 保存・読み込み
+
+    def save(self, path=STATE_PATH):
+        """Write the state atomically as ``.npz``."""
+        names = sorted(self.value)
+        arrays = {'stations': np.array(names),
+                  'records': np.array(list(RECORDS)),
+                  'last_day': np.array([self.last_day.get(n, _NO_DAY) for n in names],
+                                       dtype=np.int64)}
+        for i, name in enumerate(names):
+            arrays[f'value_{i}'] = self.value[name]
+            arrays[f'day_{i}'] = self.day[name]
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return write_bytes(path, buffer.getvalue())
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        tracker = cls()
+        with np.load(path, allow_pickle=False) as data:
+            if list(data['records']) != list(RECORDS):
+                raise ValueError(f"{path}: 記録の種類が現在の定義と異なります（--rebuild してください）")
+            for i, name in enumerate(str(s) for s in data['stations']):
+                tracker.value[name] = data[f'value_{i}'].copy()
+                tracker.day[name] = data[f'day_{i}'].copy()
+                tracker.last_day[name] = int(data['last_day'][i])
+        return tracker
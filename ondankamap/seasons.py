@@ -0,0 +1,113 @@
+"""
+Seasonal timing per year: first summer day, last hot day, spring and
+autumn frosts, and the season lengths between them.
+
+Each event is a threshold test on one column, searched for the first or
+last matching day inside a day-of-year window. All stations and years are
+handled at once on the station × year × day-of-year grid: the mask of
+matching days is reduced with ``argmax`` (and ``argmax`` on the reversed
+mask for "last"), with no per-year loop.
+"""
+import numpy as np
+
+from .aggregate import station_year_doy_grid
+from .dataset import md_from_doy
+
+# 2/29 の枠（0始まりで59）は平年には存在しない
+_FEB29 = 59
+
+# 名前 → (列, 比較, しきい値, 'first'/'last', 日付窓の開始枠, 終了枠)  枠は1始まり
+EVENTS = {
+    'first_summer_day': ('max_temp', 'ge', 25.0, 'first', 1, 366),
+    'last_hot_day': ('max_temp', 'ge', 30.0, 'last', 1, 366),
+    'last_spring_frost': ('min_temp', 'lt', 0.0, 'last', 1, 213),
+    'first_autumn_frost': ('min_temp', 'lt', 0.0, 'first', 214, 366),
+}
+
+# 名前 → (開始イベント, 終了イベント, 両端を含むか)
+SEASONS = {
+    'summer': ('first_summer_day', 'last_hot_day', True),
+    'frost_free': ('last_spring_frost', 'first_autumn_frost', False),
+}
+
+_COMPARE = {'ge': np.greater_equal, 'gt': np.greater, 'le': np.less_equal, 'lt': np.less}
+
+
+def event_slots(grid, compare, threshold, which, start=1, end=366):
+    """0-based slot of the first/last matching day for every row of ``grid``.
+
+    ``grid`` is ``(..., 366)``; returns an int array over the leading axes
+    with -1 where no day matches. NaN days never match.
+    """
+    window = grid[..., start - 1:end]
+    with np.errstate(invalid='ignore'):
+        mask = _COMPARE[compare](window, threshold)
+    found = mask.any(axis=-1)
+    if which == 'first':
+        slot = np.argmax(mask, axis=-1)
+    elif which == 'last':
+        slot = window.shape[-1] - 1 - np.argmax(mask[..., ::-1], axis=-1)
+    else:
+        raise ValueError(f"which must be 'first' or 'last': {which}")
+    return np.where(found, slot + start - 1, -1)
+
+
+def season_length(start_slot, end_slot, leap, inclusive=True):
+    """Days from ``start_slot`` to ``end_slot`` on the 366-slot grid.
+
+    The Feb 29 slot is not counted in common years. -1 where either end is
+    missing or the end comes first.
+    """
+    length = end_slot - start_slot + (1 if inclusive else -1)
+    spans_feb29 = ~leap & (start_slot < _FEB29) & (end_slot > _FEB29)
+    length = length - spans_feb29
+    valid = (start_slot >= 0) & (end_slot >= 0) & (length >= 0)
+    return np.where(valid, length, -1)
+
+
+def seasonal_timing(series, events=EVENTS, seasons=SEASONS):
+    """Event slots and season lengths for every station and year.
+
+    Returns ``(years, slots, lengths)`` where ``slots[name]`` and
+    ``lengths[name]`` are ``(station, year)`` int arrays (0-based slots,
+    -1 when the event did not happen).
+    """
+    grids = {}
+    slots = {}
+    for name, (column, compare, threshold, which, start, end) in events.items():
+        if column not in grids:
+            grids[column] = station_year_doy_grid(series, column)
+        years, grid = grids[column]
+        slots[name] = event_slots(grid, compare, threshold, which, start, end)
+    leap = ((years % 4 == 0) & (years % 100 != 0)) | (years % 400 == 0)
+    lengths = {
+        name: season_length(slots[first], slots[last], leap[None, :], inclusive)
+        for name, (first, last, inclusive) in seasons.items()
+    }
+    return years, slots, lengths
+
+
+def seasonal_table(series, events=EVENTS, seasons=SEASONS):
+    """JSON-ready ``{station: {'years', 'events': {name: ['M/D'|None]}, 'seasons'}}``.
+
+    Years with fewer than 300 observed days are left out, as their dates
+    would mostly reflect the gaps.
+    """
+    years, slots, lengths = seasonal_timing(series, events, seasons)
+    _, grid = station_year_doy_grid(series, 'max_temp')
+    complete = (~np.isnan(grid)).sum(axis=-1) >= 300
+
+    result = {}
+    for code, station in enumerate(series.stations):
+        rows = np.flatnonzero(complete[code])
+        table = {'years': years[rows].tolist(), 'events': {}, 'seasons': {}}
+        for name, slot in slots.items():
+            month, day = md_from_doy(slot[code, rows] + 1)
+            table['events'][name] = [
+                f'{m}/{d}' if s >= 0 else None
+                for m, d, s in zip(month.tolist(), day.tolist(), slot[code, rows].tolist())
+            ]
+        for name, length in lengths.items():
+            table['seasons'][name] = [v if v >= 0 else None for v in length[code, rows].tolist()]
+        result[station] = table
+    return result
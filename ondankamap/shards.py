@@ -0,0 +1,116 @@
+"""
+Sharded daily artifacts for on-demand loading by the app.
+
+Instead of importing the whole ``tokyo_temperature_data.json``, a view can
+fetch just the shard it renders::
+
+    public/data/daily/index.json          manifest
+    public/data/daily/year/2024.json      every day of one year
+    public/data/daily/month/08.json       every August across all years
+    public/data/daily/doy/08-01.json      every Aug 1 across all years
+
+Shards hold the same records as the daily JSON. The manifest stores a
+digest of each shard's underlying days; a shard is re-rendered and
+rewritten only when that digest changes, and shards that disappear from
+the data are removed.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .artifacts import write_json
+from .dataset import format_date
+
+SHARD_DIR = 'public/data/daily'
+MANIFEST = 'index.json'
+KINDS = ('year', 'month', 'doy')
+
+
+def shard_keys(series, kind):
+    """Per-row shard key (int) and a function naming the shard's file."""
+    if kind == 'year':
+        return series.year.astype(np.int64), lambda k: f'{k}'
+    if kind == 'month':
+        return series.month.astype(np.int64), lambda k: f'{k:02d}'
+    if kind == 'doy':
+        # 月日をまたいだ比較用に MMDD を整数キーにする（2/29 も独立した断片）
+        key = series.month.astype(np.int64) * 100 + series.dom
+        return key, lambda k: f'{k // 100:02d}-{k % 100:02d}'
+    raise ValueError(f"unknown shard kind: {kind}")
+
+
+def _groups(keys):
+    """Yield ``(key, row indexes)`` for each distinct key, rows in order."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+    for chunk in np.split(order, bounds):
+        if len(chunk):
+            yield int(keys[chunk[0]]), chunk
+
+
+def _digest(series, rows):
+    digest = hashlib.sha256()
+    for values in (series.station[rows], series.day_index[rows],
+                   series.max_temp[rows], series.min_temp[rows]):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_shards(series, directory=SHARD_DIR, kinds=KINDS):
+    """Write the shards of ``series`` and their manifest under ``directory``.
+
+    Returns ``{'written': n, 'unchanged': n, 'removed': n}``.
+    """
+    previous = load_manifest(directory).get('shards', {})
+    shards = {}
+    counts = {'written': 0, 'unchanged': 0, 'removed': 0}
+    for kind in kinds:
+        keys, name = shard_keys(series, kind)
+        old = previous.get(kind, {})
+        entries = shards[kind] = {}
+        for key, rows in _groups(keys):
+            label = name(key)
+            path = f'{kind}/{label}.json'
+            digest = _digest(series, rows)
+            entries[label] = {'path': path, 'rows': int(len(rows)), 'digest': digest}
+            full_path = os.path.join(directory, path)
+            if old.get(label, {}).get('digest') == digest and os.path.exists(full_path):
+                counts['unchanged'] += 1
+                continue
+            write_json(full_path, series.take(rows).to_records(include_columns=False),
+                       indent=None)
+            counts['written'] += 1
+        for label, entry in old.items():
+            if label not in entries:
+                try:
+                    os.remove(os.path.join(directory, entry['path']))
+                    counts['removed'] += 1
+                except FileNotFoundError:
+                    pass
+
+    first, last = (int(np.argmin(series.day_index)), int(np.argmax(series.day_index))) \
+        if len(series) else (None, None)
+
+    def label(i):
+        return None if i is None else format_date(series.year[i], series.month[i], series.dom[i])
+
+    manifest = {
+        'rows': len(series),
+        'start': label(first),
+        'end': label(last),
+        'stations': list(series.stations),
+        'shards': shards,
+    }
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    return counts
@@ -0,0 +1,123 @@
+"""
+Run-length detection of consecutive-day spells (heat waves, tropical-night
+runs, frost spells).
+
+A spell is a run of consecutive days meeting a condition. All conditions
+are evaluated together as one ``(condition, day)`` mask; a run starts where
+the mask is set and the previous row is unset, is not the previous calendar
+day, or belongs to another station, and ends symmetrically. Peaks come from
+one ``reduceat`` over the run bounds, and per-year statistics from
+``bincount``/``maximum.at`` over (condition, station, year) keys.
+"""
+import numpy as np
+
+from .dataset import EXTREME_HEAT, TROPICAL_NIGHT, format_date
+
+# 名前 → (列, 比較, しきい値, 最短日数)
+CONDITIONS = {
+    'extreme_heat': ('max_temp', 'ge', EXTREME_HEAT, 1),
+    'tropical_night': ('min_temp', 'ge', TROPICAL_NIGHT, 1),
+    'frost': ('min_temp', 'lt', 0.0, 1),
+}
+
+_COMPARE = {'ge': np.greater_equal, 'gt': np.greater, 'le': np.less_equal, 'lt': np.less}
+
+
+def find_spells(series, conditions=CONDITIONS):
+    """Detect spells for every condition and station at once.
+
+    Returns a dict of equal-length arrays, one entry per spell: ``condition``
+    (index into ``conditions``), ``station``, ``start`` (row), ``length``
+    (days) and ``peak`` (max for ≥/> conditions, min for ≤/<). Spells
+    shorter than the condition's minimum length are dropped.
+    """
+    names = list(conditions)
+    n = len(series)
+    k = len(names)
+    masks = np.zeros((k, n + 1), dtype=bool)
+    # 「低い方が極値」の条件は符号を反転して、すべて最大値で peak を求める
+    signed = np.zeros((k, n + 1))
+    for i, name in enumerate(names):
+        column, compare, threshold, _ = conditions[name]
+        values = series.column(column)
+        with np.errstate(invalid='ignore'):
+            masks[i, :n] = _COMPARE[compare](values, threshold)
+        signed[i, :n] = np.where(np.isnan(values), -np.inf,
+                                 -values if compare in ('lt', 'le') else values)
+
+    # 前の行が「同じ観測点の前日」のときだけ連続とみなす
+    continues = np.zeros(n + 1, dtype=bool)
+    continues[1:n] = (series.day_index[1:] == series.day_index[:-1] + 1) & \
+        (series.station[1:] == series.station[:-1])
+    previous = np.zeros_like(masks)
+    previous[:, 1:] = masks[:, :-1] & continues[None, 1:]
+    following = np.zeros_like(masks)
+    following[:, :-1] = masks[:, 1:] & continues[None, 1:]
+    start_k, start_i = np.nonzero(masks & ~previous)
+    _, end_i = np.nonzero(masks & ~following)
+
+    length = end_i - start_i + 1
+    flat = signed.ravel()
+    bounds = np.empty(2 * len(start_i), dtype=np.int64)
+    bounds[0::2] = start_k * (n + 1) + start_i
+    bounds[1::2] = start_k * (n + 1) + end_i + 1
+    peak = np.maximum.reduceat(flat, bounds)[0::2] if len(bounds) else np.zeros(0)
+    lows = np.array([conditions[name][1] in ('lt', 'le') for name in names], dtype=bool)
+    peak = np.where(lows[start_k], -peak, peak) if len(peak) else peak
+
+    minimum = np.array([conditions[name][3] for name in names])
+    keep = length >= minimum[start_k]
+    return {
+        'condition': start_k[keep],
+        'station': series.station[start_i[keep]],
+        'start': start_i[keep],
+        'length': length[keep],
+        'peak': peak[keep],
+    }
+
+
+def yearly_spell_stats(series, spells, n_conditions):
+    """Per (condition, station, year of the spell's start): count, longest, total days.
+
+    Returns ``(years, stats)`` with ``stats[name]`` of shape
+    ``(condition, station, year)``.
+    """
+    years, year_code = np.unique(series.year, return_inverse=True)
+    n_stations, n_years = len(series.stations), len(years)
+    key = (spells['condition'] * n_stations + spells['station']) * n_years + \
+        year_code[spells['start']]
+    size = n_conditions * n_stations * n_years
+    shape = (n_conditions, n_stations, n_years)
+    count = np.bincount(key, minlength=size).reshape(shape)
+    total = np.bincount(key, weights=spells['length'], minlength=size).astype(np.int64)
+    longest = np.zeros(size, dtype=np.int64)
+    np.maximum.at(longest, key, spells['length'])
+    return years.astype(int), {'count': count, 'longest': longest.reshape(shape),
+                               'total_days': total.reshape(shape)}
+
+
+def spell_table(series, conditions=CONDITIONS):
+    """JSON-ready ``{condition: {station: {'spells': ..., 'years': ...}}}``."""
+    spells = find_spells(series, conditions)
+    years, stats = yearly_spell_stats(series, spells, len(conditions))
+    year, month, day = series.year, series.month, series.dom
+
+    result = {}
+    for k, name in enumerate(conditions):
+        result[name] = {}
+        for code, station in enumerate(series.stations):
+            chosen = (spells['condition'] == k) & (spells['station'] == code)
+            rows = spells['start'][chosen]
+            observed = np.isin(years, np.unique(year[series.station == code]))
+            result[name][station] = {
+                'spells': {
+                    'start': [format_date(year[i], month[i], day[i]) for i in rows],
+                    'length': spells['length'][chosen].tolist(),
+                    'peak': np.round(spells['peak'][chosen], 1).tolist(),
+                },
+                'years': {
+                    'year': years[observed].tolist(),
+                    **{stat: values[k, code, observed].tolist() for stat, values in stats.items()},
+                },
+            }
+    return result
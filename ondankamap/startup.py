@@ -0,0 +1,87 @@
+"""
+Startup-time budget check for the lightweight CLI commands.
+
+Runs ``--help``, ``ingest`` and ``validate`` in fresh interpreters, loading
+the same modules their handlers import, and fails when the best-of-N wall
+time exceeds the budget or when a heavy modeling backend got imported::
+
+    python -m ondankamap startup-check --budget-ms 300
+
+``python -m ondankamap run`` runs the same check after the pipeline and
+exits non-zero when it fails, so a lazy-import regression fails the
+regular data run rather than waiting for someone to run the command.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ('pandas', 'statsmodels', 'prophet', 'scipy', 'matplotlib')
+BUDGET_MS = 300
+REPEAT = 5
+
+# (ラベル, CLI引数, ハンドラが読み込むモジュール)
+CHECKS = (
+    ('--help', ['--help'], []),
+    ('ingest', ['ingest', '--help'],
+     ['ondankamap.instrument', 'ondankamap.pipeline', 'ondankamap.ingest', 'ondankamap.query']),
+    ('validate', ['validate', '--help'],
+     ['ondankamap.artifacts', 'ondankamap.dataset', 'ondankamap.validate']),
+)
+
+_PROBE = '''
+import importlib, json, runpy, sys
+modules, argv = json.loads(sys.argv[1])
+for name in modules:
+    importlib.import_module(name)
+sys.argv = ['ondankamap'] + argv
+try:
+    runpy.run_module('ondankamap', run_name='__main__')
+except SystemExit:
+    pass
+heavy = sorted(m for m in sys.modules if m.split('.')[0] in %r)
+sys.stderr.write('\\nHEAVY=' + json.dumps(heavy) + '\\n')
+''' % (HEAVY_MODULES,)
+
+
+def measure(argv, modules, repeat=5):
+    """Best wall time in ms and the heavy modules loaded, for one command."""
+    best = None
+    heavy = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', _PROBE, json.dumps([modules, argv])],
+                              capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr)
+        best = elapsed if best is None else min(best, elapsed)
+        marker = proc.stderr.rsplit('HEAVY=', 1)
+        heavy = json.loads(marker[1]) if len(marker) == 2 else []
+    return best, heavy
+
+
+def check(budget_ms=BUDGET_MS, repeat=REPEAT, log=print):
+    """Measure every command in :data:`CHECKS`; returns the number that failed."""
+    failures = 0
+    for label, cli_args, modules in CHECKS:
+        elapsed, heavy = measure(cli_args, modules, repeat=repeat)
+        ok = elapsed <= budget_ms and not heavy
+        failures += not ok
+        note = f" 重いモジュール: {', '.join(heavy)}" if heavy else ''
+        log(f"{'OK ' if ok else 'NG '} {label:<10} {elapsed:7.1f}ms "
+            f"(上限 {budget_ms:.0f}ms){note}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='軽量コマンドの起動時間の検査')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args(argv)
+    return 1 if check(args.budget_ms, args.repeat) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Daily observations in the app's SQLite database.
+
+``data/weather_forecast.db`` (schema in ``src/lib/db.ts``) holds the saved
+forecasts; this module adds a ``daily_observations`` table so that range and
+aggregate queries can use an index instead of importing the whole JSON::
+
+    python -m ondankamap db-load            # upsert new/changed days
+    python -m ondankamap db-load --full     # re-check every day
+
+Dates are stored as ``YYYY-MM-DD`` text, the same format as
+``weather_forecasts.forecast_date``, so the two tables join directly.
+"""
+import sqlite3
+
+import numpy as np
+
+from .dataset import DEFAULT_STATION, DailySeries
+
+DB_PATH = 'data/weather_forecast.db'
+
+# 直近の日は気象庁が後から値を修正することがあるので、差分投入でも少し遡る
+OVERLAP_DAYS = 31
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_observations (
+  station TEXT NOT NULL,
+  date DATE NOT NULL,
+  year INTEGER NOT NULL,
+  month INTEGER NOT NULL,
+  day INTEGER NOT NULL,
+  max_temp REAL,
+  min_temp REAL,
+  PRIMARY KEY (station, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_observations_month
+  ON daily_observations(station, month, year);
+"""
+
+_UPSERT = """
+INSERT INTO daily_observations (station, date, year, month, day, max_temp, min_temp)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (station, date) DO UPDATE SET
+  max_temp = excluded.max_temp,
+  min_temp = excluded.min_temp
+WHERE max_temp IS NOT excluded.max_temp OR min_temp IS NOT excluded.min_temp
+"""
+
+
+def connect(path=DB_PATH):
+    """Open the database in WAL mode with the observation table in place."""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def iso_dates(day_index):
+    """Format day indexes as ``YYYY-MM-DD`` strings."""
+    return np.asarray(day_index, dtype=np.int64).astype('datetime64[D]').astype(str)
+
+
+def latest_days(conn):
+    """Return ``{station: day_index}`` of the newest stored day per station."""
+    rows = conn.execute(
+        'SELECT station, MAX(date) FROM daily_observations GROUP BY station').fetchall()
+    return {
+        station: int(np.datetime64(date, 'D').astype(np.int64))
+        for station, date in rows if date is not None
+    }
+
+
+def load_series(conn, series, full=False, overlap_days=OVERLAP_DAYS):
+    """Upsert the rows of ``series`` into ``daily_observations``.
+
+    Unless ``full``, only days from ``overlap_days`` before each station's
+    newest stored day onwards are sent. Everything runs in one transaction
+    with ``executemany``. Returns ``{'sent': rows offered, 'written': rows
+    inserted or changed}``.
+    """
+    keep = np.ones(len(series), dtype=bool)
+    if not full:
+        latest = latest_days(conn)
+        for code, (start, stop) in series.station_bounds().items():
+            last = latest.get(series.stations[code])
+            if last is not None:
+                keep[start:stop] = series.day_index[start:stop] >= last - overlap_days
+    part = series.take(keep)
+
+    max_temp = np.where(np.isnan(part.max_temp), None, part.max_temp).tolist()
+    min_temp = np.where(np.isnan(part.min_temp), None, part.min_temp).tolist()
+    rows = zip(part.station_names.tolist(), iso_dates(part.day_index).tolist(),
+               part.year.tolist(), part.month.tolist(), part.dom.tolist(),
+               max_temp, min_temp)
+
+    before = conn.total_changes
+    with conn:
+        conn.executemany(_UPSERT, rows)
+    return {'sent': len(part), 'written': conn.total_changes - before}
+
+
+def read_series(conn, station=None, start=None, end=None):
+    """Read observations back as a :class:`DailySeries`.
+
+    ``start``/``end`` are inclusive ``YYYY-MM-DD`` bounds and are answered
+    from the primary key index.
+    """
+    clauses, params = [], []
+    if station is not None:
+        clauses.append('station = ?')
+        params.append(station)
+    if start is not None:
+        clauses.append('date >= ?')
+        params.append(start)
+    if end is not None:
+        clauses.append('date <= ?')
+        params.append(end)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = conn.execute(
+        f'SELECT station, date, max_temp, min_temp FROM daily_observations{where}'
+        ' ORDER BY station, date', params).fetchall()
+
+    names = sorted({row[0] for row in rows}) or [station or DEFAULT_STATION]
+    codes = {name: i for i, name in enumerate(names)}
+    station_codes = np.fromiter((codes[row[0]] for row in rows), dtype=np.int16, count=len(rows))
+    days = np.array([row[1] for row in rows], dtype='datetime64[D]').astype(np.int64)
+    max_temp = np.array([row[2] for row in rows], dtype=np.float64)
+    min_temp = np.array([row[3] for row in rows], dtype=np.float64)
+    return DailySeries(days, max_temp, min_temp, station=station_codes, stations=names,
+                       presorted=True)
@@ -0,0 +1,192 @@
+"""
+Synthetic JMA-format daily CSVs for benchmarks and offline tests.
+
+Temperatures follow a seasonal cycle plus a warming trend and AR(1) noise,
+with a small share of missing values and non-正常値 quality flags, written
+with the same header block, column layout and CRLF line endings as the real
+downloads.
+"""
+import os
+
+import numpy as np
+
+from .dataset import days_from_ymd, ymd_from_days
+from .ingest import (DATE_LABEL, HOMOGENEITY_LABEL, MAX_TEMP_LABEL, MIN_TEMP_LABEL,
+                     QUALITY_LABEL, QUALITY_NORMAL)
+
+STATION_NAMES = ('東京', '大阪', '名古屋', '札幌', '福岡', '仙台', '広島', '那覇',
+                 '新潟', '金沢', '高松', '鹿児島', '横浜', '京都', '神戸', '長野')
+
+# JMA の1回のダウンロード上限に合わせた分割年数
+CHUNK_YEARS = 15
+
+
+def station_name(i):
+    if i < len(STATION_NAMES):
+        return STATION_NAMES[i]
+    return f'観測点{i + 1}'
+
+
+def synthetic_series(start_year, end_year, seed=0, missing_rate=0.001):
+    """Generate ``(day_index, max_temp, min_temp, quality)`` arrays.
+
+    Missing values are NaN with quality flag 1 (欠測); a few values carry
+    quality 5 (準正常値).
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(days_from_ymd(start_year, 1, 1), days_from_ymd(end_year + 1, 1, 1),
+                     dtype=np.int32)
+    n = len(days)
+    phase = 2 * np.pi * (days - days_from_ymd(1970, 1, 20)) / 365.2425
+    years = (days - days[0]) / 365.2425
+    base = 15.5 + rng.normal(0, 3) - 10.5 * np.cos(phase) + 0.015 * years
+
+    noise = rng.normal(0, 2.0, n)
+    # AR(1) で日々の気温の持続性を再現する
+    ar = np.empty(n)
+    ar[0] = noise[0]
+    for i in range(1, n):
+        ar[i] = 0.7 * ar[i - 1] + noise[i]
+
+    spread = 7.5 + 1.5 * np.sin(phase) + rng.normal(0, 1.2, n)
+    max_temp = np.round(base + 0.5 * spread + ar, 1)
+    min_temp = np.round(base - 0.5 * spread + 0.8 * ar, 1)
+
+    quality = np.full(n, QUALITY_NORMAL, dtype=np.int8)
+    quality[rng.random(n) < 0.002] = 5
+    missing = rng.random(n) < missing_rate
+    quality[missing] = 1
+    max_temp[missing] = np.nan
+    return days, max_temp, min_temp, quality
+
+
+def format_csv(station, days, max_temp, min_temp, quality, homogeneity=1,
+               downloaded_at='2025/07/05 23:26:59'):
+    """Render one station's arrays as JMA CSV text (CRLF line endings)."""
+    with_homogeneity = homogeneity is not None
+    width = 3 if with_homogeneity else 2
+    header = [
+        f'ダウンロードした時刻：{downloaded_at}',
+        '',
+        ',' + ','.join([station] * (2 * width)),
+        DATE_LABEL + ',' + ','.join([MAX_TEMP_LABEL] * width + [MIN_TEMP_LABEL] * width),
+        ',' * (2 * width),
+    ]
+    kinds = ['', QUALITY_LABEL] + ([HOMOGENEITY_LABEL] if with_homogeneity else [])
+    header.append(',' + ','.join(kinds + kinds))
+
+    year, month, day = ymd_from_days(days)
+    lines = []
+    homog = f',{homogeneity}' if with_homogeneity else ''
+    for y, m, d, hi, lo, q in zip(year.tolist(), month.tolist(), day.tolist(),
+                                  max_temp.tolist(), min_temp.tolist(), quality.tolist()):
+        hi_text = '' if hi != hi else f'{hi:.1f}'
+        lo_text = '' if lo != lo else f'{lo:.1f}'
+        lines.append(f'{y}/{m}/{d},{hi_text},{q}{homog},{lo_text},{q}{homog}')
+    return '\r\n'.join(header + lines) + '\r\n'
+
+
+def write_station_csvs(directory, station, start_year, end_year, seed=0,
+                       encoding='utf-8', chunk_years=CHUNK_YEARS, homogeneity=1):
+    """Write one station's synthetic history as chunked CSV files.
+
+    ``encoding='shift_jis'`` reproduces the older hand-downloaded files.
+    Returns the written paths, oldest first.
+    """
+    days, max_temp, min_temp, quality = synthetic_series(start_year, end_year, seed=seed)
+    year = ymd_from_days(days)[0]
+    paths = []
+    for chunk_start in range(start_year, end_year + 1, chunk_years):
+        chunk_end = min(chunk_start + chunk_years - 1, end_year)
+        mask = (year >= chunk_start) & (year <= chunk_end)
+        text = format_csv(station, days[mask], max_temp[mask], min_temp[mask], quality[mask],
+                          homogeneity=homogeneity)
+        path = os.path.join(directory, f'{station}_{chunk_start}-{chunk_end}.csv')
+        with open(path, 'wb') as f:
+            f.write(text.encode(encoding))
+        paths.append(path)
+    return paths
+
+
+def generate_dataset(directory, stations, years, end_year=2024, seed=0,
+                     encoding='utf-8', chunk_years=CHUNK_YEARS):
+    """Write ``stations`` × ``years`` of synthetic data under ``directory``.
+
+    Returns ``{station: [paths]}``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    start_year = end_year - years + 1
+    files = {}
+    for i in range(stations):
+        name = station_name(i)
+        files[name] = write_station_csvs(directory, name, start_year, end_year,
+                                         seed=seed + i, encoding=encoding,
+                                         chunk_years=chunk_years)
+    return files
+
+
+def synthetic_hourly(start_year, end_year, seed=0, missing_rate=0.002):
+    """Generate ``(hour, temp, quality)`` arrays with a diurnal cycle.
+
+    ``hour`` uses JMA end-of-hour stamps (hours since 1970-01-01 0:00, the
+    first value of a day at ``1:00``). Missing values are NaN with quality 1.
+    """
+    rng = np.random.default_rng(seed)
+    first = days_from_ymd(start_year, 1, 1) * 24 + 1
+    last = days_from_ymd(end_year + 1, 1, 1) * 24
+    hour = np.arange(first, last + 1, dtype=np.int64)
+    n = len(hour)
+    days = (hour - 1) / 24
+    phase = 2 * np.pi * (days - days_from_ymd(1970, 1, 20)) / 365.2425
+    base = 15.5 + rng.normal(0, 3) - 10.5 * np.cos(phase) + 0.015 * (days - days[0]) / 365.2425
+    # 日変化は14時ごろ最高、5時ごろ最低
+    diurnal = -3.8 * np.cos(2 * np.pi * ((hour - 2) % 24) / 24)
+    daily_noise = np.repeat(rng.normal(0, 2.0, n // 24 + 1), 24)[:n]
+    temp = np.round(base + diurnal + daily_noise + rng.normal(0, 0.6, n), 1)
+
+    quality = np.full(n, QUALITY_NORMAL, dtype=np.int8)
+    missing = rng.random(n) < missing_rate
+    quality[missing] = 1
+    temp[missing] = np.nan
+    return hour, temp, quality
+
+
+def format_hourly_csv(station, hour, temp, quality, homogeneity=1,
+                      downloaded_at='2025/07/05 23:26:59'):
+    """Render one station's hourly arrays as JMA CSV text (CRLF line endings)."""
+    from .hourly import HOURLY_DATE_LABEL, TEMP_LABEL
+
+    header = [
+        f'ダウンロードした時刻：{downloaded_at}',
+        '',
+        ',' + ','.join([station] * 3),
+        HOURLY_DATE_LABEL + ',' + ','.join([TEMP_LABEL] * 3),
+        ',,,',
+        ',,' + QUALITY_LABEL + ',' + HOMOGENEITY_LABEL,
+    ]
+    # 24時は翌日の 0:00:00 と書かれる
+    year, month, day = ymd_from_days(hour // 24)
+    lines = [
+        f"{y}/{m}/{d} {h}:00:00,{'' if t != t else f'{t:.1f}'},{q},{homogeneity}"
+        for y, m, d, h, t, q in zip(year.tolist(), month.tolist(), day.tolist(),
+                                    (hour % 24).tolist(), temp.tolist(), quality.tolist())
+    ]
+    return '\r\n'.join(header + lines) + '\r\n'
+
+
+def write_hourly_csvs(directory, station, start_year, end_year, seed=0,
+                      encoding='utf-8', chunk_years=1):
+    """Write one station's synthetic hourly history, ``chunk_years`` per file."""
+    hour, temp, quality = synthetic_hourly(start_year, end_year, seed=seed)
+    year = ymd_from_days((hour - 1) // 24)[0]
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for chunk_start in range(start_year, end_year + 1, chunk_years):
+        chunk_end = min(chunk_start + chunk_years - 1, end_year)
+        mask = (year >= chunk_start) & (year <= chunk_end)
+        text = format_hourly_csv(station, hour[mask], temp[mask], quality[mask])
+        path = os.path.join(directory, f'{station}_hourly_{chunk_start}-{chunk_end}.csv')
+        with open(path, 'wb') as f:
+            f.write(text.encode(encoding))
+        paths.append(path)
+    return paths
@@ -0,0 +1,204 @@
+"""
+Warming trends with block-bootstrap confidence intervals.
+
+Every station and column contributes 379 yearly series: the annual mean,
+the 12 monthly means and the 366 day-of-year values, stacked as rows of one
+``(series, year)`` matrix with NaN for missing years. OLS slopes of all rows
+come from weighted sums in a single pass.
+
+The intervals use a moving-block bootstrap of the residuals, which keeps
+the year-to-year persistence that a plain bootstrap would destroy: each
+resample rebuilds the series as fitted trend plus residual blocks of
+``block`` consecutive years drawn with replacement. One ``(resamples,
+years)`` index matrix is drawn from the seeded generator and shared by
+every row, so the result does not depend on how the rows are split over
+processes. Missing years carry no weight wherever a resample puts them.
+The refit's OLS sums reduce to products of each row's observed mask and
+residuals with per-resample tallies of where every year was drawn, so a
+shard costs a few ``(rows, years) @ (years, resamples)`` products and
+memory in ``rows × resamples``, with or without gaps::
+
+    python -m ondankamap trends --resamples 2000 --jobs 4
+"""
+import numpy as np
+
+from .aggregate import station_year_doy_grid
+from .dataset import doy_from_md
+
+RESAMPLES = 2000
+BLOCK = 5
+CONFIDENCE = 0.95
+SEED = 0
+SHARD_ROWS = 128
+
+# 年平均・月平均に必要な観測日数
+MIN_YEAR_DAYS = 300
+MIN_MONTH_DAYS = 20
+
+
+def yearly_matrix(grid):
+    """Stack the annual, monthly and day-of-year series of a ``(year, 366)`` grid.
+
+    Returns ``(names, matrix)`` with ``matrix`` of shape ``(379, years)``;
+    means over too few observed days are NaN.
+    """
+    observed = ~np.isnan(grid)
+    filled = np.where(observed, grid, 0.0)
+
+    def mean(columns, minimum):
+        count = observed[:, columns].sum(axis=1)
+        total = filled[:, columns].sum(axis=1)
+        return np.where(count >= minimum, total / np.maximum(count, 1), np.nan)
+
+    starts = doy_from_md(np.arange(1, 13), 1) - 1
+    bounds = np.r_[starts, grid.shape[1]]
+    rows = [mean(slice(None), MIN_YEAR_DAYS)]
+    rows += [mean(slice(a, b), MIN_MONTH_DAYS) for a, b in zip(bounds[:-1], bounds[1:])]
+    names = ['annual'] + [str(m) for m in range(1, 13)] + \
+        [f'doy{slot}' for slot in range(1, grid.shape[1] + 1)]
+    return names, np.vstack(rows + [grid.T])
+
+
+def ols_slopes(x, y, weight):
+    """Slopes and intercepts of ``y`` on ``x`` along the last axis.
+
+    ``weight`` is 0/1 (observed) and broadcasts with ``y``; rows with fewer
+    than 3 observations get NaN.
+    """
+    y = np.where(weight > 0, y, 0.0)
+    sw = weight.sum(axis=-1)
+    sx = (weight * x).sum(axis=-1)
+    sy = (weight * y).sum(axis=-1)
+    sxx = (weight * x * x).sum(axis=-1)
+    sxy = (weight * x * y).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+        intercept = (sy - slope * sx) / sw
+    slope = np.where(sw >= 3, slope, np.nan)
+    return slope, intercept
+
+
+def block_indexes(n, resamples=RESAMPLES, block=BLOCK, rng=None):
+    """``(resamples, n)`` moving-block bootstrap indexes into ``range(n)``."""
+    rng = np.random.default_rng(SEED) if rng is None else rng
+    block = max(1, min(block, n))
+    blocks = -(-n // block)
+    starts = rng.integers(0, n - block + 1, size=(resamples, blocks))
+    index = starts[:, :, None] + np.arange(block)[None, None, :]
+    return index.reshape(resamples, -1)[:, :n]
+
+
+def bootstrap_slopes(job):
+    """Worker: bootstrap slope quantiles for one shard of rows.
+
+    ``job = (x, matrix, index, quantiles)``; returns ``(rows, len(quantiles))``.
+    A resample puts year ``index[r, t]``'s residual at year ``t`` (weight 0
+    if that year is missing), so its OLS sums only need, per drawn year and
+    resample, the count and the sums of ``x_t`` and ``x_t²`` over the
+    positions it lands on; see the module docstring.
+    """
+    x, matrix, index, quantiles = job
+    observed = ~np.isnan(matrix)
+    weight = observed.astype(np.float64)
+    slope, intercept = ols_slopes(x, matrix, weight)
+    # 欠測年は重み 0 なので残差も 0 にしておく（傾きが出ない行は NaN のまま）
+    residual = np.where(observed, matrix - intercept[:, None] - slope[:, None] * x[None, :], 0.0)
+
+    # (元の年, 再標本) ごとに、その年が置かれた位置の 1, x, x² を合計する
+    resamples, n = index.shape
+    cell = (index * resamples + np.arange(resamples)[:, None]).ravel()
+
+    def tally(values):
+        values = np.broadcast_to(values, index.shape).ravel()
+        return np.bincount(cell, values, minlength=n * resamples).reshape(n, resamples)
+
+    ones, xs, xxs = tally(1.0), tally(x[None, :]), tally(x[None, :] ** 2)
+    sw, sx, sxx = weight @ ones, weight @ xs, weight @ xxs
+    # 当てはめ値の分は元の傾きに戻るので、残差の寄与だけを足す
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slopes = slope[:, None] + (sw * (residual @ xs) - sx * (residual @ ones)) / (sw * sxx - sx * sx)
+    slopes = np.where(sw >= 3, slopes, np.nan)
+    return np.nanquantile(slopes, quantiles, axis=1).T
+
+
+def trend_intervals(x, matrix, resamples=RESAMPLES, block=BLOCK, confidence=CONFIDENCE,
+                    seed=SEED, jobs=1, shard_rows=SHARD_ROWS):
+    """OLS slope and bootstrap interval of every row of ``matrix``.
+
+    ``x`` are the years. Rows are split into shards of ``shard_rows``;
+    ``jobs=1`` runs them in-process, otherwise in a process pool with
+    ``jobs`` workers (default: CPU count). Returns ``(slope, low, high)``
+    arrays in units per year.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x.mean()
+    matrix = np.asarray(matrix, dtype=np.float64)
+    observed = ~np.isnan(matrix)
+    slope, _ = ols_slopes(x, matrix, observed.astype(np.float64))
+
+    index = block_indexes(len(x), resamples, block, np.random.default_rng(seed))
+    alpha = (1 - confidence) / 2
+    quantiles = np.array([alpha, 1 - alpha])
+    work = [(x, matrix[i:i + shard_rows], index, quantiles)
+            for i in range(0, len(matrix), shard_rows)]
+    if jobs == 1:
+        results = list(map(bootstrap_slopes, work))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(bootstrap_slopes, work))
+    bounds = np.vstack(results) if results else np.zeros((0, 2))
+    return slope, bounds[:, 0], bounds[:, 1]
+
+
+def trend_table(series, columns=('max_temp', 'min_temp'), start=None, end=None,
+                resamples=RESAMPLES, block=BLOCK, confidence=CONFIDENCE, seed=SEED,
+                jobs=1, digits=3):
+    """JSON-ready trends per station and column, in °C per decade.
+
+    ``annual`` and each month hold ``slope``/``low``/``high``/``years``;
+    ``doy`` holds the same fields as 366-long arrays.
+    """
+    blocks, keys = [], []
+    years = None
+    for column in columns:
+        years, grid = station_year_doy_grid(series, column)
+        chosen = (years >= (start or years.min())) & (years <= (end or years.max()))
+        years = years[chosen]
+        for code, station in enumerate(series.stations):
+            names, matrix = yearly_matrix(grid[code][chosen])
+            blocks.append(matrix)
+            keys.append((station, column, names))
+    matrix = np.vstack(blocks)
+    slope, low, high = trend_intervals(years, matrix, resamples, block, confidence, seed, jobs)
+    counts = (~np.isnan(matrix)).sum(axis=1)
+
+    def value(v):
+        return None if np.isnan(v) else round(float(v) * 10, digits)
+
+    result = {
+        'start': int(years.min()), 'end': int(years.max()), 'unit': '℃/10年',
+        'resamples': resamples, 'block': block, 'confidence': confidence, 'seed': seed,
+        'stations': {},
+    }
+    row = 0
+    for station, column, names in keys:
+        table = {}
+        for i, name in enumerate(names[:13]):
+            r = row + i
+            entry = {'slope': value(slope[r]), 'low': value(low[r]), 'high': value(high[r]),
+                     'years': int(counts[r])}
+            if name == 'annual':
+                table['annual'] = entry
+            else:
+                table.setdefault('monthly', {})[name] = entry
+        doy = slice(row + 13, row + len(names))
+        table['doy'] = {
+            'slope': [value(v) for v in slope[doy]],
+            'low': [value(v) for v in low[doy]],
+            'high': [value(v) for v in high[doy]],
+        }
+        result['stations'].setdefault(station, {})[column] = table
+        row += len(names)
+    return result
@@ -0,0 +1,157 @@
+"""
+Data quality report for a merged daily series.
+
+Covers the checks that ``temperature_analysis.py`` and ``detailed_analysis.py``
+print by hand: incomplete years, gaps in the date sequence, days where the
+max is below the min, and JMA quality flags other than 正常値 (8).
+"""
+from datetime import date
+
+import numpy as np
+
+from .dataset import DEFAULT_STATION, format_date, ymd_from_days
+from .ingest import QUALITY_NORMAL
+
+
+def _days_in_year(years):
+    years = np.asarray(years)
+    leap = ((years % 4 == 0) & (years % 100 != 0)) | (years % 400 == 0)
+    return np.where(leap, 366, 365)
+
+
+def _date_label(day_index):
+    year, month, day = ymd_from_days([day_index])
+    return format_date(year[0], month[0], day[0])
+
+
+def station_report(series):
+    """Quality report for a single-station series (see :func:`quality_report`)."""
+    n = len(series)
+    if n == 0:
+        return {'rows': 0}
+
+    days = series.day_index
+    step = np.diff(days)
+    gap_at = np.flatnonzero(step > 1)
+    gaps = [
+        {'start': _date_label(days[i] + 1), 'end': _date_label(days[i + 1] - 1),
+         'days': int(step[i] - 1)}
+        for i in gap_at
+    ]
+
+    years, counts = np.unique(series.year, return_counts=True)
+    expected = _days_in_year(years)
+    incomplete = [
+        {'year': int(y), 'days': int(c), 'expected': int(e)}
+        for y, c, e in zip(years, counts, expected) if c < e
+    ]
+
+    inverted = np.flatnonzero(series.max_temp < series.min_temp)
+    report = {
+        'rows': n,
+        'start': _date_label(days[0]),
+        'end': _date_label(days[-1]),
+        'years': int(len(years)),
+        'missing_days': int(np.sum(step[gap_at] - 1)),
+        'duplicate_days': int(np.count_nonzero(step == 0)),
+        'gaps': gaps,
+        'incomplete_years': incomplete,
+        'inverted_days': [_date_label(days[i]) for i in inverted],
+    }
+    for column in ('max_quality', 'min_quality'):
+        if column in series.columns:
+            flags, flag_counts = np.unique(series.columns[column], return_counts=True)
+            report[column] = {
+                str(int(f)): int(c) for f, c in zip(flags, flag_counts) if f != QUALITY_NORMAL
+            }
+    if 'homogeneity' in series.columns:
+        report['homogeneity_numbers'] = sorted(
+            int(h) for h in np.unique(series.columns['homogeneity']) if h)
+    return report
+
+
+def quality_report(series):
+    """Return ``{station: report}`` for every station in the series."""
+    return {
+        name: station_report(series.for_station(name))
+        for name in series.stations
+    }
+
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class StreamReport:
+    """The checks of :func:`station_report`, accumulated over a record stream.
+
+    ``check(records)`` passes records through unchanged, so it can sit
+    between the merge and the writer of a streaming ingest; afterwards
+    ``report()`` returns ``{station: report}`` with the same keys (quality
+    counts only when the records carry the quality fields). Records must
+    arrive in station/date order.
+    """
+
+    def __init__(self):
+        self._stations = {}
+
+    def check(self, records):
+        for record in records:
+            self._add(record)
+            yield record
+
+    def _add(self, record):
+        name = record.get('station', DEFAULT_STATION)
+        s = self._stations.get(name)
+        day = date(record['year'], record['month'], record['day']).toordinal() - _EPOCH
+        if s is None:
+            s = self._stations[name] = {
+                'rows': 0, 'first': day, 'last': None, 'missing_days': 0, 'duplicate_days': 0,
+                'gaps': [], 'year_counts': {}, 'inverted_days': [],
+                'max_quality': {}, 'min_quality': {}, 'homogeneity_numbers': set(),
+            }
+        last = s['last']
+        if last is not None:
+            if day == last:
+                s['duplicate_days'] += 1
+            elif day > last + 1:
+                s['gaps'].append({'start': _date_label(last + 1), 'end': _date_label(day - 1),
+                                  'days': day - last - 1})
+                s['missing_days'] += day - last - 1
+        s['last'] = day
+        s['rows'] += 1
+        year = record['year']
+        s['year_counts'][year] = s['year_counts'].get(year, 0) + 1
+        if record['max_temp'] < record['min_temp']:
+            s['inverted_days'].append(record['date'])
+        for column in ('max_quality', 'min_quality'):
+            flag = record.get(column, QUALITY_NORMAL)
+            if flag != QUALITY_NORMAL:
+                s[column][str(flag)] = s[column].get(str(flag), 0) + 1
+        if record.get('homogeneity'):
+            s['homogeneity_numbers'].add(record['homogeneity'])
+
+    def report(self):
+        result = {}
+        for name, s in self._stations.items():
+            years = sorted(s['year_counts'])
+            expected = _days_in_year(years)
+            r = {
+                'rows': s['rows'],
+                'start': _date_label(s['first']),
+                'end': _date_label(s['last']),
+                'years': len(years),
+                'missing_days': s['missing_days'],
+                'duplicate_days': s['duplicate_days'],
+                'gaps': s['gaps'],
+                'incomplete_years': [
+                    {'year': y, 'days': s['year_counts'][y], 'expected': int(e)}
+                    for y, e in zip(years, expected) if s['year_counts'][y] < e
+                ],
+                'inverted_days': s['inverted_days'],
+                'max_quality': s['max_quality'],
+                'min_quality': s['min_quality'],
+            }
+            if s['homogeneity_numbers']:
+                r['homogeneity_numbers'] = sorted(s['homogeneity_numbers'])
+            result[name] = r
+        return result
@@ -0,0 +1,140 @@
+"""
+Verification of the saved daily forecasts against observations.
+
+``src/lib/weather-fetcher.ts`` stores each day's forecast snapshot in
+``weather_forecasts``. This joins every saved forecast with the observed
+day by lead time (``forecast_date - saved_date`` in days) and scores them::
+
+    python -m ondankamap verify
+
+The forecast table is read in one query into arrays, and the join and the
+per-lead statistics are array operations (searchsorted + bincount), so the
+cost grows linearly with the table.
+"""
+import numpy as np
+
+from .dataset import DEFAULT_STATION, EXTREME_HEAT, TROPICAL_NIGHT
+
+SKILL_JSON = 'src/data/forecast_skill.json'
+
+
+def read_forecasts(conn):
+    """Return ``(saved_day, forecast_day, max_temp, min_temp)`` arrays."""
+    rows = conn.execute(
+        'SELECT saved_date, forecast_date, max_temp, min_temp FROM weather_forecasts').fetchall()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), np.zeros(0)
+    saved, target, max_temp, min_temp = zip(*rows)
+    return (np.array(saved, dtype='datetime64[D]').astype(np.int64),
+            np.array(target, dtype='datetime64[D]').astype(np.int64),
+            np.array(max_temp, dtype=np.float64),
+            np.array(min_temp, dtype=np.float64))
+
+
+def match_observations(series, forecast_day, station=DEFAULT_STATION):
+    """Observed max/min for each forecast day (NaN where not observed)."""
+    start, stop = series.station_bounds()[series.station_code(station)]
+    days = series.day_index[start:stop]
+    observed_max = np.full(len(forecast_day), np.nan)
+    observed_min = np.full(len(forecast_day), np.nan)
+    if len(days) == 0:
+        return observed_max, observed_min
+    pos = np.clip(np.searchsorted(days, forecast_day), 0, len(days) - 1)
+    found = days[pos] == forecast_day
+    observed_max[found] = series.max_temp[start:stop][pos[found]]
+    observed_min[found] = series.min_temp[start:stop][pos[found]]
+    return observed_max, observed_min
+
+
+def _error_stats(lead_code, n_leads, forecast, observed):
+    valid = ~(np.isnan(forecast) | np.isnan(observed))
+    error = np.where(valid, forecast - observed, 0.0)
+    count = np.bincount(lead_code, weights=valid, minlength=n_leads)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.bincount(lead_code, weights=np.abs(error), minlength=n_leads) / count
+        bias = np.bincount(lead_code, weights=error, minlength=n_leads) / count
+    return count.astype(int), mae, bias
+
+
+def _event_stats(lead_code, n_leads, forecast, observed, threshold):
+    """Contingency counts and scores for the event ``value >= threshold``."""
+    valid = ~(np.isnan(forecast) | np.isnan(observed))
+    predicted = valid & (forecast >= threshold)
+    happened = valid & (observed >= threshold)
+    hits = np.bincount(lead_code, weights=predicted & happened, minlength=n_leads)
+    misses = np.bincount(lead_code, weights=~predicted & happened, minlength=n_leads)
+    false_alarms = np.bincount(lead_code, weights=predicted & ~happened, minlength=n_leads)
+    total = np.bincount(lead_code, weights=valid, minlength=n_leads)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = hits / (hits + misses)
+        false_alarm_ratio = false_alarms / (hits + false_alarms)
+        accuracy = (total - misses - false_alarms) / total
+    return {
+        'hits': hits.astype(int), 'misses': misses.astype(int),
+        'false_alarms': false_alarms.astype(int),
+        'hit_rate': hit_rate, 'false_alarm_ratio': false_alarm_ratio, 'accuracy': accuracy,
+    }
+
+
+def _number(value, digits=3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def verify(series, saved_day, forecast_day, max_temp, min_temp, station=DEFAULT_STATION):
+    """Score forecasts by lead time.
+
+    Returns ``{'station', 'forecasts', 'matched', 'first', 'last', 'leads':
+    {lead: {...}}}`` where each lead holds MAE and bias of max/min and the
+    ≥35℃ (猛暑日) and tropical-night (min ≥25℃) contingency scores.
+    """
+    observed_max, observed_min = match_observations(series, forecast_day, station)
+    matched = ~(np.isnan(observed_max) & np.isnan(observed_min))
+    lead = (forecast_day - saved_day)[matched]
+    leads, lead_code = np.unique(lead, return_inverse=True)
+    n = len(leads)
+
+    fmax, fmin = max_temp[matched], min_temp[matched]
+    omax, omin = observed_max[matched], observed_min[matched]
+    max_count, max_mae, max_bias = _error_stats(lead_code, n, fmax, omax)
+    min_count, min_mae, min_bias = _error_stats(lead_code, n, fmin, omin)
+    heat = _event_stats(lead_code, n, fmax, omax, EXTREME_HEAT)
+    night = _event_stats(lead_code, n, fmin, omin, TROPICAL_NIGHT)
+
+    def event(stats, i):
+        return {key: (int(values[i]) if values.dtype.kind == 'i' else _number(values[i]))
+                for key, values in stats.items()}
+
+    result = {
+        'station': station,
+        'forecasts': int(len(saved_day)),
+        'matched': int(np.count_nonzero(matched)),
+        'first': str(np.datetime64(int(saved_day.min()), 'D')) if len(saved_day) else None,
+        'last': str(np.datetime64(int(saved_day.max()), 'D')) if len(saved_day) else None,
+        'leads': {},
+    }
+    for i, days in enumerate(leads):
+        result['leads'][str(int(days))] = {
+            'max_temp': {'count': int(max_count[i]), 'mae': _number(max_mae[i]),
+                         'bias': _number(max_bias[i])},
+            'min_temp': {'count': int(min_count[i]), 'mae': _number(min_mae[i]),
+                         'bias': _number(min_bias[i])},
+            'extreme_heat': event(heat, i),
+            'tropical_night': event(night, i),
+        }
+    return result
+
+
+def verify_database(conn, series=None, station=DEFAULT_STATION):
+    """Verify the forecasts in ``conn`` against ``series``.
+
+    Observations default to the ``daily_observations`` table (see
+    :mod:`ondankamap.store`).
+    """
+    if series is None:
+        from .store import read_series
+
+        start = conn.execute('SELECT MIN(forecast_date) FROM weather_forecasts').fetchone()[0]
+        series = read_series(conn, station=station, start=start)
+    return verify(series, *read_forecasts(conn), station=station)
@@ -8,6 +8,8 @@ import json
 import os
 from datetime import datetime
 
+from ondankamap import instrument
+
 def parse_csv_file(filename):
     """CSVファイルを解析してデータを抽出"""
     data = []
@@ -85,48 +87,55 @@ def main():
         'data-utf8.csv'     # 2010-2025
     ]
     
-    all_data = []
+    with instrument.run('update-data-complete') as run:
+        all_data = []
     
-    for filename in files:
-        if os.path.exists(filename):
-            print(f"処理中: {filename}")
-            file_data = parse_csv_file(filename)
-            all_data.extend(file_data)
-            print(f"  {len(file_data)} レコード追加")
-        else:
-            print(f"ファイルが見つかりません: {filename}")
+        for filename in files:
+            if os.path.exists(filename):
+                print(f"処理中: {filename}")
+                with run.stage('parse_csv', file=filename):
+                    file_data = parse_csv_file(filename)
+                all_data.extend(file_data)
+                print(f"  {len(file_data)} レコード追加")
+            else:
+                print(f"ファイルが見つかりません: {filename}")
     
-    # 日付順にソート
-    all_data.sort(key=lambda x: x['date'])
+        # 日付順にソート
+        with run.stage('sort'):
+            all_data.sort(key=lambda x: x['date'])
     
-    # 1890-2024年の範囲でフィルタリング
-    filtered_data = []
-    for record in all_data:
-        year = record['year']
-        if 1890 <= year <= 2024:
-            filtered_data.append(record)
+        with run.stage('filter'):
+            # 1890-2024年の範囲でフィルタリング
+            filtered_data = []
+            for record in all_data:
+                year = record['year']
+                if 1890 <= year <= 2024:
+                    filtered_data.append(record)
     
-    # 重複除去（同じ日付のデータがある場合）
-    unique_data = {}
-    duplicate_count = 0
-    for record in filtered_data:
-        date_key = record['date']
-        if date_key not in unique_data:
-            unique_data[date_key] = record
-        else:
-            # 既存データと新データを比較（新しいファイルを優先）
-            duplicate_count += 1
-            print(f"重複データ: {date_key}")
-            unique_data[date_key] = record
+        with run.stage('dedup'):
+            # 重複除去（同じ日付のデータがある場合）
+            unique_data = {}
+            duplicate_count = 0
+            for record in filtered_data:
+                date_key = record['date']
+                if date_key not in unique_data:
+                    unique_data[date_key] = record
+                else:
+                    # 既存データと新データを比較（新しいファイルを優先）
+                    duplicate_count += 1
+                    print(f"重複データ: {date_key}")
+                    unique_data[date_key] = record
     
-    # 最終データを日付順にソート
-    final_data = list(unique_data.values())
-    final_data.sort(key=lambda x: x['date'])
+        # 最終データを日付順にソート
+        with run.stage('sort_final'):
+            final_data = list(unique_data.values())
+            final_data.sort(key=lambda x: x['date'])
     
-    # JSONファイルに出力
-    output_file = 'tokyo_temperature_data_complete_final.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+        # JSONファイルに出力
+        output_file = 'tokyo_temperature_data_complete_final.json'
+        with run.stage('write_json', path=output_file):
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(final_data, f, ensure_ascii=False, indent=2)
     
     print(f"\n完全統合完了!")
     print(f"出力ファイル: {output_file}")